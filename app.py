@@ -1,19 +1,64 @@
-from flask import Flask, request, jsonify
-import re
-import logging
+from flask import Flask, Response, g, request, jsonify, stream_with_context, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from functools import wraps
 import os
-import requests
-import openai
-from logging.handlers import RotatingFileHandler
-from flask_cors import CORS
-from werkzeug.middleware.proxy_fix import ProxyFix
-from dotenv import load_dotenv  # Import dotenv to load environment variables
-
-# Load environment variables from .env file
+import uuid
+from dotenv import load_dotenv
+
+# Load environment variables from .env file (found by walking up from this directory). This runs
+# before the imports below because those modules read their settings when they are imported.
 load_dotenv()
 
+from flask_cors import CORS  # noqa: E402
+from werkzeug.middleware.proxy_fix import ProxyFix  # noqa: E402
+from crm_client import CRMClient  # noqa: E402
+from outbox import LeadOutbox, OutboxDispatcher, PENDING, IN_FLIGHT  # noqa: E402
+from bulk import iter_ndjson, process_bulk  # noqa: E402
+from coalesce import UpdateCoalescer  # noqa: E402
+from extraction import (extract_data_from_message, extract_data_from_messages, iter_batches, lead_from_state,  # noqa: E402
+                        load_ner_model, new_lead_state, ner_status, update_lead_state, validate_lead,
+                        LEAD_CAPTURE_FIELDS, NER_ENABLED)
+from llm_client import complete, completion_params, get_client, stream_completion  # noqa: E402
+from response_cache import create_response_cache  # noqa: E402
+from conversation_store import create_conversation_store  # noqa: E402
+from log_pipeline import setup_logging, payload  # noqa: E402
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics, stage, request_started, request_finished  # noqa: E402
+from resilience import UpstreamUnavailable, guard_stats, unavailable_body  # noqa: E402
+from dedup import (SQLiteStore, LeadIndex, IdempotencyStore, assigned_enq_id, lead_keys, lead_matches,  # noqa: E402
+                   request_fingerprint, REPLAY, IN_PROGRESS, MISMATCH)
+from lead_mirror import LeadMirror  # noqa: E402
+from rate_limit import create_rate_limiter  # noqa: E402
+from intent_router import create_intent_router  # noqa: E402
+from lazy_import import lazy_module, lazy_module_stats  # noqa: E402
+import json_codec  # noqa: E402
+from json_codec import response_json  # noqa: E402
+
+# Imported on the first CRM call; see benchmarks/bench_startup.py for the import-time budget
+requests = lazy_module("requests")
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider on top of json_codec (orjson when installed, else the standard library)"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Pretty-printed debug responses keep using the standard library
+            kwargs["default"] = json_codec.stdlib_default(kwargs.get("default", self.default))
+            return super().dumps(obj, **kwargs)
+        return json_codec.dumps(obj, default=self.default, sort_keys=self.sort_keys)
+
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = json_codec.dumpb(obj, default=self.default, sort_keys=self.sort_keys) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
 # Initialize Flask App
 app = Flask(__name__)
+app.json = CodecJSONProvider(app)
 
 # Configure ProxyFix for IIS (corrected)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
@@ -25,8 +70,7 @@ CORS(app, resources={r"/*": {"origins": CORS_ORIGINS}}, supports_credentials=Tru
 # Environment Variables
 ADD_LEAD_API_URL = os.getenv("CRM_API_URL")  # Add Lead URL
 UPDATE_LEAD_API_URL = os.getenv("CRM_UPDATE_API_URL")  # Update Lead URL
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-openai.api_key = OPENAI_API_KEY
+GET_LEAD_API_URL = os.getenv("CRM_GET_API_URL")  # Optional Get Lead URL, used to refresh the local lead mirror
 
 
 if not ADD_LEAD_API_URL or not UPDATE_LEAD_API_URL:
@@ -37,53 +81,239 @@ if not ADD_LEAD_API_URL or not UPDATE_LEAD_API_URL:
 LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
 LOG_FILE_PATH = os.path.join(LOG_DIR, 'app.log')
 
-if not os.path.exists(LOG_DIR):
-    os.makedirs(LOG_DIR)
+def log_context():
+    """Request fields attached to every log record written while handling a request"""
+    if not has_request_context():
+        return {}
+    return {"route": request.path, "method": request.method, "remote_addr": request.remote_addr}
+
+# JSON lines written by a background thread, so requests never wait on the disk or on rotation
+log_handler = setup_logging(app.logger, LOG_FILE_PATH, context=log_context)
+app.logger.info("ADD_LEAD_API_URL: %s", ADD_LEAD_API_URL)
+app.logger.info("UPDATE_LEAD_API_URL: %s", UPDATE_LEAD_API_URL)
+
+# Shared keep-alive CRM client, reused by every request and worker thread
+crm_client = CRMClient(ADD_LEAD_API_URL, UPDATE_LEAD_API_URL, GET_LEAD_API_URL)
+
+# Leads already created in the CRM (by email/mobile) and stored Idempotency-Key responses
+dedup_store = SQLiteStore()
+lead_index = LeadIndex(dedup_store)
+idempotency_keys = IdempotencyStore(dedup_store)
+
+# Local copy of the leads created and updated through this app, served by GET /lead
+lead_mirror = LeadMirror()
+
+def send_lead_update(enq_id, fields):
+    """CRM PUT for a (possibly merged) update; fields the CRM accepted are written through to the mirror"""
+    response = crm_client.update_lead(enq_id, fields)
+    if response.ok:
+        lead_mirror.merge(enq_id, fields)
+    return response
+
+# Field-by-field /update_lead writes to one lead merged into a single CRM PUT
+update_coalescer = UpdateCoalescer(send_lead_update)
+
+# Load the NER model once at startup rather than inside the first request that needs it
+if NER_ENABLED:
+    load_ner_model(app.logger)
+
+def deliver_lead(extracted_data):
+    """Outbox delivery: add the lead to the CRM and index it once accepted"""
+    response = crm_client.add_lead(extracted_data)
+    if response.ok:
+        record_lead(extracted_data, response)
+    return response
+
+# Durable outbox for asynchronous lead delivery (/add_lead?async=true)
+ADD_LEAD_ASYNC = os.getenv("ADD_LEAD_ASYNC", "false").lower() == "true"  # Default mode for /add_lead
+lead_outbox = LeadOutbox()
+outbox_dispatcher = OutboxDispatcher(lead_outbox, deliver_lead, app.logger)
+if ADD_LEAD_ASYNC:
+    # Drain anything left over from a previous run straight away
+    outbox_dispatcher.start()
 
-handler = RotatingFileHandler(LOG_FILE_PATH, maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8')
-handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
-handler.setLevel(logging.INFO)
-app.logger.addHandler(handler)
-app.logger.setLevel(logging.INFO)
-app.logger.info(f"ADD_LEAD_API_URL: {ADD_LEAD_API_URL}")
-app.logger.info(f"UPDATE_LEAD_API_URL: {UPDATE_LEAD_API_URL}")
+# Cache of model answers for repeated (FAQ-style) chat prompts
+chat_cache = create_response_cache()
+
+# Token-budgeted multi-turn chat history, keyed by session id
+conversations = create_conversation_store()
+
+# Per-client, per-route token buckets (see RATE_LIMITS)
+rate_limiter = create_rate_limiter()
+
+# Collect lead details from /chat messages turn by turn and submit the lead once they are complete
+CHAT_LEAD_CAPTURE = os.getenv("CHAT_LEAD_CAPTURE", "true").lower() == "true"
+
+# Greetings, thanks and contact details are answered from templates without calling the model
+intent_router = create_intent_router()
+
+# Process lifecycle (called by serve.py in every worker)
+def warm_up():
+    """Open this process's connections and start its background work before it takes traffic"""
+    try:
+        opened = crm_client.warm_up()
+        app.logger.info("Opened %d CRM connections", opened)
+    except Exception as e:
+        # The CRM may come up later; requests connect on demand as usual
+        app.logger.warning("CRM warm-up failed: %s", e)
+    get_client()
+    # Open the SQLite files now; the stats calls go through each store's connection
+    dedup_store.connection()
+    lead_mirror.stats()
+    backlog = lead_outbox.counts()
+    chat_cache.stats()
+    conversations.stats()
+    rate_limiter.stats()
+    # Leads left pending or in flight by a crash or restart are delivered without waiting for a new one;
+    # chat leads always go through the outbox, so this matters even with ADD_LEAD_ASYNC off
+    if ADD_LEAD_ASYNC or backlog.get(PENDING) or backlog.get(IN_FLIGHT):
+        outbox_dispatcher.start()
+
+def shut_down(timeout=10):
+    """Let in-flight outbox deliveries finish and flush queued log records"""
+    outbox_dispatcher.stop(timeout)
+    log_handler.stop()
 
 # Helper Functions
-def validate_phone(phone):
-    """Validate Indian phone numbers with optional country code"""
-    pattern = r"^(\+91[\-\s]?)?[0]?(91)?[789]\d{9}$"
-    return bool(re.fullmatch(pattern, phone.strip())) if phone else False
-
-def validate_email(email):
-    """Basic email validation"""
-    pattern = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
-    return bool(re.fullmatch(pattern, email.strip())) if email else False
-
-def extract_data_from_message(message):
-    """Extract structured data from unstructured text input."""
-    extracted_data = {
-        "Enq_Id": "12345",  # Default ID
-        "firstnm": "",
-        "email": "",
-        "mobile": ""
-    }
-
-    # Extract email
-    email_match = re.search(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", message)
-    if email_match:
-        extracted_data["email"] = email_match.group(0)
-
-    # Extract mobile number (Indian format)
-    mobile_match = re.search(r"(\+91[\-\s]?)?[0]?(91)?[789]\d{9}", message)
-    if mobile_match:
-        extracted_data["mobile"] = mobile_match.group(0)
-
-    # Extract name (basic heuristic: look for "my name is" or similar patterns)
-    name_match = re.search(r"(my name is|I am|this is|name is|name)\s+([a-zA-Z]+)", message, re.IGNORECASE)
-    if name_match:
-        extracted_data["firstnm"] = name_match.group(2).strip()
-
-    return extracted_data
+def record_lead(extracted_data, response):
+    """Index and mirror a lead the CRM accepted, under the Enq_Id the CRM assigned to it"""
+    try:
+        crm_response = response_json(response)
+    except ValueError:
+        crm_response = None
+    enq_id = assigned_enq_id(crm_response.value if crm_response is not None else None)
+    if enq_id:
+        # Without one (e.g. only the placeholder echoed back) the lead cannot be told apart from others
+        lead_index.record(extracted_data.get("email"), extracted_data.get("mobile"), enq_id)
+        lead_mirror.put(enq_id, extracted_data)
+    return crm_response
+
+def find_existing_lead(extracted_data):
+    """(body, status) for a lead that already exists in the CRM, or None"""
+    with stage("dedup_lookup"):
+        enq_id = lead_index.lookup(extracted_data.get("email"), extracted_data.get("mobile"))
+    if enq_id is None:
+        return None
+    app.logger.info("Duplicate lead, returning existing Enq_Id: %s", enq_id)
+    return {"message": "Lead already exists", "Enq_Id": enq_id, "duplicate": True}, 200
+
+def submit_lead_to_crm(extracted_data):
+    """Send a validated lead to the CRM; return a (body, status) pair"""
+    try:
+        response = crm_client.add_lead(extracted_data)
+        response.raise_for_status()
+
+        crm_response = record_lead(extracted_data, response)
+        app.logger.info("CRM API Response: %s", payload("crm", crm_response))
+        return {"message": "Lead submitted successfully", "crm_response": crm_response}, response.status_code
+
+    except requests.exceptions.HTTPError as http_err:
+        app.logger.error("CRM API HTTP Error: %s", http_err.response.text)
+        return {"error": "CRM API returned an error", "details": http_err.response.text}, http_err.response.status_code
+    except requests.exceptions.RequestException as req_err:
+        app.logger.error("CRM API Connection Error: %s", req_err)
+        return {"error": "Failed to connect to CRM system", "details": str(req_err)}, 503
+    except UpstreamUnavailable as e:
+        return upstream_unavailable(e)
+
+def upstream_unavailable(error):
+    """503 (body, status) for a call the circuit breaker or concurrency limit refused"""
+    app.logger.warning("Upstream call refused: %s", error)
+    body = unavailable_body(error)
+    if has_request_context():
+        g.retry_after = body["retry_after"]
+    return body, 503
+
+def enqueue_lead(extracted_data):
+    """Persist a lead to the outbox for the dispatcher to deliver; return a (body, 202) pair"""
+    tracking_id = lead_outbox.enqueue(extracted_data)
+    outbox_dispatcher.start()
+    outbox_dispatcher.notify()
+    app.logger.info("Lead queued for delivery with tracking id: %s", tracking_id)
+    return {
+        "message": "Lead accepted for delivery",
+        "tracking_id": tracking_id,
+        "status_url": f"/lead_status/{tracking_id}"
+    }, 202
+
+def wants_async_delivery():
+    """Async mode is picked per request (?async= or Prefer header) or by ADD_LEAD_ASYNC"""
+    flag = request.args.get("async")
+    if flag is not None:
+        return flag.lower() in ("1", "true", "yes")
+    if "respond-async" in request.headers.get("Prefer", ""):
+        return True
+    return ADD_LEAD_ASYNC
+
+# Response headers stored with an idempotent response and sent again on replay
+REPLAYED_HEADERS = ("Location",)
+
+def idempotent(view):
+    """Replay the stored response when a request repeats its Idempotency-Key"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return view(*args, **kwargs)
+
+        route = request.path
+        outcome, stored = idempotency_keys.begin(route, key, request_fingerprint(request.get_data()))
+        if outcome == REPLAY:
+            status, body, headers = stored
+            app.logger.info("Replaying response for Idempotency-Key: %s", key)
+            response = Response(body, status=status, mimetype="application/json", headers=headers)
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+        if outcome == IN_PROGRESS:
+            return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+        if outcome == MISMATCH:
+            return jsonify({"error": "Idempotency-Key was already used with a different request body"}), 422
+
+        response = app.make_response(view(*args, **kwargs))
+        if response.status_code >= 500:
+            # Transient failure: let the client retry with the same key
+            idempotency_keys.abandon(route, key)
+        else:
+            headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+            idempotency_keys.complete(route, key, response.status_code, response.get_data(), headers)
+        return response
+    return wrapper
+
+# Request metrics
+@app.before_request
+def start_request_metrics():
+    # Label by URL rule (e.g. /lead_status/<tracking_id>) to keep the number of series bounded
+    g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_started = request_started(g.metrics_route, request.method)
+    if request.is_json:
+        # Parsed once here (and cached by Flask) so JSON decoding shows up as its own stage
+        with stage("parse_json"):
+            request.get_json(silent=True)
+
+@app.before_request
+def limit_request_rate():
+    if request.method == "OPTIONS":
+        # CORS preflights do not count against the client's budget
+        return None
+    # remote_addr is the client address ProxyFix took from X-Forwarded-For
+    retry_after = rate_limiter.check(g.metrics_route, request.remote_addr)
+    if retry_after:
+        app.logger.warning("Rate limit exceeded on %s by %s", g.metrics_route, request.remote_addr)
+        g.retry_after = retry_after
+        return jsonify({"error": "Too many requests", "retry_after": retry_after}), 429
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    if "retry_after" in g:
+        response.headers["Retry-After"] = str(g.retry_after)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    # Runs after streamed bodies finish, so /chat/stream is timed end to end
+    if "metrics_started" in g:
+        request_finished(g.metrics_route, request.method, g.get("metrics_status"), g.metrics_started)
 
 # Routes
 @app.route('/')
@@ -95,65 +325,250 @@ def home():
         "documentation": "/docs"
     })
 
+@app.route('/stats')
+def stats():
+    """Expose runtime statistics for monitoring"""
+    return jsonify({
+        "crm_pool": crm_client.pool_stats(),
+        "outbox": lead_outbox.counts(),
+        "chat_cache": chat_cache.stats(),
+        "conversations": conversations.stats(),
+        "lead_index": lead_index.stats(),
+        "lead_mirror": lead_mirror.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "intent_router": intent_router.stats(),
+        "logging": log_handler.stats(),
+        "upstreams": guard_stats(),
+        "extraction": ner_status(),
+        "update_coalescing": update_coalescer.stats(),
+        "lazy_imports": lazy_module_stats(),
+        "json": json_codec.stats()
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for this worker process"""
+    return Response(render_metrics(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/add_lead', methods=['POST'])
+@idempotent
 def add_lead():
     """Handle lead submission with validation"""
     try:
         data = request.get_json(silent=True) or {}
-        app.logger.info(f"Received payload: {data}")  # Log the entire payload
+        app.logger.info("Received payload: %s", payload(request.path, data))
 
         if not data or "message" not in data:
             app.logger.error("Invalid request. No message provided.")
             return jsonify({"error": "Invalid request. No message provided"}), 400
 
-        app.logger.info(f"Incoming request message: {data['message']}")
+        app.logger.info("Incoming request message: %s", payload(request.path, data["message"]))
 
         # Extract data from the unstructured message
-        extracted_data = extract_data_from_message(data["message"])
-        app.logger.info(f"Extracted data: {extracted_data}")
+        with stage("extraction"):
+            extracted_data = extract_data_from_message(data["message"])
+        app.logger.info("Extracted data: %s", extracted_data)
+
+        # Validate required fields, email and phone
+        validation_error = validate_lead(extracted_data, app.logger)
+        if validation_error:
+            error, status = validation_error
+            return jsonify(error), status
+
+        # Repeat submissions get the existing lead back without a CRM round-trip
+        existing = find_existing_lead(extracted_data)
+        if existing:
+            body, status = existing
+            return jsonify(body), status
+
+        # Asynchronous mode: persist to the outbox and let the dispatcher deliver it
+        if wants_async_delivery():
+            body, status = enqueue_lead(extracted_data)
+            response = jsonify(body)
+            response.headers["Location"] = body["status_url"]
+            return response, status
 
-        # Validate required fields
-        required_fields = ['Enq_Id', 'firstnm', 'email', 'mobile']
-        missing_fields = [field for field in required_fields if not extracted_data.get(field)]
-        if missing_fields:
-            app.logger.warning(f"Missing fields: {missing_fields}")
-            return jsonify({"error": "Missing required fields", "missing": missing_fields}), 400
+        # API Call to Newton CRM
+        body, status = submit_lead_to_crm(extracted_data)
+        return jsonify(body), status
 
-        # Validate email and phone
-        if not validate_email(extracted_data['email']):
-            app.logger.error(f"Invalid email: {extracted_data['email']}")
-            return jsonify({"error": "Invalid email format"}), 400
+    except Exception as e:
+        app.logger.exception("Unexpected error in add_lead endpoint")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
-        if not validate_phone(extracted_data['mobile']):
-            app.logger.error(f"Invalid phone: {extracted_data['mobile']}")
-            return jsonify({"error": "Invalid phone number"}), 400
+def bulk_message(item):
+    """The message of one bulk item, or None if the item has none"""
+    message = item.get("message") if isinstance(item, dict) else item
+    return message if isinstance(message, str) and message else None
+
+def extract_bulk_items(items):
+    """Pair each bulk item with its extracted lead, extracting one batch of messages at a time"""
+    for batch in iter_batches(items):
+        messages = [None if isinstance(item, ValueError) else bulk_message(item) for item in batch]
+        with stage("extraction"):
+            extracted = iter(extract_data_from_messages([message for message in messages if message]))
+        for item, message in zip(batch, messages):
+            yield item, next(extracted) if message else None
+
+def prepare_bulk_item(entry):
+    """Validate one (item, extracted lead) pair; return (lead, None) or (None, (error, status))"""
+    item, extracted_data = entry
+    if isinstance(item, ValueError):
+        return None, ({"error": "Invalid JSON line", "details": str(item)}, 400)
+    if extracted_data is None:
+        return None, ({"error": "Invalid request. No message provided"}, 400)
+
+    validation_error = validate_lead(extracted_data, app.logger)
+    if validation_error:
+        return None, validation_error
+    existing = find_existing_lead(extracted_data)
+    if existing:
+        return None, existing
+    return extracted_data, None
+
+def bulk_lead_keys(extracted_data):
+    """Keys that make two leads in one bulk request the same lead (as the dedup index sees it)"""
+    if not lead_index.enabled:
+        return ()
+    return lead_keys(extracted_data.get("email"), extracted_data.get("mobile"))
+
+def bulk_duplicate(extracted_data, first_result):
+    """Result for a repeat of a lead submitted earlier in the same bulk request"""
+    # Found in the index once the first copy was accepted; otherwise it shares the first copy's failure
+    return find_existing_lead(extracted_data) or first_result
+
+@app.route('/add_leads', methods=['POST'])
+def add_leads():
+    """Handle bulk lead submission from a JSON array or an NDJSON stream"""
+    try:
+        if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+            # Decode line by line straight off the socket so large uploads stay out of memory
+            items = iter_ndjson(request.stream)
+        else:
+            data = request.get_json(silent=True)
+            if isinstance(data, dict):
+                data = data.get("messages")
+            if not isinstance(data, list):
+                app.logger.error("Invalid bulk request. Expected a JSON array or NDJSON.")
+                return jsonify({"error": "Invalid request. Expected a JSON array of messages or NDJSON"}), 400
+            items = data
+            app.logger.info("Received bulk request with %d items", len(items))
+
+        def generate():
+            totals = {"total": 0, "succeeded": 0, "failed": 0}
+            results = process_bulk(extract_bulk_items(items), prepare_bulk_item, submit_lead_to_crm,
+                                   keys=bulk_lead_keys, duplicate=bulk_duplicate)
+            for index, (body, status) in results:
+                totals["total"] += 1
+                totals["succeeded" if status < 400 else "failed"] += 1
+                yield json_codec.dumps({"index": index, "status": status, **body}) + "\n"
+            app.logger.info("Bulk request finished: %s", totals)
+            yield json_codec.dumps({"summary": totals}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
-        # API Call to Newton CRM
-        try:
-            headers = {"Content-Type": "application/json"}
-            response = requests.post(ADD_LEAD_API_URL, json=extracted_data, headers=headers, timeout=10)
-            response.raise_for_status()
+    except Exception as e:
+        app.logger.exception("Unexpected error in add_leads endpoint")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
-            app.logger.info(f"CRM API Response: {response.json()}")
-            return jsonify({"message": "Lead submitted successfully", "crm_response": response.json()}), response.status_code
+@app.route('/lead_status/<tracking_id>', methods=['GET'])
+def lead_status(tracking_id):
+    """Report the delivery state of a lead accepted in async mode"""
+    try:
+        state = lead_outbox.get(tracking_id)
+        if state is None:
+            return jsonify({"error": "Unknown tracking id"}), 404
+        return jsonify(state), 200
+    except Exception as e:
+        app.logger.exception("Unexpected error in lead_status endpoint")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
-        except requests.exceptions.HTTPError as http_err:
-            app.logger.error(f"CRM API HTTP Error: {http_err.response.text}")
-            return jsonify({"error": "CRM API returned an error", "details": http_err.response.text}), http_err.response.status_code
-        except requests.exceptions.RequestException as req_err:
-            app.logger.error(f"CRM API Connection Error: {str(req_err)}")
-            return jsonify({"error": "Failed to connect to CRM system", "details": str(req_err)}), 503
+def lead_body(entry, source, stale=False):
+    """GET /lead response for a mirror entry"""
+    return {"lead": entry["lead"], "source": source, "synced_at": entry["synced_at"], "stale": stale}
+
+def crm_lead(crm_response):
+    """The lead in a CRM Get Lead reply (its "data" object when the reply wraps it)"""
+    if isinstance(crm_response, dict) and isinstance(crm_response.get("data"), dict):
+        return crm_response["data"]
+    return crm_response if isinstance(crm_response, dict) else {}
+
+def read_lead(enq_id, entry=None):
+    """Serve a lead from the mirror while fresh, else refresh it from the CRM; return a (body, status) pair
+
+    If the CRM cannot be reached (or has no Get Lead URL), an expired copy is served with "stale": true.
+    """
+    if entry is None:
+        entry = lead_mirror.get(enq_id)
+    if entry is not None and entry["fresh"]:
+        return lead_body(entry, "mirror"), 200
+    if not crm_client.get_url:
+        if entry is not None:
+            return lead_body(entry, "mirror", stale=True), 200
+        return {"error": "Lead not found"}, 404
+    try:
+        response = crm_client.get_lead(enq_id)
+        if response.status_code == 404:
+            lead_mirror.delete(enq_id)
+            return {"error": "Lead not found"}, 404
+        response.raise_for_status()
+        entry = lead_mirror.put(enq_id, crm_lead(response_json(response).value))
+        return lead_body(entry, "crm"), 200
+    except (requests.exceptions.RequestException, UpstreamUnavailable) as e:
+        if entry is not None:
+            app.logger.warning("Serving stale lead %s, CRM refresh failed: %s", enq_id, e)
+            g.pop("retry_after", None)
+            return lead_body(entry, "mirror", stale=True), 200
+        if isinstance(e, UpstreamUnavailable):
+            return upstream_unavailable(e)
+        if isinstance(e, requests.exceptions.HTTPError):
+            app.logger.error("CRM API HTTP Error: %s", e.response.text)
+            return {"error": "CRM API returned an error", "details": e.response.text}, e.response.status_code
+        app.logger.error("CRM API Connection Error: %s", e)
+        return {"error": "Failed to connect to CRM system", "details": str(e)}, 503
+
+@app.route('/lead/<enq_id>', methods=['GET'])
+def get_lead(enq_id):
+    """Read a lead back through the local mirror"""
+    try:
+        body, status = read_lead(enq_id)
+        return jsonify(body), status
+    except Exception as e:
+        app.logger.exception("Unexpected error in get_lead endpoint")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
+@app.route('/lead', methods=['GET'])
+def find_lead():
+    """Look a lead up by ?email= or ?mobile= through the mirror and the dedup index"""
+    try:
+        email = request.args.get("email")
+        mobile = request.args.get("mobile")
+        if not email and not mobile:
+            return jsonify({"error": "Invalid request. Provide email or mobile"}), 400
+
+        entry = lead_mirror.find(email, mobile)
+        if entry is not None:
+            body, status = read_lead(entry["lead"]["Enq_Id"], entry)
+        else:
+            # Leads created before the mirror existed are still known to the dedup index
+            enq_id = lead_index.lookup(email, mobile)
+            body, status = read_lead(enq_id) if enq_id else ({"error": "Lead not found"}, 404)
+        if status == 200 and not lead_matches(body["lead"], email, mobile):
+            # Never hand out a lead that is not the one asked for (e.g. an Enq_Id reused by the CRM)
+            app.logger.warning("Lead %s does not match the email/mobile looked up", body["lead"].get("Enq_Id"))
+            body, status = {"error": "Lead not found"}, 404
+        return jsonify(body), status
     except Exception as e:
-        app.logger.exception("Unexpected error in add_lead endpoint")
+        app.logger.exception("Unexpected error in find_lead endpoint")
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
 @app.route('/update_lead', methods=['PUT'])
+@idempotent
 def update_lead():
     """Handle lead update with validation"""
     try:
         data = request.get_json(silent=True) or {}
-        app.logger.info(f"Received payload for update: {data}")  # Log the entire payload
+        app.logger.info("Received payload for update: %s", payload(request.path, data))
 
         # Validate if Enq_Id is provided
         if not data or "Enq_Id" not in data:
@@ -169,66 +584,222 @@ def update_lead():
             return jsonify({"error": "No fields provided to update"}), 400
 
         # Log the fields to be updated
-        app.logger.info(f"Updating lead with Enq_Id: {enq_id}, Fields: {update_fields}")
+        app.logger.info("Updating lead with Enq_Id: %s, Fields: %s", enq_id, payload(request.path, update_fields))
 
         # API Call to Newton CRM for updating the lead
         try:
-            headers = {"Content-Type": "application/json"}
-            response = requests.put(f"{UPDATE_LEAD_API_URL}/{enq_id}", json=update_fields, headers=headers, timeout=30)
+            response, updates = update_coalescer.submit(enq_id, update_fields)
             response.raise_for_status()
 
-            app.logger.info(f"CRM API Update Response: {response.json()}")
-            return jsonify({"message": "Lead updated successfully", "crm_response": response.json()}), response.status_code
+            crm_response = response_json(response)
+            app.logger.info("CRM API Update Response: %s", payload("crm", crm_response))
+            body = {"message": "Lead updated successfully", "crm_response": crm_response}
+            if updates > 1:
+                body["coalesced_updates"] = updates
+            return jsonify(body), response.status_code
 
         except requests.exceptions.HTTPError as http_err:
-            app.logger.error(f"CRM API HTTP Error: {http_err.response.text}")
+            app.logger.error("CRM API HTTP Error: %s", http_err.response.text)
             return jsonify({"error": "CRM API returned an error", "details": http_err.response.text}), http_err.response.status_code
         except requests.exceptions.RequestException as req_err:
-            app.logger.error(f"CRM API Connection Error: {str(req_err)}")
+            app.logger.error("CRM API Connection Error: %s", req_err)
             return jsonify({"error": "Failed to connect to CRM system", "details": str(req_err)}), 503
+        except UpstreamUnavailable as e:
+            body, status = upstream_unavailable(e)
+            return jsonify(body), status
 
     except Exception as e:
         app.logger.exception("Unexpected error in update_lead endpoint")
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
     
+def capture_chat_lead(session_id, conversation, user_message):
+    """Update the conversation's lead details from the new message; submit the lead once complete.
+
+    Returns the lead state to report to the client, or None while nothing has been captured.
+    """
+    if not CHAT_LEAD_CAPTURE:
+        return None
+    state = conversation.setdefault("lead", new_lead_state())
+    if not state["submitted"]:
+        with stage("extraction"):
+            filled = update_lead_state(state, user_message)
+        if filled:
+            app.logger.info("Captured lead fields from chat: %s", filled)
+        extracted_data = lead_from_state(state)
+        if extracted_data is not None:
+            submit_chat_lead(state, extracted_data)
+            if state["submitted"]:
+                # Saved now rather than with the exchange: if the model call fails or the
+                # client disconnects, the next turn must not queue the same lead again
+                conversations.save(session_id, conversation)
+    if not any(state[field] for field in LEAD_CAPTURE_FIELDS):
+        return None
+    return {key: value for key, value in state.items() if key != "name_explicit"}
+
+def submit_chat_lead(state, extracted_data):
+    """Hand a conversation's lead to the outbox; it is marked submitted unless that failed.
+
+    The CRM call never runs inside the chat request: its latency (and timeout)
+    would delay the reply and the first streamed byte. The dispatcher delivers
+    and retries it; /lead_status/<tracking_id> reports the outcome.
+    """
+    try:
+        existing = find_existing_lead(extracted_data)
+        body, status = existing if existing else enqueue_lead(extracted_data)
+    except Exception as e:
+        # Tried again on the next message; the chat reply itself is not an error
+        app.logger.warning("Chat lead submission failed: %s", e)
+        state["error"] = "Failed to queue lead"
+        return
+    state.pop("error", None)
+    state["submitted"] = True
+    if "Enq_Id" in body:
+        state["Enq_Id"] = body["Enq_Id"]
+    if "tracking_id" in body:
+        state["tracking_id"] = body["tracking_id"]
+    app.logger.info("Lead captured from chat submitted (%s): %s", status, payload("crm", body))
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handle chat messages and return a response."""
     try:
         data = request.get_json(silent=True) or {}
-        app.logger.info(f"Received chat message: {data}")
+        app.logger.info("Received chat message: %s", payload(request.path, data))
 
         if not data or "message" not in data:
             app.logger.error("Invalid request. No message provided.")
             return jsonify({"error": "Invalid request. No message provided"}), 400
 
         user_message = data["message"]
+        session_id = chat_session_id(data)
+        with stage("conversation"):
+            conversation = conversations.load(session_id)
+            prompt = conversations.build_prompt(conversation, user_message)
+        lead = capture_chat_lead(session_id, conversation, user_message)
+        with stage("intent"):
+            local_response = intent_router.reply(user_message, lead)
+        if local_response is not None:
+            app.logger.info("Local bot response: %s", payload(request.path, local_response))
+            conversations.append(session_id, conversation, user_message, local_response)
+            return jsonify(chat_reply(local_response, session_id, lead)), 200
+        params = completion_params()
+
+        # Serve repeated questions from the cache before calling the model
+        bot_response = chat_cache.get(prompt, params)
+        if bot_response is not None:
+            app.logger.info("Cached bot response: %s", payload(request.path, bot_response))
+            conversations.append(session_id, conversation, user_message, bot_response)
+            return jsonify(chat_reply(bot_response, session_id, lead)), 200
 
         # Example: Generate a response using OpenAI API
         try:
-            response = openai.Completion.create(
-                engine="text-davinci-003",
-                prompt=f"User: {user_message}\nBot:",
-                max_tokens=150,
-                temperature=0.7,
-            )
-            bot_response = response.choices[0].text.strip()
-            app.logger.info(f"Generated bot response: {bot_response}")
-            return jsonify({"response": bot_response}), 200
-
+            bot_response = complete(prompt, **params)
+            chat_cache.set(prompt, params, bot_response)
+            conversations.append(session_id, conversation, user_message, bot_response)
+            app.logger.info("Generated bot response: %s", payload(request.path, bot_response))
+            return jsonify(chat_reply(bot_response, session_id, lead)), 200
+
+        except UpstreamUnavailable as e:
+            body, status = upstream_unavailable(e)
+            return jsonify(body), status
         except Exception as e:
-            app.logger.error(f"Error generating response: {str(e)}")
+            app.logger.error("Error generating response: %s", e)
             return jsonify({"error": "Failed to generate response", "details": str(e)}), 500
 
     except Exception as e:
         app.logger.exception("Unexpected error in chat endpoint")
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
     
+def chat_reply(bot_response, session_id, lead):
+    """Chat response body; `lead` carries the details captured from the conversation so far"""
+    body = {"response": bot_response, "session_id": session_id}
+    if lead is not None:
+        body["lead"] = lead
+    return body
+
+def chat_session_id(data):
+    """Conversation id from the body or X-Session-Id header; a new one starts a conversation"""
+    session_id = data.get("session_id") or request.headers.get("X-Session-Id")
+    return str(session_id) if session_id else uuid.uuid4().hex
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Events message"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json_codec.dumps(data)}\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream the chat response to the browser as Server-Sent Events."""
+    try:
+        data = request.get_json(silent=True) or {}
+        app.logger.info("Received streaming chat message: %s", payload(request.path, data))
+
+        if not data or "message" not in data:
+            app.logger.error("Invalid request. No message provided.")
+            return jsonify({"error": "Invalid request. No message provided"}), 400
+
+        user_message = data["message"]
+        session_id = chat_session_id(data)
+        with stage("conversation"):
+            conversation = conversations.load(session_id)
+            prompt = conversations.build_prompt(conversation, user_message)
+        lead = capture_chat_lead(session_id, conversation, user_message)
+        with stage("intent"):
+            local_response = intent_router.reply(user_message, lead)
+        params = completion_params()
+        cached_response = local_response if local_response is not None else chat_cache.get(prompt, params)
+        route = request.path
+
+        def generate():
+            chunks = []
+            outcome = "client disconnected"
+            # Send the first byte straight away, before waiting on the model
+            yield ": stream-open\n\n"
+            if cached_response is not None:
+                app.logger.info("%s bot response: %s", "Cached" if local_response is None else "Local",
+                                payload(route, cached_response))
+                conversations.append(session_id, conversation, user_message, cached_response)
+                yield sse_event({"token": cached_response})
+                yield sse_event(chat_reply(cached_response, session_id, lead), event="done")
+                return
+            tokens = stream_completion(prompt, **params)
+            try:
+                for text in tokens:
+                    chunks.append(text)
+                    yield sse_event({"token": text})
+                outcome = "completed"
+                bot_response = "".join(chunks).strip()
+                chat_cache.set(prompt, params, bot_response)
+                conversations.append(session_id, conversation, user_message, bot_response)
+                yield sse_event(chat_reply(bot_response, session_id, lead), event="done")
+            except GeneratorExit:
+                raise
+            except Exception as e:
+                outcome = "failed"
+                app.logger.error("Error streaming response: %s", e)
+                yield sse_event({"error": "Failed to generate response", "details": str(e)}, event="error")
+            finally:
+                # Closes the upstream stream too when the browser went away mid-response
+                tokens.close()
+                app.logger.info("Generated bot response (%s): %s", outcome, payload(route, "".join(chunks).strip()))
+
+        response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"  # Disable proxy buffering (nginx / ARR)
+        response.headers["X-Session-Id"] = session_id
+        return response
+
+    except Exception as e:
+        app.logger.exception("Unexpected error in chat_stream endpoint")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
 @app.after_request
 def add_cors_headers(response):
     response.headers["Access-Control-Allow-Origin"] = "http://localhost:3000"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization"
+    # Idempotency-Key, X-Session-Id and Prefer are request headers this API reads; the exposed ones it sets
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization,Idempotency-Key,X-Session-Id,Prefer"
     response.headers["Access-Control-Allow-Methods"] = "GET,POST,PUT,DELETE,OPTIONS"
+    response.headers["Access-Control-Expose-Headers"] = "X-Session-Id,Retry-After,Idempotent-Replayed"
     return response
 
 
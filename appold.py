@@ -8,8 +8,8 @@ from logging.handlers import RotatingFileHandler
 from flask_cors import CORS
 from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
-import pyodbc  # For MSSQL connection
 import uuid 
+from db_pool import get_writer
 
 # Load environment variables from .env file
 load_dotenv()
@@ -29,12 +29,7 @@ NEWTON_CRM_API = os.getenv("CRM_API_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 openai.api_key = OPENAI_API_KEY
 
-# MSSQL Database Configuration
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT", "1433")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
+# MSSQL connections (DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD) come from the pool shared in db_pool.py
 
 # Logging Setup
 LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
@@ -86,39 +81,21 @@ def extract_data_from_message(message):
 
     return extracted_data
 
-def get_db_connection():
-    """Establish a connection to the MSSQL database."""
-    try:
-        connection_string = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={DB_HOST},{DB_PORT};"
-            f"DATABASE={DB_NAME};"
-            f"UID={DB_USER};"
-            f"PWD={DB_PASSWORD};"
-        )
-        conn = pyodbc.connect(connection_string)
-        app.logger.info("Successfully connected to MSSQL database.")
-        return conn
-    except pyodbc.Error as e:
-        app.logger.error(f"Error connecting to MSSQL database: {str(e)}")
-        raise
+# Write-behind batcher for EnquiryDetail inserts, on the shared connection pool
+ENQUIRY_INSERT_SQL = """
+INSERT INTO EnquiryDetail (
+    Enq_Id, Enq_Date, Name, Mobile, Email, Proprty_ref, Descrip, Budget, Remark, Firstnm, Lastnm
+) VALUES (
+    ?, GETDATE(), ?, ?, ?, ?, ?, ?, ?, ?, ?
+)
+"""
+enquiry_writer = get_writer(ENQUIRY_INSERT_SQL, logger=app.logger)
 
 def insert_into_enquiry_detail(extracted_data):
     """Insert lead data into EnquiryDetail table."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # SQL query to insert data into EnquiryDetail
-        query = """
-        INSERT INTO EnquiryDetail (
-            Enq_Id, Enq_Date, Name, Mobile, Email, Proprty_ref, Descrip, Budget, Remark, Firstnm, Lastnm
-        ) VALUES (
-            ?, GETDATE(), ?, ?, ?, ?, ?, ?, ?, ?, ?
-        )
-        """
-        # Map extracted data to EnquiryDetail fields
-        cursor.execute(query, (
+        # Map extracted data to EnquiryDetail fields; concurrent inserts share one executemany
+        enquiry_writer.write((
             extracted_data["Enq_Id"],
             extracted_data["firstnm"] + " " + extracted_data.get("middlenm", ""),
             extracted_data["mobile"],
@@ -130,9 +107,6 @@ def insert_into_enquiry_detail(extracted_data):
             extracted_data["firstnm"],
             extracted_data.get("lastnm", "N/A")
         ))
-
-        conn.commit()
-        conn.close()
         return {"message": "Data successfully inserted into EnquiryDetail"}
     except Exception as e:
         app.logger.error(f"Error inserting data into EnquiryDetail: {str(e)}")
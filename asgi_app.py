@@ -0,0 +1,349 @@
+import asyncio
+import logging
+import os
+import uuid
+import httpx
+from dotenv import load_dotenv
+
+# Load environment variables from .env file, before the modules below read their settings
+load_dotenv()
+
+from crm_client import AsyncCRMClient  # noqa: E402
+from coalesce import AsyncUpdateCoalescer  # noqa: E402
+from extraction import extract_data_from_message, load_ner_model, validate_lead, NER_ENABLED  # noqa: E402
+from llm_client import acomplete, completion_params  # noqa: E402
+from response_cache import create_response_cache  # noqa: E402
+from conversation_store import create_conversation_store  # noqa: E402
+from log_pipeline import setup_logging, payload  # noqa: E402
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics, stage, request_started, request_finished  # noqa: E402
+from resilience import UpstreamUnavailable, unavailable_body  # noqa: E402
+from dedup import (SQLiteStore, LeadIndex, IdempotencyStore, assigned_enq_id, request_fingerprint,  # noqa: E402
+                   REPLAY, IN_PROGRESS, MISMATCH)
+import json_codec  # noqa: E402
+from json_codec import response_json  # noqa: E402
+
+# Async (ASGI) variant of app.py for the I/O-bound routes. Same request and
+# response contracts; run it with an ASGI server, e.g.
+#
+#   uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+# Environment Variables
+ADD_LEAD_API_URL = os.getenv("CRM_API_URL")  # Add Lead URL
+UPDATE_LEAD_API_URL = os.getenv("CRM_UPDATE_API_URL")  # Update Lead URL
+
+# Logging Setup
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+LOG_FILE_PATH = os.path.join(LOG_DIR, 'asgi_app.log')
+
+logger = logging.getLogger("asgi_app")
+log_handler = setup_logging(logger, LOG_FILE_PATH)
+
+if not ADD_LEAD_API_URL or not UPDATE_LEAD_API_URL:
+    logger.error("CRM API URLs are not properly configured in the .env file.")
+    raise ValueError("CRM API URLs are missing. Please check your .env file.")
+
+crm_client = AsyncCRMClient(ADD_LEAD_API_URL, UPDATE_LEAD_API_URL)
+chat_cache = create_response_cache()
+conversations = create_conversation_store()
+dedup_store = SQLiteStore()
+lead_index = LeadIndex(dedup_store)
+idempotency_keys = IdempotencyStore(dedup_store)
+update_coalescer = AsyncUpdateCoalescer(crm_client.update_lead)
+
+if NER_ENABLED:
+    load_ner_model(logger)
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"http://localhost:3000"),
+    (b"access-control-allow-headers", b"Content-Type,Authorization,Idempotency-Key,X-Session-Id,Prefer"),
+    (b"access-control-allow-methods", b"GET,POST,PUT,DELETE,OPTIONS"),
+    (b"access-control-expose-headers", b"X-Session-Id,Retry-After,Idempotent-Replayed"),
+]
+
+
+class Request:
+    """The parts of an ASGI HTTP request the routes need."""
+
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        self.body = body
+
+    def get_json(self):
+        """Parsed JSON body, or None (like Flask's get_json(silent=True))"""
+        if "json" not in self.headers.get("content-type", ""):
+            return None
+        try:
+            with stage("parse_json"):
+                return json_codec.loads(self.body)
+        except ValueError:
+            return None
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def send_json(send, payload, status=200, body=None):
+    """Send `payload` as JSON; `body` is its already-encoded form, if the caller has it"""
+    extra_headers = []
+    if status == 503 and "retry_after" in payload:
+        extra_headers.append((b"retry-after", str(payload["retry_after"]).encode("ascii")))
+    if body is None:
+        body = json_codec.dumpb(payload, sort_keys=True)
+    await send_body(send, body, b"application/json", status, extra_headers)
+
+
+async def send_body(send, body, content_type, status=200, extra_headers=()):
+    headers = [
+        (b"content-type", content_type),
+        (b"content-length", str(len(body)).encode("ascii")),
+    ] + CORS_HEADERS + list(extra_headers)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+# Routes
+async def home(request):
+    return {
+        "status": "active",
+        "message": "AI Chatbot API is running",
+        "version": "1.0.0",
+        "documentation": "/docs"
+    }, 200
+
+
+async def add_lead(request):
+    """Handle lead submission with validation"""
+    data = request.get_json() or {}
+    logger.info("Received payload: %s", payload(request.path, data))
+
+    if not data or "message" not in data:
+        logger.error("Invalid request. No message provided.")
+        return {"error": "Invalid request. No message provided"}, 400
+
+    with stage("extraction"):
+        if NER_ENABLED:
+            # The recognizer takes milliseconds per message; keep it off the event loop
+            extracted_data = await asyncio.to_thread(extract_data_from_message, data["message"])
+        else:
+            extracted_data = extract_data_from_message(data["message"])
+    logger.info("Extracted data: %s", extracted_data)
+
+    validation_error = validate_lead(extracted_data, logger)
+    if validation_error:
+        return validation_error
+
+    # The index takes a lock and may query SQLite, so it runs in a thread like the idempotency keys
+    with stage("dedup_lookup"):
+        enq_id = await asyncio.to_thread(lead_index.lookup, extracted_data.get("email"), extracted_data.get("mobile"))
+    if enq_id is not None:
+        logger.info("Duplicate lead, returning existing Enq_Id: %s", enq_id)
+        return {"message": "Lead already exists", "Enq_Id": enq_id, "duplicate": True}, 200
+
+    try:
+        response = await crm_client.add_lead(extracted_data)
+        response.raise_for_status()
+        crm_response = response_json(response)
+        await asyncio.to_thread(lead_index.record, extracted_data.get("email"), extracted_data.get("mobile"),
+                                assigned_enq_id(crm_response.value))
+        logger.info("CRM API Response: %s", payload("crm", crm_response))
+        return {"message": "Lead submitted successfully", "crm_response": crm_response}, response.status_code
+
+    except httpx.HTTPStatusError as http_err:
+        logger.error("CRM API HTTP Error: %s", http_err.response.text)
+        return {"error": "CRM API returned an error", "details": http_err.response.text}, http_err.response.status_code
+    except httpx.RequestError as req_err:
+        logger.error("CRM API Connection Error: %s", req_err)
+        return {"error": "Failed to connect to CRM system", "details": str(req_err)}, 503
+    except UpstreamUnavailable as e:
+        logger.warning("Upstream call refused: %s", e)
+        return unavailable_body(e), 503
+
+
+async def update_lead(request):
+    """Handle lead update with validation"""
+    data = request.get_json() or {}
+    logger.info("Received payload for update: %s", payload(request.path, data))
+
+    if not data or "Enq_Id" not in data:
+        logger.error("Invalid request. Enq_Id is required.")
+        return {"error": "Invalid request. Enq_Id is required"}, 400
+
+    enq_id = data.get("Enq_Id")
+    update_fields = {key: value for key, value in data.items() if key != "Enq_Id"}
+
+    if not update_fields:
+        logger.error("No fields provided to update.")
+        return {"error": "No fields provided to update"}, 400
+
+    logger.info("Updating lead with Enq_Id: %s, Fields: %s", enq_id, payload(request.path, update_fields))
+
+    try:
+        response, updates = await update_coalescer.submit(enq_id, update_fields)
+        response.raise_for_status()
+        crm_response = response_json(response)
+        logger.info("CRM API Update Response: %s", payload("crm", crm_response))
+        body = {"message": "Lead updated successfully", "crm_response": crm_response}
+        if updates > 1:
+            body["coalesced_updates"] = updates
+        return body, response.status_code
+
+    except httpx.HTTPStatusError as http_err:
+        logger.error("CRM API HTTP Error: %s", http_err.response.text)
+        return {"error": "CRM API returned an error", "details": http_err.response.text}, http_err.response.status_code
+    except httpx.RequestError as req_err:
+        logger.error("CRM API Connection Error: %s", req_err)
+        return {"error": "Failed to connect to CRM system", "details": str(req_err)}, 503
+    except UpstreamUnavailable as e:
+        logger.warning("Upstream call refused: %s", e)
+        return unavailable_body(e), 503
+
+
+async def chat(request):
+    """Handle chat messages and return a response."""
+    data = request.get_json() or {}
+    logger.info("Received chat message: %s", payload(request.path, data))
+
+    if not data or "message" not in data:
+        logger.error("Invalid request. No message provided.")
+        return {"error": "Invalid request. No message provided"}, 400
+
+    user_message = data["message"]
+    session_id = str(data.get("session_id") or request.headers.get("x-session-id") or uuid.uuid4().hex)
+    with stage("conversation"):
+        conversation = conversations.load(session_id)
+        prompt = conversations.build_prompt(conversation, user_message)
+    params = completion_params()
+
+    bot_response = chat_cache.get(prompt, params)
+    if bot_response is not None:
+        logger.info("Cached bot response: %s", payload(request.path, bot_response))
+        conversations.append(session_id, conversation, user_message, bot_response)
+        return {"response": bot_response, "session_id": session_id}, 200
+
+    try:
+        bot_response = await acomplete(prompt, **params)
+        chat_cache.set(prompt, params, bot_response)
+        conversations.append(session_id, conversation, user_message, bot_response)
+        logger.info("Generated bot response: %s", payload(request.path, bot_response))
+        return {"response": bot_response, "session_id": session_id}, 200
+
+    except UpstreamUnavailable as e:
+        logger.warning("Upstream call refused: %s", e)
+        return unavailable_body(e), 503
+    except Exception as e:
+        logger.error("Error generating response: %s", e)
+        return {"error": "Failed to generate response", "details": str(e)}, 500
+
+
+ROUTES = {
+    ("GET", "/"): home,
+    ("POST", "/add_lead"): add_lead,
+    ("PUT", "/update_lead"): update_lead,
+    ("POST", "/chat"): chat,
+}
+ROUTE_PATHS = {path for _, path in ROUTES}
+# Routes that honour Idempotency-Key like app.py's @idempotent ones
+IDEMPOTENT_ROUTES = {add_lead, update_lead}
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await crm_client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope["type"] == "lifespan":
+        await handle_lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    request = Request(scope, await read_body(receive))
+    metrics_route = request.path if request.path in ROUTE_PATHS or request.path == "/metrics" else "unmatched"
+    started = request_started(metrics_route, request.method)
+    status = None
+    try:
+        status = await dispatch(request, send)
+    finally:
+        request_finished(metrics_route, request.method, status, started)
+
+
+async def dispatch(request, send):
+    """Route one request and send its response; returns the status code"""
+    if request.method == "OPTIONS" and request.path in ROUTE_PATHS:
+        await send_json(send, {}, 200)
+        return 200
+
+    if request.method == "GET" and request.path == "/metrics":
+        await send_body(send, render_metrics().encode("utf-8"), METRICS_CONTENT_TYPE.encode("ascii"))
+        return 200
+
+    route = ROUTES.get((request.method, request.path))
+    if route is None:
+        status = 405 if request.path in ROUTE_PATHS else 404
+        await send_json(send, {"error": "Method Not Allowed" if status == 405 else "Not Found"}, status)
+        return status
+
+    key = request.headers.get("idempotency-key")
+    if key and route in IDEMPOTENT_ROUTES:
+        return await dispatch_idempotent(route, request, send, key)
+
+    body, status = await run_route(route, request)
+    await send_json(send, body, status)
+    return status
+
+
+async def run_route(route, request):
+    try:
+        return await route(request)
+    except Exception as e:
+        logger.exception("Unexpected error in %s endpoint", route.__name__)
+        return {"error": "Internal server error", "details": str(e)}, 500
+
+
+async def dispatch_idempotent(route, request, send, key):
+    """Replay the stored response when a request repeats its Idempotency-Key.
+
+    The key store is SQLite, shared with app.py's workers, so its calls run in a
+    thread to keep the event loop free.
+    """
+    outcome, stored = await asyncio.to_thread(
+        idempotency_keys.begin, request.path, key, request_fingerprint(request.body)
+    )
+    if outcome == REPLAY:
+        status, body, headers = stored
+        logger.info("Replaying response for Idempotency-Key: %s", key)
+        extra_headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+        await send_body(send, body, b"application/json", status, extra_headers + [(b"idempotent-replayed", b"true")])
+        return status
+    if outcome == IN_PROGRESS:
+        await send_json(send, {"error": "A request with this Idempotency-Key is still in progress"}, 409)
+        return 409
+    if outcome == MISMATCH:
+        await send_json(send, {"error": "Idempotency-Key was already used with a different request body"}, 422)
+        return 422
+
+    payload, status = await run_route(route, request)
+    body = json_codec.dumpb(payload, sort_keys=True)
+    if status >= 500:
+        # Transient failure: let the client retry with the same key
+        await asyncio.to_thread(idempotency_keys.abandon, request.path, key)
+    else:
+        await asyncio.to_thread(idempotency_keys.complete, request.path, key, status, body)
+    await send_json(send, payload, status, body)
+    return status
@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import SERVERS, drive, server_env, wait_until_ready  # noqa: E402
+from benchmarks.stubs import free_port, spawn_stub  # noqa: E402
+
+# Compares the sync Flask app (one waitress process) with the ASGI app (one
+# uvicorn process) while the CRM and OpenAI stubs hold every call for
+# --upstream-latency seconds. See benchmarks.load_test for the full suite.
+#
+#   python -m benchmarks.bench_async_vs_sync --concurrency 200 --requests 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync (waitress) vs async (uvicorn) serving comparison")
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--routes", default="add_lead,update_lead,chat")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="Seconds the stubs hold each call")
+    parser.add_argument("--sync-threads", type=int, default=8, help="waitress threads for the sync app")
+    args = parser.parse_args()
+
+    crm_process, crm_url = spawn_stub("crm", latency=args.upstream_latency)
+    openai_process, openai_url = spawn_stub("openai", latency=args.upstream_latency)
+    data_dir = tempfile.mkdtemp(prefix="bench_async_vs_sync_")
+    env = server_env(crm_url, openai_url, data_dir)
+
+    results = {"upstream_latency_s": args.upstream_latency, "modes": {}}
+    try:
+        for mode in args.modes.split(","):
+            port = free_port()
+            process = subprocess.Popen(SERVERS[mode](port, args.sync_threads), cwd=ROOT, env=env)
+            base_url = f"http://127.0.0.1:{port}"
+            try:
+                wait_until_ready(base_url, process)
+                results["modes"][mode] = {
+                    route: drive(base_url, route, args.concurrency, args.requests)
+                    for route in args.routes.split(",")
+                }
+            finally:
+                process.terminate()
+                process.wait(10)
+    finally:
+        crm_process.terminate()
+        openai_process.terminate()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
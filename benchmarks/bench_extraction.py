@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import extract_data_from_message, scan_message  # noqa: E402
+
+# Realistic chat messages as they arrive from the widget
+CORPUS = [
+    "Hi",
+    "What are your office timings?",
+    "Is there any 2BHK available near Baner under 80 lakhs?",
+    "my name is Ravi, email ravi.kumar@gmail.com, phone 9876543210",
+    "I am Asha Patil. You can reach me on +91 9123456789 or asha.patil@yahoo.co.in",
+    "This is Meera from Pune, call me at 09812345678",
+    "Please share the brochure on rohit_s+leads@outlook.com",
+    "name Sandeep 919988776655 sandeep@company.in looking for a 3BHK with parking, budget around 1.2 Cr",
+    "Thanks for the details. I will visit the site on Saturday morning around 11 am with my family.",
+    "Can you call me back later? My number is +91-7012345678. Best time is after 6 pm.",
+]
+
+# Long pasted messages that used to trigger heavy backtracking
+PATHOLOGICAL = {
+    "long_token_no_at": "a" * 20000,
+    "dotted_words": "word." * 5000,
+    "long_digits": "1" * 20000,
+    "pasted_paragraph": ("We are looking for a property close to the metro station with good schools nearby. " * 200),
+}
+
+
+def legacy_extract(message):
+    """The original per-call re.search implementation, kept as the baseline"""
+    extracted_data = {"Enq_Id": "12345", "firstnm": "", "email": "", "mobile": ""}
+    email_match = re.search(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", message)
+    if email_match:
+        extracted_data["email"] = email_match.group(0)
+    mobile_match = re.search(r"(\+91[\-\s]?)?[0]?(91)?[789]\d{9}", message)
+    if mobile_match:
+        extracted_data["mobile"] = mobile_match.group(0)
+    name_match = re.search(r"(my name is|I am|this is|name is|name)\s+([a-zA-Z]+)", message, re.IGNORECASE)
+    if name_match:
+        extracted_data["firstnm"] = name_match.group(2).strip()
+    return extracted_data
+
+
+def time_per_call(func, messages, number):
+    """Mean microseconds per message over `number` passes of `messages`"""
+    def run():
+        for message in messages:
+            func(message)
+    seconds = min(timeit.repeat(run, number=number, repeat=3))
+    return seconds / (number * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark for lead extraction")
+    parser.add_argument("--number", type=int, default=2000, help="Passes over the chat corpus")
+    parser.add_argument("--pathological-number", type=int, default=3, help="Passes over each pathological input")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = {
+        "corpus_messages": len(CORPUS),
+        "corpus_us_per_message": {
+            "legacy": time_per_call(legacy_extract, CORPUS, args.number),
+            "extract_data_from_message": time_per_call(extract_data_from_message, CORPUS, args.number),
+            "scan_message": time_per_call(scan_message, CORPUS, args.number),
+        },
+        "pathological_us_per_message": {},
+    }
+    for name, message in PATHOLOGICAL.items():
+        results["pathological_us_per_message"][name] = {
+            "length": len(message),
+            "legacy": time_per_call(legacy_extract, [message], args.pathological_number),
+            "extract_data_from_message": time_per_call(extract_data_from_message, [message], args.pathological_number),
+            "scan_message": time_per_call(scan_message, [message], args.pathological_number),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Chat corpus ({len(CORPUS)} messages), microseconds per message:")
+    for name, value in results["corpus_us_per_message"].items():
+        print(f"  {name:<28} {value:10.2f}")
+    print("Pathological inputs, microseconds per message:")
+    for name, row in results["pathological_us_per_message"].items():
+        print(f"  {name:<20} len={row['length']:<6} legacy={row['legacy']:12.1f} "
+              f"extract={row['extract_data_from_message']:10.1f} scan_message={row['scan_message']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import server_env  # noqa: E402
+
+# Per-request JSON cost of the /add_lead and /chat paths with the standard
+# library (how the app serialized before json_codec) versus json_codec with the
+# stdlib backend, orjson re-encoding CRM replies, and orjson passing them
+# through as raw bytes:
+#
+#   python -m benchmarks.bench_json --repeat 2000
+
+os.environ.update(server_env("http://127.0.0.1:9", "http://127.0.0.1:9", tempfile.mkdtemp(prefix="bench_json_")),
+                  CHAT_LEAD_CAPTURE="false")
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+import app as app_module  # noqa: E402
+import json_codec  # noqa: E402
+
+ADD_LEAD_REQUEST = json.dumps({"message": "my name is Ravi, email ravi.kumar@gmail.com, phone 9876543210"}).encode()
+CRM_REPLY = json.dumps({
+    "status": "success",
+    "Enq_Id": "ENQ-2024-000123",
+    "data": {"Enq_Id": "ENQ-2024-000123", "firstnm": "Ravi", "email": "ravi.kumar@gmail.com",
+             "mobile": "9876543210", "source": "chatbot", "project": "Baner Heights", "stage": "New",
+             "owner": {"id": 42, "name": "Sales Desk"}, "tags": ["web", "chat", "3bhk"]},
+}).encode()
+CONVERSATION = {
+    "summary": "User: Looking for a 3BHK near Baner. Bot: We have two projects there.",
+    "turns": [[role, f"Turn {index}: what is the price range and possession date for the towers?"]
+              for index in range(10) for role in ("u", "b")],
+    "lead": {"firstnm": "Ravi", "email": "", "mobile": "", "submitted": False},
+}
+CHAT_REQUEST = json.dumps({"message": "What are the office timings on Sunday?", "session_id": "a" * 32}).encode()
+CHAT_REPLY = "Our office is open from 10 am to 6 pm on Sundays. Would you like to schedule a site visit?"
+
+
+class Reply:
+    """Enough of requests.Response for response.json() and json_codec.response_json()"""
+
+    content = CRM_REPLY
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def add_lead_stdlib(provider):
+    json.loads(ADD_LEAD_REQUEST)
+    crm_response = Reply().json()
+    str(json.dumps(crm_response, default=str, ensure_ascii=False))  # Log line
+    return provider.response({"message": "Lead submitted successfully", "crm_response": crm_response})
+
+
+def add_lead_codec(provider):
+    provider.loads(ADD_LEAD_REQUEST)
+    crm_response = json_codec.response_json(Reply())
+    json_codec.dumps(crm_response, default=str)  # Log line
+    return provider.response({"message": "Lead submitted successfully", "crm_response": crm_response})
+
+
+def chat_stdlib(provider):
+    json.loads(CHAT_REQUEST)
+    conversation = json.loads(json.dumps(CONVERSATION, separators=(",", ":")))  # Load from the store
+    json.dumps(conversation, separators=(",", ":"))  # Save to the store
+    return provider.response({"response": CHAT_REPLY, "session_id": "a" * 32})
+
+
+def chat_codec(provider):
+    provider.loads(CHAT_REQUEST)
+    conversation = json_codec.loads(json_codec.dumps(CONVERSATION))
+    json_codec.dumps(conversation)
+    return provider.response({"response": CHAT_REPLY, "session_id": "a" * 32})
+
+
+def measure(func, provider, repeat):
+    """Best-of-3 microseconds per call"""
+    best = None
+    with app_module.app.app_context():
+        for _ in range(3):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func(provider)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return round(best / repeat * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request JSON encoding and decoding")
+    parser.add_argument("--repeat", type=int, default=2000, help="Requests per timing")
+    args = parser.parse_args()
+
+    flask_app = app_module.app
+    fragment = json_codec.ORJSON_FRAGMENT
+    variants = [("stdlib_before", DefaultJSONProvider(flask_app), False, None)]
+    variants.append(("codec_json", app_module.CodecJSONProvider(flask_app), False, None))
+    if json_codec.orjson is not None:
+        variants.append(("codec_orjson", app_module.CodecJSONProvider(flask_app), True, None))
+        if fragment is not None:
+            variants.append(("codec_orjson_passthrough", app_module.CodecJSONProvider(flask_app), True, fragment))
+
+    results = {"orjson": json_codec.stats()["orjson_version"], "us_per_request": {}}
+    for name, provider, use_orjson, variant_fragment in variants:
+        json_codec.USE_ORJSON = use_orjson
+        json_codec.ORJSON_FRAGMENT = variant_fragment
+        stdlib = name == "stdlib_before"
+        results["us_per_request"][name] = {
+            "add_lead": measure(add_lead_stdlib if stdlib else add_lead_codec, provider, args.repeat),
+            "chat": measure(chat_stdlib if stdlib else chat_codec, provider, args.repeat),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
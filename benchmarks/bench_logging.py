@@ -0,0 +1,100 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_pipeline import setup_logging, payload  # noqa: E402
+
+# Per-request logging cost on the request thread: the original synchronous
+# RotatingFileHandler with f-strings versus the queue-backed JSON pipeline.
+# A small max size forces frequent rotations to show whether they stall callers.
+
+PAYLOAD = {
+    "message": "my name is Ravi, email ravi.kumar@gmail.com, phone 9876543210. " * 8,
+    "session_id": "3f2c9a7e5b1d4c8fa0e6b2d9c7f1a3e5",
+    "source": "website-widget",
+}
+
+
+def legacy_logger(path, max_bytes):
+    logger = logging.getLogger("bench.legacy")
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=3, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger, handler
+
+
+def legacy_request(logger):
+    logger.info(f"Received payload: {PAYLOAD}")
+    logger.debug(f"Debug detail: {PAYLOAD}")
+    logger.info(f"CRM API Response: {PAYLOAD}")
+
+
+def pipeline_request(logger):
+    logger.info("Received payload: %s", payload("/add_lead", PAYLOAD))
+    logger.debug("Debug detail: %s", PAYLOAD)
+    logger.info("CRM API Response: %s", payload("crm", PAYLOAD))
+
+
+def measure(request, logger, requests, think_us):
+    """Caller-side latency of each simulated request's log calls, in microseconds"""
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        request(logger)
+        samples.append((time.perf_counter() - start) * 1e6)
+        if think_us:
+            # The rest of the request (waiting on the CRM or the model) releases the GIL
+            time.sleep(think_us / 1e6)
+    samples.sort()
+    return {
+        "mean_us": sum(samples) / len(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[int(len(samples) * 0.99)],
+        "max_us": samples[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request logging overhead")
+    parser.add_argument("--requests", type=int, default=20000, help="Simulated requests per variant")
+    parser.add_argument("--max-bytes", type=int, default=256 * 1024, help="Rotation size (small to force rotations)")
+    parser.add_argument("--think-us", type=int, default=200, help="Simulated non-logging work per request; 0 for a tight burst")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_logging_")
+    try:
+        logger, handler = legacy_logger(os.path.join(directory, "legacy.log"), args.max_bytes)
+        legacy = measure(legacy_request, logger, args.requests, args.think_us)
+        handler.close()
+
+        logger = logging.getLogger("bench.pipeline")
+        queue_handler = setup_logging(logger, os.path.join(directory, "pipeline.log"),
+                                      max_bytes=args.max_bytes, console=False)
+        pipeline = measure(pipeline_request, logger, args.requests, args.think_us)
+        start = time.perf_counter()
+        queue_handler.stop()
+        drain_seconds = time.perf_counter() - start
+
+        print(json.dumps({
+            "requests": args.requests,
+            "max_bytes": args.max_bytes,
+            "think_us": args.think_us,
+            "legacy": legacy,
+            "pipeline": dict(pipeline, drain_seconds=drain_seconds, dropped=queue_handler.dropped),
+        }, indent=2))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Registry  # noqa: E402
+
+# Cost of the per-request instrumentation: one request's worth of metric
+# updates (in-flight gauge, two stages, one upstream span, duration and status)
+# from several threads at once, plus the cost of one scrape.
+
+ROUTE = (("route", "/add_lead"),)
+ROUTE_METHOD = (("route", "/add_lead"), ("method", "POST"))
+STATUS = (("route", "/add_lead"), ("method", "POST"), ("status", "200"))
+UPSTREAM = (("upstream", "crm"), ("operation", "add_lead"))
+
+
+def one_request(registry):
+    registry.inc("http_requests_in_flight", ROUTE)
+    registry.observe("stage_duration_seconds", (("stage", "parse_json"),), 0.00004)
+    registry.observe("stage_duration_seconds", (("stage", "extraction"),), 0.00006)
+    registry.inc("upstream_requests_in_flight", (("upstream", "crm"),))
+    registry.observe("upstream_request_duration_seconds", UPSTREAM, 0.2)
+    registry.inc("upstream_requests_in_flight", (("upstream", "crm"),), -1)
+    registry.inc("http_requests_in_flight", ROUTE, -1)
+    registry.observe("http_request_duration_seconds", ROUTE_METHOD, 0.21)
+    registry.inc("http_requests_total", STATUS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metrics recording overhead")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50000, help="Simulated requests per thread")
+    args = parser.parse_args()
+
+    registry = Registry()
+
+    def worker():
+        for _ in range(args.requests):
+            one_request(registry)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    text = registry.render()
+    render_seconds = time.perf_counter() - start
+
+    total = args.threads * args.requests
+    counted = sum(int(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+                  if line.startswith("http_requests_total{"))
+    print(json.dumps({
+        "threads": args.threads,
+        "requests": total,
+        "us_per_request": elapsed / total * 1e6,
+        "render_ms": render_seconds * 1e3,
+        "requests_counted": counted,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
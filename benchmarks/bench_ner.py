@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extraction  # noqa: E402
+
+# Cost per message and name recall of the regex extractor versus the spaCy NER
+# mode (single messages and nlp.pipe batches). Needs spaCy and the model, e.g.
+#
+#   pip install spacy && python -m spacy download en_core_web_sm
+#   python -m benchmarks.bench_ner --repeat 20
+#
+# Without them only the regex numbers are reported.
+
+# (message, expected first name or "")
+LABELLED = [
+    ("my name is Ravi, email ravi.kumar@gmail.com, phone 9876543210", "Ravi"),
+    ("I am Asha Patil. You can reach me on +91 9123456789 or asha.patil@yahoo.co.in", "Asha"),
+    ("This is Meera from Pune, call me at 09812345678", "Meera"),
+    ("name Sandeep 919988776655 sandeep@company.in looking for a 3BHK", "Sandeep"),
+    ("Rohit Sharma here, rohit.s@outlook.com 9812312312", "Rohit"),
+    ("Please call Priya Nair on 9898989898, she is interested in the Baner project", "Priya"),
+    ("Hello, Vikram Singh. Email vikram.singh@gmail.com mobile 7012345678", "Vikram"),
+    ("Regards, Anjali Deshmukh - anjali.d@yahoo.in - 8123456789", "Anjali"),
+    ("Contact Suresh Iyer at suresh.iyer@company.com for the site visit", "Suresh"),
+    ("Kindly share the brochure with Neha Gupta, 9765432109", "Neha"),
+    ("hi i am looking for 2bhk, karan here 9876501234", "Karan"),
+    ("What are your office timings?", ""),
+    ("Is there any 2BHK available near Baner under 80 lakhs?", ""),
+    ("Please share the brochure on rohit_s+leads@outlook.com", ""),
+    ("Thanks for the details. I will visit the site on Saturday morning around 11 am.", ""),
+    ("ok", ""),
+    ("can you call me back later", ""),
+]
+
+
+def run(extract, messages):
+    return [extract(message)["firstnm"] for message in messages]
+
+
+def run_batched(messages):
+    return [lead["firstnm"] for lead in extraction.extract_data_from_messages(messages)]
+
+
+def score(names):
+    """Recall on messages that contain a name and false positives on those that do not"""
+    with_name = [(name, expected) for name, (_, expected) in zip(names, LABELLED) if expected]
+    without_name = [name for name, (_, expected) in zip(names, LABELLED) if not expected]
+    hits = sum(1 for name, expected in with_name if name.lower() == expected.lower())
+    return {
+        "recall": round(hits / len(with_name), 3),
+        "false_positives": sum(1 for name in without_name if name),
+    }
+
+
+def measure(func, messages, repeat):
+    """Best-of-3 microseconds per message and the names from the last run"""
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            names = func(messages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / (repeat * len(messages)) * 1e6, names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark regex vs spaCy NER name extraction")
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the labelled corpus per timing")
+    args = parser.parse_args()
+
+    messages = [message for message, _ in LABELLED]
+    results = {"messages": len(messages)}
+
+    extraction.NER_ENABLED = False
+    us, names = measure(lambda batch: run(extraction.extract_data_from_message, batch), messages, args.repeat)
+    results["regex"] = dict(score(names), us_per_message=round(us, 2))
+
+    start = time.perf_counter()
+    nlp = extraction.load_ner_model()
+    load_seconds = time.perf_counter() - start
+    if nlp is None:
+        results["spacy"] = {"available": False, "error": extraction.ner_status()["error"]}
+        print(json.dumps(results, indent=2))
+        return
+
+    extraction.NER_ENABLED = True
+    skipped = sum(1 for message in messages
+                  if not extraction.needs_ner(message, extraction.scan_message(message)))
+    results["spacy"] = {
+        "available": True,
+        "model": extraction.SPACY_MODEL,
+        "pipeline": nlp.pipe_names,
+        "load_seconds": round(load_seconds, 3),
+        "prefilter_skip_share": round(skipped / len(messages), 3),
+    }
+    us, names = measure(lambda batch: run(extraction.extract_data_from_message, batch), messages, args.repeat)
+    results["spacy"]["single"] = dict(score(names), us_per_message=round(us, 2))
+    us, names = measure(run_batched, messages, args.repeat)
+    results["spacy"]["batched"] = dict(score(names), us_per_message=round(us, 2))
+
+    # Without the pre-filter, every message goes through the recognizer
+    extraction.has_name_cue = lambda message: True
+    us, names = measure(run_batched, messages, args.repeat)
+    results["spacy"]["batched_no_prefilter"] = dict(score(names), us_per_message=round(us, 2))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
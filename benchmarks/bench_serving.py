@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import ROUTES, drive, server_env  # noqa: E402
+from benchmarks.stubs import free_port, spawn_stub  # noqa: E402
+
+# Startup time and steady-state throughput of the ways the app can be served:
+# Flask's development server (`python app.py`, the old Procfile) and serve.py
+# under waitress and gunicorn. Runs against local CRM and OpenAI stubs.
+#
+#   python -m benchmarks.bench_serving --servers flask_dev,waitress,gunicorn --concurrency 16
+
+SERVERS = {
+    "flask_dev": ([sys.executable, "app.py"], {}),
+    "waitress": ([sys.executable, "serve.py"], {"WEB_SERVER": "waitress"}),
+    "gunicorn": ([sys.executable, "serve.py"], {"WEB_SERVER": "gunicorn"}),
+}
+
+
+def time_to_ready(base_url, process, timeout=60):
+    """Seconds from now until the server answers GET / with a 200"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if requests.get(base_url + "/", timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except requests.exceptions.RequestException:
+            time.sleep(0.01)
+    raise RuntimeError("Server did not become ready in time")
+
+
+def first_request_ms(base_url, route):
+    method, path, make_payload, _ = ROUTES[route]
+    start = time.perf_counter()
+    requests.request(method, base_url + path, json=make_payload(), timeout=60)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark startup time and throughput per serving mode")
+    parser.add_argument("--servers", default=",".join(SERVERS), help=f"Serving modes: {','.join(SERVERS)}")
+    parser.add_argument("--routes", default="add_lead,chat", help=f"Routes: {','.join(ROUTES)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400, help="Requests per route")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Seconds the stubs hold each call")
+    args = parser.parse_args()
+
+    crm_process, crm_url = spawn_stub("crm", latency=args.upstream_latency)
+    openai_process, openai_url = spawn_stub("openai", latency=args.upstream_latency)
+    results = {"cpu_count": os.cpu_count(), "concurrency": args.concurrency, "servers": {}}
+    try:
+        for name in args.servers.split(","):
+            command, extra_env = SERVERS[name]
+            data_dir = tempfile.mkdtemp(prefix="bench_serving_")
+            port = free_port()
+            env = dict(server_env(crm_url, openai_url, data_dir), PORT=str(port), FLASK_PORT=str(port), **extra_env)
+            base_url = f"http://127.0.0.1:{port}"
+            started = time.perf_counter()
+            process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                ready = time_to_ready(base_url, process)
+                result = {"startup_s": round(ready, 3)}
+                for route in args.routes.split(","):
+                    result[route] = {"first_request_ms": round(first_request_ms(base_url, route), 1)}
+                    drive(base_url, route, args.concurrency, args.concurrency * 2)  # Warm every worker
+                    steady = drive(base_url, route, args.concurrency, args.requests)
+                    result[route].update({key: steady[key] for key in
+                                          ("throughput_rps", "p50_ms", "p99_ms", "error_rate")})
+                results["servers"][name] = result
+            finally:
+                process.terminate()
+                try:
+                    process.wait(30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                results["servers"].setdefault(name, {})["total_s"] = round(time.perf_counter() - started, 3)
+                shutil.rmtree(data_dir, ignore_errors=True)
+    finally:
+        crm_process.terminate()
+        openai_process.terminate()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import server_env  # noqa: E402
+
+# Import-time profile and budget check for the app module. Each run imports the
+# module in a fresh interpreter; one extra run under `python -X importtime`
+# breaks the time down by imported module. Exits with status 1 when the median
+# import time is over the budget or a lazily imported library was loaded eagerly,
+# so it can gate CI or a deploy:
+#
+#   python -m benchmarks.bench_startup --budget-ms 300
+#   python -m benchmarks.bench_startup --module asgi_app --top 25
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", 300))
+# Loaded on first use by the app (see lazy_import.py); importing the app must not pull them in
+LAZY_MODULES = "openai,requests,httpx"
+
+TIMED_IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "modules": sorted(sys.modules)}}))
+"""
+
+
+def run_import(module, env, importtime=False):
+    """Import `module` in a new interpreter; returns (stdout, stderr)"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + [
+        "-c", TIMED_IMPORT.format(module=module)]
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    return result.stdout, result.stderr
+
+
+def parse_importtime(stderr):
+    """(name, depth, self_us, cumulative_us) for every line `-X importtime` wrote"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile(rows, module, top):
+    """What the module's own imports cost, and the most expensive modules overall"""
+    direct = []
+    for index, (name, depth, _, cumulative_us) in enumerate(rows):
+        if name == module and depth == 0:
+            # Children are printed before their parent, one level deeper
+            for child, child_depth, _, child_cumulative in reversed(rows[:index]):
+                if child_depth == 0:
+                    break
+                if child_depth == 1:
+                    direct.append((child, child_cumulative))
+            break
+    direct.sort(key=lambda row: row[1], reverse=True)
+    by_self = sorted(rows, key=lambda row: row[2], reverse=True)
+    return {
+        "imports": {name: round(us / 1000, 1) for name, us in direct[:top]},
+        "top_self_ms": {name: round(self_us / 1000, 1) for name, _, self_us, _ in by_self[:top]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the app's import time and check it against a budget")
+    parser.add_argument("--module", default="app", help="Module to import (app or asgi_app)")
+    parser.add_argument("--runs", type=int, default=5, help="Timed imports; the median is checked")
+    parser.add_argument("--top", type=int, default=15, help="Modules listed in the profile")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS, help="Median import time allowed")
+    parser.add_argument("--lazy", default=LAZY_MODULES, help="Modules that must not be imported with the app")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    env = server_env("http://127.0.0.1:9", "http://127.0.0.1:9", data_dir)  # Never contacted by an import
+    try:
+        timings = []
+        for _ in range(args.runs):
+            stdout, _ = run_import(args.module, env)
+            result = json.loads(stdout.splitlines()[-1])
+            timings.append(result["ms"])
+        _, stderr = run_import(args.module, env, importtime=True)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    median = statistics.median(timings)
+    eager = [name for name in args.lazy.split(",") if name and name in result["modules"]]
+    report = {
+        "module": args.module,
+        "import_ms": {"median": round(median, 1), "min": round(min(timings), 1), "max": round(max(timings), 1)},
+        "budget_ms": args.budget_ms,
+        "modules_loaded": len(result["modules"]),
+        "eagerly_imported": eager,
+    }
+    report.update(profile(parse_importtime(stderr), args.module, args.top))
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"median import time {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+    if failures:
+        sys.exit(f"{args.module}: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
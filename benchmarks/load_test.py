@@ -0,0 +1,264 @@
+import argparse
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stubs import free_port, spawn_stub  # noqa: E402
+
+# Load test for the API against local CRM and OpenAI stubs. Starts the stubs
+# and one server per serving mode, drives each route at every concurrency
+# level and prints JSON with throughput, latency percentiles and error rates.
+#
+#   python -m benchmarks.load_test --modes sync,async --concurrency 1,10,50 --requests 500
+#   python -m benchmarks.load_test --output current.json --baseline previous.json
+#
+# With --baseline the run exits non-zero when throughput drops or p99 latency
+# grows by more than --max-regression compared to the saved results.
+
+SERVERS = {
+    "sync": lambda port, threads: [
+        sys.executable, "-c",
+        f"from waitress import serve; import app; serve(app.app, host='127.0.0.1', port={port}, "
+        f"threads={threads}, connection_limit=2000, _quiet=True)",
+    ],
+    "async": lambda port, threads: [
+        sys.executable, "-m", "uvicorn", "asgi_app:app", "--host", "127.0.0.1", "--port", str(port),
+        "--log-level", "warning", "--backlog", "2048",
+    ],
+}
+
+_lead_numbers = itertools.count(1)
+
+
+def add_lead_payload():
+    # A fresh email and mobile each time so de-duplication does not answer for the CRM
+    n = next(_lead_numbers)
+    return {"message": f"my name is Ravi, ravi{n}@example.com, 9{n % 10 ** 9:09d}"}
+
+
+# route -> (method, path, payload factory, streamed)
+ROUTES = {
+    "add_lead": ("POST", "/add_lead", add_lead_payload, False),
+    "update_lead": ("PUT", "/update_lead", lambda: {"Enq_Id": "12345", "Remark": "Call back after 6 pm"}, False),
+    "chat": ("POST", "/chat", lambda: {"message": "What are your office timings?"}, False),
+    "chat_stream": ("POST", "/chat/stream", lambda: {"message": "What are your office timings?"}, True),
+}
+
+# The sync app serves every route; the ASGI app only the non-streaming ones
+MODE_ROUTES = {"sync": set(ROUTES), "async": {"add_lead", "update_lead", "chat"}}
+
+
+def wait_until_ready(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if requests.get(base_url + "/", timeout=1).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    raise RuntimeError("Server did not become ready in time")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def send(session, method, url, payload, streamed):
+    """Send one request; returns (status or error name, time to first event or None)"""
+    if not streamed:
+        return session.request(method, url, json=payload, timeout=120).status_code, None
+    started = time.perf_counter()
+    first_event = None
+    with session.request(method, url, json=payload, timeout=120, stream=True) as response:
+        for line in response.iter_lines():
+            if first_event is None and line.startswith(b"data:"):
+                first_event = time.perf_counter() - started
+            if line.startswith(b"event: error"):
+                return "stream_error", first_event
+    return response.status_code, first_event
+
+
+def drive(base_url, route, concurrency, total):
+    """Send `total` requests with at most `concurrency` in flight; return latency stats
+
+    Uses one thread and keep-alive session per concurrent client: a blocking
+    client keeps the load generator cheap, so it is not the bottleneck.
+    """
+    method, path, make_payload, streamed = ROUTES[route]
+    latencies = []
+    first_events = []
+    outcomes = {}
+    remaining = [total]
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            payload = make_payload()
+            started = time.perf_counter()
+            try:
+                outcome, first_event = send(session, method, base_url + path, payload, streamed)
+            except requests.exceptions.RequestException as e:
+                outcome, first_event = type(e).__name__, None
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if first_event is not None:
+                    first_events.append(first_event)
+                outcomes[str(outcome)] = outcomes.get(str(outcome), 0) + 1
+        session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for outcome, count in outcomes.items() if not (outcome.isdigit() and int(outcome) < 400))
+    result = {
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "error_rate": round(errors / total, 4),
+        "outcomes": outcomes,
+    }
+    if first_events:
+        first_events.sort()
+        result["first_event_p50_ms"] = round(percentile(first_events, 50) * 1000, 1)
+        result["first_event_p99_ms"] = round(percentile(first_events, 99) * 1000, 1)
+    return result
+
+
+def compare(results, baseline, max_regression):
+    """Scenarios whose throughput or p99 latency regressed beyond max_regression"""
+    regressions = []
+    for mode, routes in results["modes"].items():
+        for route, levels in routes.items():
+            for level, current in levels.items():
+                previous = baseline.get("modes", {}).get(mode, {}).get(route, {}).get(level)
+                if not previous:
+                    continue
+                scenario = f"{mode}/{route}/c{level}"
+                if current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+                    regressions.append({"scenario": scenario, "metric": "throughput_rps",
+                                        "baseline": previous["throughput_rps"], "current": current["throughput_rps"]})
+                if current["p99_ms"] > previous["p99_ms"] * (1 + max_regression):
+                    regressions.append({"scenario": scenario, "metric": "p99_ms",
+                                        "baseline": previous["p99_ms"], "current": current["p99_ms"]})
+    return regressions
+
+
+def server_env(crm_url, openai_url, data_dir):
+    return dict(
+        os.environ,
+        CRM_API_URL=crm_url + "/AddLead",
+        CRM_UPDATE_API_URL=crm_url + "/UpdateLead",
+        CRM_GET_API_URL=crm_url + "/GetLead",
+        OPENAI_BASE_URL=openai_url + "/v1",
+        OPENAI_API_KEY="stub",
+        CHAT_CACHE_ENABLED="false",  # Measure the upstream call, not the cache
+        CRM_MAX_RETRIES="0",  # Report upstream errors as they happen instead of retrying them away
+        LOG_CONSOLE="false",
+        RATE_LIMIT_ENABLED="false",  # Every load test request comes from one client address
+        DEDUP_DB_PATH=os.path.join(data_dir, "dedup.db"),
+        OUTBOX_DB_PATH=os.path.join(data_dir, "outbox.db"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against local CRM and OpenAI stubs")
+    parser.add_argument("--modes", default="sync,async", help=f"Serving modes: {','.join(SERVERS)}")
+    parser.add_argument("--routes", default="add_lead,update_lead,chat,chat_stream", help=f"Routes: {','.join(ROUTES)}")
+    parser.add_argument("--concurrency", default="1,10,50", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per route and concurrency level")
+    parser.add_argument("--upstream-latency", type=float, default=0.1, help="Seconds the stubs hold each call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub calls answered with a 5xx")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="Seconds between streamed completion chunks")
+    parser.add_argument("--sync-threads", type=int, default=8, help="waitress threads for the sync app")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    parser.add_argument("--baseline", help="Results file from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative regression vs baseline")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    routes = args.routes.split(",")
+    stub_options = {"latency": args.upstream_latency, "error_rate": args.error_rate}
+    crm_process, crm_url = spawn_stub("crm", **stub_options)
+    openai_process, openai_url = spawn_stub("openai", chunk_delay=args.chunk_delay, **stub_options)
+    data_dir = tempfile.mkdtemp(prefix="load_test_")
+    env = server_env(crm_url, openai_url, data_dir)
+
+    results = {
+        "config": {
+            "upstream_latency_s": args.upstream_latency,
+            "error_rate": args.error_rate,
+            "chunk_delay_s": args.chunk_delay,
+            "requests": args.requests,
+            "sync_threads": args.sync_threads,
+        },
+        "modes": {},
+    }
+    try:
+        for mode in args.modes.split(","):
+            port = free_port()
+            process = subprocess.Popen(SERVERS[mode](port, args.sync_threads), cwd=ROOT, env=env)
+            base_url = f"http://127.0.0.1:{port}"
+            try:
+                wait_until_ready(base_url, process)
+                results["modes"][mode] = {
+                    route: {str(level): drive(base_url, route, level, args.requests) for level in levels}
+                    for route in routes if route in MODE_ROUTES[mode]
+                }
+            finally:
+                process.terminate()
+                process.wait(10)
+    finally:
+        crm_process.terminate()
+        openai_process.terminate()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        results["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-ins for the Newton CRM and the OpenAI completions API.
+#
+#   from benchmarks.stubs import start_openai_stub
+#   server = start_openai_stub(chunks=["Hello", " there"], chunk_delay=0.05)
+#   os.environ["OPENAI_BASE_URL"] = server.base_url + "/v1"
+#
+# For load tests run them in their own process so they do not compete with
+# the load generator for the GIL:
+#
+#   python -m benchmarks.stubs crm --port 8001 --latency 0.2 --error-rate 0.05
+
+DEFAULT_CHUNKS = ["Hello", "!", " How", " can", " I", " help", " you", " today", "?"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(body) if body else None
+        except ValueError:
+            return None
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class CRMStubHandler(StubHandler):
+    """Accepts AddLead POSTs and UpdateLead PUTs and echoes the payload back; GetLead returns what they stored."""
+
+    def do_GET(self):
+        self.server.record(self.command, self.path, None)
+        self.server.wait()
+        if self.server.should_fail():
+            self.send_json(503, {"status": "error", "message": "Service temporarily unavailable"})
+            return
+        lead = self.server.leads.get(self.path.rstrip("/").rsplit("/", 1)[-1])
+        if lead is None:
+            self.send_json(404, {"status": "error", "message": "Lead not found"})
+            return
+        self.send_json(200, {"status": "success", "Enq_Id": lead.get("Enq_Id"), "data": lead})
+
+    def do_POST(self):
+        payload = self.read_json()
+        self.server.record(self.command, self.path, payload)
+        self.server.wait()
+        if self.server.should_fail():
+            self.send_json(503, {"status": "error", "message": "Service temporarily unavailable"})
+            return
+        if isinstance(payload, dict) and payload.get("Enq_Id"):
+            self.server.leads[str(payload["Enq_Id"])] = dict(payload)
+        self.send_json(200, {"status": "success", "Enq_Id": (payload or {}).get("Enq_Id"), "data": payload})
+
+    def do_PUT(self):
+        payload = self.read_json()
+        self.server.record(self.command, self.path, payload)
+        self.server.wait()
+        if self.server.should_fail():
+            self.send_json(503, {"status": "error", "message": "Service temporarily unavailable"})
+            return
+        enq_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+        if isinstance(payload, dict) and enq_id in self.server.leads:
+            self.server.leads[enq_id].update(payload)
+        self.send_json(200, {"status": "success", "Enq_Id": enq_id, "data": payload})
+
+
+class OpenAIStubHandler(StubHandler):
+    """Serves /v1/completions, streaming canned chunks when stream=true."""
+
+    def do_POST(self):
+        payload = self.read_json() or {}
+        self.server.record(self.command, self.path, payload)
+        if not self.path.rstrip("/").endswith("/completions"):
+            self.send_json(404, {"error": {"message": "Unknown stub endpoint"}})
+            return
+
+        chunks = self.server.chunks
+        model = payload.get("model", "stub")
+        if self.server.should_fail():
+            self.server.wait()
+            self.send_json(500, {"error": {"message": "The server had an error processing your request", "type": "server_error"}})
+            return
+        if not payload.get("stream"):
+            self.server.wait()
+            self.send_json(200, {
+                "id": "cmpl-stub", "object": "text_completion", "created": int(time.time()), "model": model,
+                "choices": [{"text": "".join(chunks), "index": 0, "logprobs": None, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": len(chunks), "total_tokens": len(chunks) + 1},
+            })
+            return
+
+        self.start_chunked("text/event-stream")
+        try:
+            for index, text in enumerate(chunks):
+                if self.server.chunk_delay:
+                    time.sleep(self.server.chunk_delay)
+                event = {
+                    "id": "cmpl-stub", "object": "text_completion", "created": int(time.time()), "model": model,
+                    "choices": [{"text": text, "index": 0, "logprobs": None,
+                                 "finish_reason": "stop" if index == len(chunks) - 1 else None}],
+                }
+                self.write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.write_chunk(b"data: [DONE]\n\n")
+            self.end_chunked()
+        except (BrokenPipeError, ConnectionResetError):
+            # The app closed the stream early (client disconnect)
+            self.server.disconnects += 1
+            self.close_connection = True
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, handler, latency=0.0, chunks=None, chunk_delay=0.0, error_rate=0.0,
+                 host="127.0.0.1", port=0):
+        super().__init__((host, port), handler)
+        self.latency = latency  # Seconds each (non-streamed) response is held back
+        self.chunks = list(chunks or DEFAULT_CHUNKS)
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate  # Share of calls answered with a 5xx
+        self.requests = []
+        self.leads = {}  # Enq_Id -> lead, for the CRM stub's GetLead
+        self.disconnects = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    def record(self, method, path, payload):
+        with self._lock:
+            self.requests.append((method, path, payload))
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="stub-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start_crm_stub(**kwargs):
+    """Start a CRM stub on a free local port; URLs are base_url + "/AddLead", "/UpdateLead" and "/GetLead"."""
+    return StubServer(CRMStubHandler, **kwargs).start()
+
+
+def start_openai_stub(**kwargs):
+    """Start an OpenAI completions stub on a free local port; use base_url + "/v1"."""
+    return StubServer(OpenAIStubHandler, **kwargs).start()
+
+
+STUB_HANDLERS = {"crm": CRMStubHandler, "openai": OpenAIStubHandler}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_stub(kind, latency=0.0, chunk_delay=0.0, error_rate=0.0, chunk_count=None):
+    """Run a stub in a child process; returns (process, base_url) once it accepts connections."""
+    port = free_port()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, "-m", "benchmarks.stubs", kind, "--port", str(port),
+               "--latency", str(latency), "--chunk-delay", str(chunk_delay), "--error-rate", str(error_rate)]
+    if chunk_count:
+        command += ["--chunk-count", str(chunk_count)]
+    process = subprocess.Popen(
+        command,
+        cwd=root,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{kind} stub did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local CRM or OpenAI stub server")
+    parser.add_argument("kind", choices=sorted(STUB_HANDLERS))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--chunk-count", type=int, default=0, help="Streamed chunks per completion (default: a short reply)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with a 5xx")
+    args = parser.parse_args()
+
+    chunks = [f" token{i}" for i in range(args.chunk_count)] if args.chunk_count else None
+    server = StubServer(STUB_HANDLERS[args.kind], latency=args.latency, chunks=chunks, chunk_delay=args.chunk_delay,
+                        error_rate=args.error_rate, host=args.host, port=args.port)
+    print(f"{args.kind} stub listening on {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import json_codec
+
+# Bulk ingestion configuration (overridable through the environment)
+BULK_MAX_WORKERS = int(os.getenv("BULK_MAX_WORKERS", 8))  # Concurrent CRM calls per bulk request
+BULK_MAX_PENDING = int(os.getenv("BULK_MAX_PENDING", 32))  # Leads buffered ahead of the CRM calls
+
+
+def iter_ndjson(stream):
+    """Yield one decoded item per non-empty line, or the ValueError for a bad line."""
+    for raw_line in stream:
+        line = raw_line.strip()
+        if not line:
+            continue
+        try:
+            yield json_codec.loads(line)
+        except ValueError as e:
+            yield e
+
+
+def process_bulk(items, prepare, submit, keys=None, duplicate=None,
+                 max_workers=BULK_MAX_WORKERS, max_pending=BULK_MAX_PENDING):
+    """Run `prepare` over every item and fan the ready ones out to `submit` on a bounded pool.
+
+    `prepare(item)` returns `(payload, None)` for an item that should be submitted, or
+    `(None, result)` for one that is already finished (e.g. failed validation).
+    Yields `(index, result)` pairs as soon as each item finishes, so at most
+    `max_pending` items are held in memory regardless of the batch size.
+
+    With `keys(payload)` (e.g. a lead's email and mobile), an item sharing a key with
+    one still being submitted is not sent again: it finishes together with that
+    item, with the result `duplicate(payload, first_result)`.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk-lead") as executor:
+        pending = {}  # future -> (index, keys)
+        in_flight = {}  # key -> future submitting it
+        waiting = {}  # future -> [(index, payload)] of duplicates finishing with it
+
+        def finish(done):
+            for future in done:
+                index, item_keys = pending.pop(future)
+                for key in item_keys:
+                    del in_flight[key]
+                result = _future_result(future)
+                yield index, result
+                for duplicate_index, payload in waiting.pop(future, ()):
+                    yield duplicate_index, duplicate(payload, result)
+
+        for index, item in enumerate(items):
+            payload, result = prepare(item)
+            if result is not None:
+                yield index, result
+                continue
+            item_keys = set(keys(payload)) if keys else set()
+            first = next((in_flight[key] for key in item_keys if key in in_flight), None)
+            if first is not None:
+                waiting.setdefault(first, []).append((index, payload))
+            else:
+                future = executor.submit(submit, payload)
+                pending[future] = (index, item_keys)
+                in_flight.update(dict.fromkeys(item_keys, future))
+            # Waiting duplicates are held in memory too
+            while len(pending) + sum(map(len, waiting.values())) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finish(done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from finish(done)
+
+
+def _future_result(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return {"error": "Internal server error", "details": str(e)}, 500
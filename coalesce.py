@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from lazy_import import lazy_module
+
+asyncio = lazy_module("asyncio")  # AsyncUpdateCoalescer only
+
+# Update coalescing configuration (overridable through the environment)
+UPDATE_COALESCE_ENABLED = os.getenv("UPDATE_COALESCE_ENABLED", "false").lower() == "true"
+UPDATE_COALESCE_WINDOW = float(os.getenv("UPDATE_COALESCE_WINDOW", 0.25))  # Seconds to collect updates for one lead
+
+
+class _Batch:
+    """Fields collected for one lead, and the outcome of the single call that carries them."""
+
+    def __init__(self, fields, previous, done):
+        self.fields = dict(fields)
+        self.updates = 1
+        self.previous = previous  # Earlier batch for the same lead that must finish first
+        self.done = done
+        self.result = None
+        self.error = None
+        self.task = None
+
+
+class UpdateCoalescer:
+    """Merges updates to the same lead arriving within `window` seconds into one call.
+
+    The first caller for a lead waits out the window and sends the merged fields
+    (later values win); callers joining the batch wait for that call and share its
+    response or exception. Batches for one lead are sent in order, never
+    concurrently, while different leads proceed independently on their own threads.
+    """
+
+    def __init__(self, send, window=UPDATE_COALESCE_WINDOW, enabled=UPDATE_COALESCE_ENABLED):
+        self.send = send
+        self.window = window
+        self.enabled = enabled
+        self._open = {}  # enq_id -> batch still accepting fields
+        self._latest = {}  # enq_id -> most recent batch, open or in flight
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.calls = 0
+
+    def submit(self, enq_id, fields):
+        """Return (result, number of updates it carried); re-raises the call's exception"""
+        if not self.enabled:
+            return self.send(enq_id, fields), 1
+        with self._lock:
+            self.updates += 1
+            batch = self._open.get(enq_id)
+            leader = batch is None
+            if leader:
+                batch = _Batch(fields, self._latest.get(enq_id), threading.Event())
+                self._open[enq_id] = self._latest[enq_id] = batch
+            else:
+                batch.fields.update(fields)
+                batch.updates += 1
+        if leader:
+            self._flush(enq_id, batch)
+        else:
+            batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.result, batch.updates
+
+    def _flush(self, enq_id, batch):
+        time.sleep(self.window)
+        if batch.previous is not None:
+            # Keep accepting fields until the earlier call for this lead has finished
+            batch.previous.done.wait()
+            batch.previous = None
+        with self._lock:
+            del self._open[enq_id]
+            self.calls += 1
+        try:
+            batch.result = self.send(enq_id, batch.fields)
+        except Exception as e:
+            batch.error = e
+        finally:
+            with self._lock:
+                if self._latest.get(enq_id) is batch:
+                    del self._latest[enq_id]
+            batch.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "window": self.window,
+                "updates": self.updates,
+                "crm_calls": self.calls,
+                "open_batches": len(self._open),
+            }
+
+
+class AsyncUpdateCoalescer(UpdateCoalescer):
+    """UpdateCoalescer for coroutines on one event loop; `send` is an async function."""
+
+    async def submit(self, enq_id, fields):
+        if not self.enabled:
+            return await self.send(enq_id, fields), 1
+        self.updates += 1
+        batch = self._open.get(enq_id)
+        if batch is None:
+            batch = _Batch(fields, self._latest.get(enq_id), asyncio.Event())
+            self._open[enq_id] = self._latest[enq_id] = batch
+            # A task of its own, so a cancelled first request does not strand the others
+            batch.task = asyncio.ensure_future(self._flush(enq_id, batch))
+        else:
+            batch.fields.update(fields)
+            batch.updates += 1
+        await batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.result, batch.updates
+
+    async def _flush(self, enq_id, batch):
+        await asyncio.sleep(self.window)
+        if batch.previous is not None:
+            await batch.previous.done.wait()
+            batch.previous = None
+        del self._open[enq_id]
+        self.calls += 1
+        try:
+            batch.result = await self.send(enq_id, batch.fields)
+        except Exception as e:
+            batch.error = e
+        finally:
+            if self._latest.get(enq_id) is batch:
+                del self._latest[enq_id]
+            batch.done.set()
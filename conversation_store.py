@@ -0,0 +1,209 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import json_codec
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Conversation memory configuration (overridable through the environment)
+CHAT_HISTORY_BACKEND = os.getenv("CHAT_HISTORY_BACKEND", "memory")  # "memory" or "sqlite"
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", 600))  # Tokens of history sent per prompt
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", 120))  # Part of the budget kept for the summary
+CHAT_SESSION_IDLE_TTL = float(os.getenv("CHAT_SESSION_IDLE_TTL", 1800))
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", 10000))
+CHAT_HISTORY_DB_PATH = os.getenv("CHAT_HISTORY_DB_PATH", os.path.join(BASE_DIR, 'data', 'conversations.db'))
+
+# Compact turn layout: [role, text] with one-letter roles
+USER = "u"
+BOT = "b"
+ROLE_LABELS = {USER: "User", BOT: "Bot"}
+
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+SUMMARY_TURN_CHARS = 80
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def condense_turn(role, text):
+    """One short line standing in for a turn that was trimmed from the history"""
+    first_sentence = SENTENCE_END_RE.split(text.strip(), 1)[0]
+    if len(first_sentence) > SUMMARY_TURN_CHARS:
+        first_sentence = first_sentence[:SUMMARY_TURN_CHARS].rstrip() + "..."
+    return f"{ROLE_LABELS[role]}: {first_sentence}"
+
+
+def new_conversation():
+    return {"summary": "", "turns": []}
+
+
+class MemoryBackend:
+    """Conversations kept in this process; idle and least recently used sessions are evicted."""
+
+    def __init__(self, idle_ttl=CHAT_SESSION_IDLE_TTL, max_sessions=CHAT_MAX_SESSIONS):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> (conversation, last_active), oldest first
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.idle_ttl:
+                del self._sessions[session_id]
+                self.evictions += 1
+                return None
+            return json_codec.loads(entry[0])
+
+    def save(self, session_id, conversation):
+        now = time.monotonic()
+        data = json_codec.dumps(conversation)
+        with self._lock:
+            self._sessions[session_id] = (data, now)
+            self._sessions.move_to_end(session_id)
+            # Oldest sessions sit at the front, so idle ones are swept from there
+            while self._sessions:
+                oldest_id, (_, last_active) = next(iter(self._sessions.items()))
+                if len(self._sessions) <= self.max_sessions and now - last_active <= self.idle_ttl:
+                    break
+                del self._sessions[oldest_id]
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "evictions": self.evictions}
+
+
+class SQLiteBackend:
+    """Conversations persisted in a SQLite (WAL) file shared by every worker on the host."""
+
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, path=CHAT_HISTORY_DB_PATH, idle_ttl=CHAT_SESSION_IDLE_TTL):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.evictions = 0
+
+    def _connection(self):
+        # Reopen in a forked worker: a SQLite connection must not be shared across fork()
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations (updated_at)")
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT data, updated_at FROM conversations WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.idle_ttl:
+            return None
+        return json_codec.loads(row[0])
+
+    def save(self, session_id, conversation):
+        now = time.time()
+        data = json_codec.dumps(conversation)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO conversations (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, data, now),
+            )
+            if now - self._last_sweep > self.SWEEP_INTERVAL:
+                self._last_sweep = now
+                removed = conn.execute(
+                    "DELETE FROM conversations WHERE updated_at < ?", (now - self.idle_ttl,)
+                ).rowcount
+                self.evictions += max(removed, 0)
+
+    def stats(self):
+        with self._lock:
+            sessions = self._connection().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        return {"sessions": sessions, "evictions": self.evictions}
+
+
+class ConversationStore:
+    """Per-session chat history capped by a token budget; older turns are folded into a summary."""
+
+    def __init__(self, backend, token_budget=CHAT_HISTORY_TOKEN_BUDGET, summary_budget=CHAT_SUMMARY_TOKEN_BUDGET):
+        self.backend = backend
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+
+    def load(self, session_id):
+        return self.backend.load(session_id) or new_conversation()
+
+    def build_prompt(self, conversation, user_message):
+        """Prompt made of the budgeted history followed by the new user message"""
+        lines = []
+        if conversation["summary"]:
+            lines.append(f"Summary of the earlier conversation: {conversation['summary']}")
+        for role, text in conversation["turns"]:
+            lines.append(f"{ROLE_LABELS[role]}: {text}")
+        lines.append(f"User: {user_message}")
+        lines.append("Bot:")
+        return "\n".join(lines)
+
+    def append(self, session_id, conversation, user_message, bot_response):
+        """Record a finished exchange, compact the history to the budget and persist it"""
+        conversation["turns"].append([USER, user_message])
+        conversation["turns"].append([BOT, bot_response])
+        self.compact(conversation)
+        self.backend.save(session_id, conversation)
+
+    def save(self, session_id, conversation):
+        """Persist state kept alongside the turns (e.g. the captured lead) without adding an exchange"""
+        self.backend.save(session_id, conversation)
+
+    def compact(self, conversation):
+        turns = conversation["turns"]
+        turn_budget = self.token_budget - self.summary_budget
+        used = sum(estimate_tokens(text) for _, text in turns)
+        dropped = []
+        # Always keep the latest exchange, even if it alone exceeds the budget
+        while used > turn_budget and len(turns) > 2:
+            role, text = turns.pop(0)
+            used -= estimate_tokens(text)
+            dropped.append(condense_turn(role, text))
+        if dropped:
+            summary = " ".join(filter(None, [conversation["summary"]] + dropped))
+            # Keep the most recent part of the summary within its own budget
+            max_chars = self.summary_budget * 4
+            if len(summary) > max_chars:
+                summary = "..." + summary[-max_chars:]
+            conversation["summary"] = summary
+
+    def stats(self):
+        stats = {"backend": type(self.backend).__name__, "token_budget": self.token_budget}
+        stats.update(self.backend.stats())
+        return stats
+
+
+def create_conversation_store():
+    """Build the store selected by CHAT_HISTORY_BACKEND"""
+    if CHAT_HISTORY_BACKEND == "sqlite":
+        return ConversationStore(SQLiteBackend())
+    return ConversationStore(MemoryBackend())
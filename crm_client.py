@@ -0,0 +1,275 @@
+import itertools
+import os
+import random
+import threading
+from lazy_import import lazy_module
+from metrics import upstream_span, record_upstream_error
+from resilience import CRM_MAX_CONCURRENCY, CRM_ASYNC_MAX_CONCURRENCY, get_guard
+
+# HTTP libraries are imported when the first client session is built, not with the app
+asyncio = lazy_module("asyncio")  # AsyncCRMClient only
+httpx = lazy_module("httpx")
+requests = lazy_module("requests")
+
+# Pool / timeout configuration (overridable through the environment)
+CRM_POOL_CONNECTIONS = int(os.getenv("CRM_POOL_CONNECTIONS", 4))  # Number of per-host pools kept
+CRM_POOL_MAXSIZE = int(os.getenv("CRM_POOL_MAXSIZE", 32))  # Keep-alive connections per host
+CRM_POOL_BLOCK = os.getenv("CRM_POOL_BLOCK", "false").lower() == "true"
+CRM_CONNECT_TIMEOUT = float(os.getenv("CRM_CONNECT_TIMEOUT", 3.05))
+CRM_ADD_READ_TIMEOUT = float(os.getenv("CRM_ADD_READ_TIMEOUT", 10))
+CRM_UPDATE_READ_TIMEOUT = float(os.getenv("CRM_UPDATE_READ_TIMEOUT", 30))
+CRM_GET_READ_TIMEOUT = float(os.getenv("CRM_GET_READ_TIMEOUT", 10))
+CRM_MAX_RETRIES = int(os.getenv("CRM_MAX_RETRIES", 2))
+CRM_BACKOFF_FACTOR = float(os.getenv("CRM_BACKOFF_FACTOR", 0.3))
+CRM_BACKOFF_JITTER = float(os.getenv("CRM_BACKOFF_JITTER", 0.3))
+CRM_WARM_CONNECTIONS = int(os.getenv("CRM_WARM_CONNECTIONS", 2))  # Keep-alive connections opened by warm_up()
+# The async client multiplexes many in-flight calls on one thread, so it gets a bigger pool.
+# httpcore's pool scheduling is O(connections x waiting requests) per request, so the
+# connections are split over several smaller clients instead of one large one.
+CRM_ASYNC_MAX_CONNECTIONS = int(os.getenv("CRM_ASYNC_MAX_CONNECTIONS", 200))
+CRM_ASYNC_POOL_SHARDS = int(os.getenv("CRM_ASYNC_POOL_SHARDS", 8))
+
+# Only these methods are safe to replay after the request reached the CRM.
+# POST (add lead) is still retried on connect errors, where nothing was sent.
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+RETRY_STATUSES = (502, 503, 504)
+
+
+def max_call_seconds(read_timeout=max(CRM_ADD_READ_TIMEOUT, CRM_UPDATE_READ_TIMEOUT)):
+    """Longest one CRM call can take when every attempt times out and every retry backs off in full"""
+    attempts = CRM_MAX_RETRIES + 1
+    backoff = sum(CRM_BACKOFF_FACTOR * 2 ** attempt + CRM_BACKOFF_JITTER for attempt in range(CRM_MAX_RETRIES))
+    return attempts * (CRM_CONNECT_TIMEOUT + read_timeout) + backoff
+
+
+class CRMClient:
+    """Keep-alive, pooled HTTP client for the Newton CRM, safe to share across threads."""
+
+    def __init__(self, add_url, update_url, get_url=None,
+                 pool_connections=CRM_POOL_CONNECTIONS,
+                 pool_maxsize=CRM_POOL_MAXSIZE,
+                 pool_block=CRM_POOL_BLOCK,
+                 connect_timeout=CRM_CONNECT_TIMEOUT,
+                 add_timeout=CRM_ADD_READ_TIMEOUT,
+                 update_timeout=CRM_UPDATE_READ_TIMEOUT,
+                 get_timeout=CRM_GET_READ_TIMEOUT,
+                 max_retries=CRM_MAX_RETRIES,
+                 backoff_factor=CRM_BACKOFF_FACTOR,
+                 backoff_jitter=CRM_BACKOFF_JITTER):
+        self.add_url = add_url
+        self.update_url = update_url
+        self.get_url = get_url  # Optional: GET {get_url}/{Enq_Id} reads a lead back
+        self.connect_timeout = connect_timeout
+        self.add_timeout = add_timeout
+        self.update_timeout = update_timeout
+        self.get_timeout = get_timeout
+
+        self._retry_options = {
+            "total": max_retries,
+            "connect": max_retries,
+            "read": max_retries,
+            "status": max_retries,
+            "allowed_methods": IDEMPOTENT_METHODS,
+            "status_forcelist": RETRY_STATUSES,
+            "backoff_factor": backoff_factor,
+            "backoff_jitter": backoff_jitter,
+            "respect_retry_after_header": True,
+            "raise_on_status": False,
+        }
+        self._pool_options = {
+            "pool_connections": pool_connections,
+            "pool_maxsize": pool_maxsize,
+            "pool_block": pool_block,
+        }
+        # Built on first use so importing the app does not import requests
+        self._adapter = None
+        self._session = None
+
+        self._lock = threading.Lock()
+        self._requests_sent = 0
+        self._errors = 0
+        # Shared circuit breaker and concurrency limit for every CRM call in this process
+        self.guard = get_guard("crm", CRM_MAX_CONCURRENCY)
+
+    def session(self):
+        """The shared requests.Session, created on first use."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    from requests.adapters import HTTPAdapter
+                    from urllib3.util.retry import Retry
+
+                    adapter = HTTPAdapter(max_retries=Retry(**self._retry_options), **self._pool_options)
+                    session = requests.Session()
+                    session.headers.update({"Content-Type": "application/json"})
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._adapter = adapter
+                    self._session = session
+        return self._session
+
+    def request(self, method, url, read_timeout, operation="request", **kwargs):
+        """Send a request through the shared session and track basic counters.
+
+        Raises resilience.UpstreamUnavailable without contacting the CRM while its
+        circuit is open or too many calls are already waiting on it.
+        """
+        session = self.session()
+        with self.guard.protect() as call, upstream_span("crm", operation):
+            with self._lock:
+                self._requests_sent += 1
+            try:
+                response = session.request(method, url, timeout=(self.connect_timeout, read_timeout), **kwargs)
+            except requests.exceptions.RequestException:
+                with self._lock:
+                    self._errors += 1
+                raise
+            if response.status_code >= 500:
+                call.mark_failed()
+        if response.status_code >= 500:
+            record_upstream_error("crm", operation)
+        return response
+
+    def add_lead(self, payload):
+        """POST a new lead to the CRM and return the raw response."""
+        return self.request("POST", self.add_url, self.add_timeout, operation="add_lead", json=payload)
+
+    def update_lead(self, enq_id, fields):
+        """PUT updated fields for an existing lead and return the raw response."""
+        return self.request("PUT", f"{self.update_url}/{enq_id}", self.update_timeout,
+                            operation="update_lead", json=fields)
+
+    def get_lead(self, enq_id):
+        """GET a lead from the CRM and return the raw response."""
+        return self.request("GET", f"{self.get_url}/{enq_id}", self.get_timeout, operation="get_lead")
+
+    def warm_up(self, connections=CRM_WARM_CONNECTIONS):
+        """Open keep-alive connections (TCP and TLS) to the CRM hosts before the first request.
+
+        Nothing is sent over them; they wait in the session's pools for the first
+        calls. Returns the number of connections opened.
+        """
+        self.session()
+        opened = 0
+        for url in dict.fromkeys((self.add_url, self.update_url)):
+            pool = self._adapter.get_connection(url)
+            conns = []
+            try:
+                for _ in range(min(connections, self._adapter._pool_maxsize)):
+                    conn = pool._get_conn()
+                    conns.append(conn)
+                    if conn.sock is None:
+                        conn.timeout = self.connect_timeout
+                        conn.connect()
+                        opened += 1
+            finally:
+                for conn in conns:
+                    pool._put_conn(conn)
+        return opened
+
+    def pool_stats(self):
+        """Snapshot of request counters and per-host connection pool usage."""
+        pools = {}
+        if self._adapter is not None:  # No pools before the session is built
+            manager = self._adapter.poolmanager
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                host = f"{pool.scheme}://{pool.host}:{pool.port}"
+                # The pool queue is pre-filled with None placeholders; count real sockets only
+                idle = list(pool.pool.queue) if pool.pool is not None else []
+                pools[host] = {
+                    "connections_opened": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "idle": sum(1 for conn in idle if conn is not None),
+                    "maxsize": pool.pool.maxsize if pool.pool is not None else 0,
+                }
+        with self._lock:
+            return {
+                "requests_sent": self._requests_sent,
+                "errors": self._errors,
+                "pools": pools,
+            }
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+class AsyncCRMClient:
+    """Non-blocking counterpart of CRMClient for the ASGI app, built on a pooled httpx.AsyncClient."""
+
+    def __init__(self, add_url, update_url,
+                 max_connections=CRM_ASYNC_MAX_CONNECTIONS,
+                 pool_shards=CRM_ASYNC_POOL_SHARDS,
+                 connect_timeout=CRM_CONNECT_TIMEOUT,
+                 add_timeout=CRM_ADD_READ_TIMEOUT,
+                 update_timeout=CRM_UPDATE_READ_TIMEOUT,
+                 max_retries=CRM_MAX_RETRIES,
+                 backoff_factor=CRM_BACKOFF_FACTOR,
+                 backoff_jitter=CRM_BACKOFF_JITTER):
+        self.add_url = add_url
+        self.update_url = update_url
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self._add_timeout = httpx.Timeout(add_timeout, connect=connect_timeout)
+        self._update_timeout = httpx.Timeout(update_timeout, connect=connect_timeout)
+        self.pool_shards = max(1, pool_shards)
+        per_shard = max(1, max_connections // self.pool_shards)
+        self._limits = httpx.Limits(max_connections=per_shard, max_keepalive_connections=per_shard)
+        self._clients = []
+        self._next_shard = itertools.count()
+        self._requests_sent = 0
+        self._errors = 0
+        self.guard = get_guard("crm", CRM_ASYNC_MAX_CONCURRENCY)
+
+    def _get_client(self):
+        # Created inside the running event loop on first use, then used round-robin
+        if not self._clients:
+            for _ in range(self.pool_shards):
+                # Transport retries cover connect errors only, which are safe for POST too
+                transport = httpx.AsyncHTTPTransport(retries=self.max_retries, limits=self._limits)
+                self._clients.append(httpx.AsyncClient(transport=transport, headers={"Content-Type": "application/json"}))
+        return self._clients[next(self._next_shard) % len(self._clients)]
+
+    async def request(self, method, url, timeout, operation="request", **kwargs):
+        """Send a request; idempotent methods are retried on 502/503/504 with jittered backoff."""
+        client = self._get_client()
+        attempt = 0
+        while True:
+            # Never wait for a slot here: that would block the event loop
+            with self.guard.protect(wait=False) as call, upstream_span("crm", operation):
+                self._requests_sent += 1
+                try:
+                    response = await client.request(method, url, timeout=timeout, **kwargs)
+                except httpx.RequestError:
+                    self._errors += 1
+                    raise
+                if response.status_code >= 500:
+                    call.mark_failed()
+            if response.status_code >= 500:
+                record_upstream_error("crm", operation)
+            if (response.status_code not in RETRY_STATUSES or method not in IDEMPOTENT_METHODS
+                    or attempt >= self.max_retries):
+                return response
+            await asyncio.sleep(self.backoff_factor * 2 ** attempt + random.uniform(0, self.backoff_jitter))
+            attempt += 1
+
+    async def add_lead(self, payload):
+        """POST a new lead to the CRM and return the raw response."""
+        return await self.request("POST", self.add_url, self._add_timeout, operation="add_lead", json=payload)
+
+    async def update_lead(self, enq_id, fields):
+        """PUT updated fields for an existing lead and return the raw response."""
+        return await self.request("PUT", f"{self.update_url}/{enq_id}", self._update_timeout,
+                                  operation="update_lead", json=fields)
+
+    def pool_stats(self):
+        return {"requests_sent": self._requests_sent, "errors": self._errors}
+
+    async def aclose(self):
+        clients, self._clients = self._clients, []
+        for client in clients:
+            await client.aclose()
@@ -1,21 +1,15 @@
-import pymssql
+import logging
+from db_pool import get_writer, PoolTimeout, WriteTimeout, pyodbc
 
-DB_CONFIG = {
-    "server": "3.109.247.242",
-    "user": "kiran",
-    "password": "Kiran_123!!",
-    "database": "newton_crm_ai"
-}
+logger = logging.getLogger("db_operations")
+
+# Batched inserts through the connection pool shared with the rest of the app (see db_pool.py)
+lead_writer = get_writer("INSERT INTO Leads (Name, Email, Phone) VALUES (?, ?, ?)", logger=logger)
 
 def save_lead(name, email, phone):
     try:
-        conn = pymssql.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO Leads (Name, Email, Phone) VALUES (%s, %s, %s)", 
-                       (name, email, phone))
-        conn.commit()
-        conn.close()
+        lead_writer.write((name, email, phone))
         return True
-    except pymssql.Error as e:
-        print(f"Error saving lead: {str(e)}")
+    except (pyodbc.Error, PoolTimeout, WriteTimeout) as e:
+        logger.exception("Error saving lead: %s", e)
         return False
@@ -0,0 +1,271 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as WriteTimeout
+from contextlib import contextmanager
+from lazy_import import lazy_module
+
+pyodbc = lazy_module("pyodbc")  # Imported when the first connection is opened
+
+# Pool / batching configuration (overridable through the environment)
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 30))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", 1800))  # Recycle connections after 30 minutes
+DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", 30))  # Ping connections idle this long
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", 100))
+DB_BATCH_INTERVAL = float(os.getenv("DB_BATCH_INTERVAL", 0.05))  # Max seconds a row waits for its batch
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", 30))
+DB_ODBC_DRIVER = os.getenv("DB_ODBC_DRIVER", "ODBC Driver 17 for SQL Server")
+
+
+class PoolTimeout(Exception):
+    """Raised when no database connection becomes available in time."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections with idle health checks and a max lifetime."""
+
+    def __init__(self, connect,
+                 max_size=DB_POOL_MAX_SIZE,
+                 acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+                 max_lifetime=DB_POOL_MAX_LIFETIME,
+                 health_check_after=DB_POOL_HEALTH_CHECK_AFTER,
+                 health_check_sql="SELECT 1"):
+        self._connect = connect  # Zero-argument factory returning a new DB-API connection
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.health_check_sql = health_check_sql
+        self._idle = deque()  # [connection, created_at, last_used], most recently used on the right
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._recycled = 0
+        self._failed_checks = 0
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is rolled back and discarded if the block raises."""
+        conn, created_at = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            self._discard(conn)
+            raise
+        else:
+            self._release(conn, created_at)
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise PoolTimeout(f"No database connection available after {self.acquire_timeout}s")
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    return self._open()
+                conn, created_at, last_used = entry
+                now = time.monotonic()
+                if now - created_at > self.max_lifetime:
+                    self._close(conn)
+                    with self._lock:
+                        self._recycled += 1
+                    continue
+                if now - last_used > self.health_check_after and not self._is_healthy(conn):
+                    self._close(conn)
+                    with self._lock:
+                        self._failed_checks += 1
+                    continue
+                return conn, created_at
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _open(self):
+        conn = self._connect()
+        with self._lock:
+            self._opened += 1
+        return conn, time.monotonic()
+
+    def _is_healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.health_check_sql)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _release(self, conn, created_at):
+        with self._lock:
+            self._idle.append([conn, created_at, time.monotonic()])
+        self._slots.release()
+
+    def _discard(self, conn):
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        self._close(conn)
+        self._slots.release()
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """Close every idle connection (e.g. at shutdown or after a fork)."""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "opened": self._opened,
+                "recycled": self._recycled,
+                "failed_health_checks": self._failed_checks,
+            }
+
+
+class BatchWriter:
+    """Write-behind batcher that groups inserts from concurrent callers into one executemany."""
+
+    def __init__(self, pool, sql, logger=None,
+                 max_batch=DB_BATCH_SIZE,
+                 flush_interval=DB_BATCH_INTERVAL):
+        self.pool = pool
+        self.sql = sql
+        self.logger = logger
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, params):
+        """Queue one row of parameters; the returned Future resolves once it is committed."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((params, future))
+        return future
+
+    def write(self, params, timeout=DB_WRITE_TIMEOUT):
+        """Queue one row and block until it is committed (re-raises the database error).
+
+        On timeout a row still waiting in the queue is cancelled, so it is never
+        committed after the caller reported the failure; a row the writer has
+        already started on is waited for instead.
+        """
+        future = self.submit(params)
+        try:
+            return future.result(timeout)
+        except WriteTimeout:
+            if future.cancel():
+                raise
+            return future.result()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="db-batch-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # Drop cancelled rows; the rest can no longer be cancelled
+            batch = [(params, future) for params, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            self._execute([params for params, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # One bad row must not fail its neighbours: retry the rows one by one
+            if self.logger:
+                self.logger.warning("Batch insert of %d rows failed, retrying individually: %s", len(batch), e)
+            for params, future in batch:
+                try:
+                    self._execute([params])
+                except Exception as row_error:
+                    future.set_exception(row_error)
+                else:
+                    future.set_result(True)
+            return
+        for _, future in batch:
+            future.set_result(True)
+
+    def _execute(self, rows):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            if hasattr(cursor, "fast_executemany"):
+                cursor.fast_executemany = True  # pyodbc: send the whole batch as one parameter array
+            cursor.executemany(self.sql, rows)
+            conn.commit()
+            cursor.close()
+
+
+def connect():
+    """Open a new MSSQL connection from the DB_* settings.
+
+    Read on every call rather than at import, so a .env loaded after this module
+    is imported still applies.
+    """
+    return pyodbc.connect(
+        f"DRIVER={{{DB_ODBC_DRIVER}}};"
+        f"SERVER={os.getenv('DB_HOST')},{os.getenv('DB_PORT', '1433')};"
+        f"DATABASE={os.getenv('DB_NAME')};"
+        f"UID={os.getenv('DB_USER')};"
+        f"PWD={os.getenv('DB_PASSWORD')};"
+    )
+
+
+# One pool (and one writer per statement) per process, shared by every module that uses the database
+_shared_pool = None
+_shared_writers = {}
+_shared_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide MSSQL connection pool"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = ConnectionPool(connect)
+        return _shared_pool
+
+
+def get_writer(sql, logger=None):
+    """The process-wide BatchWriter for one INSERT statement, writing through the shared pool"""
+    pool = get_pool()
+    with _shared_lock:
+        writer = _shared_writers.get(sql)
+        if writer is None:
+            writer = _shared_writers[sql] = BatchWriter(pool, sql, logger=logger)
+        return writer
@@ -0,0 +1,252 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import json_codec
+from coalesce import UPDATE_COALESCE_WINDOW
+from crm_client import max_call_seconds
+from extraction import normalize_email, normalize_mobile, DEFAULT_ENQ_ID
+from resilience import UPSTREAM_QUEUE_TIMEOUT
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# De-duplication configuration (overridable through the environment)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_DB_PATH = os.getenv("DEDUP_DB_PATH", os.path.join(BASE_DIR, 'data', 'dedup.db'))
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", 50000))  # Keys kept in the in-memory LRU
+DEDUP_TTL = float(os.getenv("DEDUP_TTL", 30 * 24 * 3600))  # How long a lead counts as already created
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", 24 * 3600))
+# An unfinished claim older than this is taken over. It has to outlast the slowest request it covers:
+# waiting for a CRM slot and the coalescing window, then a CRM call with every retry, plus a margin
+IDEMPOTENCY_LEASE = float(os.getenv(
+    "IDEMPOTENCY_LEASE", UPSTREAM_QUEUE_TIMEOUT + UPDATE_COALESCE_WINDOW + max_call_seconds() + 30
+))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lead_keys (
+    key TEXT PRIMARY KEY,
+    enq_id TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    route TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status INTEGER,
+    body BLOB,
+    headers TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (route, key)
+);
+"""
+
+
+class SQLiteStore:
+    """One lazily opened SQLite (WAL) connection shared by the dedup index and idempotency keys."""
+
+    def __init__(self, path=DEDUP_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._conn_pid = None
+        self.lock = threading.Lock()
+
+    def connection(self):
+        # Reopen in a forked worker: a SQLite connection must not be shared across fork()
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            # Files created before stored responses kept their headers
+            if "headers" not in {row[1] for row in conn.execute("PRAGMA table_info(idempotency_keys)")}:
+                conn.execute("ALTER TABLE idempotency_keys ADD COLUMN headers TEXT")
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+
+def lead_keys(email, mobile):
+    """Normalized lookup keys for a lead; either one identifies it"""
+    keys = []
+    email = normalize_email(email)
+    if email:
+        keys.append("e:" + email)
+    mobile = normalize_mobile(mobile)
+    if mobile:
+        keys.append("m:" + mobile)
+    return keys
+
+
+def assigned_enq_id(crm_response):
+    """The Enq_Id the CRM assigned in its reply, or None.
+
+    The CRM echoes back the placeholder Enq_Id every payload carries; that one
+    is shared by all leads and must never be used to identify one.
+    """
+    enq_id = crm_response.get("Enq_Id") if isinstance(crm_response, dict) else None
+    if not enq_id or str(enq_id) == DEFAULT_ENQ_ID:
+        return None
+    return str(enq_id)
+
+
+def lead_matches(lead, email=None, mobile=None):
+    """True when the lead has the given (normalized) email or mobile"""
+    if not isinstance(lead, dict):
+        return False
+    email, mobile = normalize_email(email), normalize_mobile(mobile)
+    return bool(email and normalize_email(lead.get("email")) == email
+                or mobile and normalize_mobile(lead.get("mobile")) == mobile)
+
+
+class LeadIndex:
+    """Maps normalized email and mobile to the Enq_Id of a lead already created in the CRM.
+
+    Lookups hit an in-memory LRU first and fall back to the persistent store,
+    so repeat submissions are answered without a CRM round-trip.
+    """
+
+    def __init__(self, store, max_cached=DEDUP_CACHE_SIZE, ttl=DEDUP_TTL, enabled=DEDUP_ENABLED):
+        self.store = store
+        self.max_cached = max_cached
+        self.ttl = ttl
+        self.enabled = enabled
+        self._cache = OrderedDict()  # key -> (enq_id, created_at)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def lookup(self, email, mobile):
+        """Enq_Id of an existing lead with this email or mobile, or None"""
+        if not self.enabled:
+            return None
+        keys = lead_keys(email, mobile)
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = self._cache.get(key)
+                if entry is not None and now - entry[1] < self.ttl:
+                    self._cache.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+        if not keys:
+            return None
+
+        with self.store.lock:
+            row = self.store.connection().execute(
+                f"SELECT key, enq_id, created_at FROM lead_keys WHERE key IN ({','.join('?' * len(keys))}) "
+                "AND created_at > ? ORDER BY created_at DESC LIMIT 1",
+                (*keys, now - self.ttl),
+            ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.store_hits += 1
+            self._remember(row[0], row[1], row[2])
+        return row[1]
+
+    def record(self, email, mobile, enq_id):
+        """Remember that a lead with this email/mobile now exists as enq_id"""
+        if not self.enabled or not enq_id:
+            return
+        keys = lead_keys(email, mobile)
+        now = time.time()
+        with self.store.lock:
+            self.store.connection().executemany(
+                "INSERT OR REPLACE INTO lead_keys (key, enq_id, created_at) VALUES (?, ?, ?)",
+                [(key, str(enq_id), now) for key in keys],
+            )
+        with self._lock:
+            for key in keys:
+                self._remember(key, str(enq_id), now)
+
+    def _remember(self, key, enq_id, created_at):
+        self._cache[key] = (enq_id, created_at)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "cached_keys": len(self._cache),
+                "memory_hits": self.memory_hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+            }
+
+
+# Outcomes of IdempotencyStore.begin()
+NEW = "new"
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+
+
+def request_fingerprint(body):
+    return hashlib.sha256(body or b"").hexdigest()
+
+
+class IdempotencyStore:
+    """Remembers the response for each (route, Idempotency-Key) so client retries are safe."""
+
+    def __init__(self, store, ttl=IDEMPOTENCY_TTL, lease=IDEMPOTENCY_LEASE):
+        self.store = store
+        self.ttl = ttl
+        self.lease = lease
+
+    def begin(self, route, key, fingerprint):
+        """Claim a key. Returns (NEW, None) or (REPLAY, (status, body, headers)) or (IN_PROGRESS | MISMATCH, None)"""
+        now = time.time()
+        with self.store.lock:
+            conn = self.store.connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT fingerprint, status, body, created_at, headers FROM idempotency_keys "
+                    "WHERE route = ? AND key = ?",
+                    (route, key),
+                ).fetchone()
+                expired = row is not None and (
+                    now - row[3] > self.ttl or (row[1] is None and now - row[3] > self.lease)
+                )
+                if row is None or expired:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO idempotency_keys "
+                        "(route, key, fingerprint, status, body, headers, created_at) VALUES (?, ?, ?, NULL, NULL, NULL, ?)",
+                        (route, key, fingerprint, now),
+                    )
+                    outcome = (NEW, None)
+                elif row[0] != fingerprint:
+                    outcome = (MISMATCH, None)
+                elif row[1] is None:
+                    outcome = (IN_PROGRESS, None)
+                else:
+                    outcome = (REPLAY, (row[1], row[2], json_codec.loads(row[4]) if row[4] else {}))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return outcome
+
+    def complete(self, route, key, status, body, headers=None):
+        """Store the response to replay; `headers` are the response headers that have to be replayed with it"""
+        with self.store.lock:
+            self.store.connection().execute(
+                "UPDATE idempotency_keys SET status = ?, body = ?, headers = ? WHERE route = ? AND key = ?",
+                (status, body, json_codec.dumps(headers) if headers else None, route, key),
+            )
+
+    def abandon(self, route, key):
+        """Release a claim without a stored result, so the client can retry (e.g. after a 5xx)"""
+        with self.store.lock:
+            self.store.connection().execute(
+                "DELETE FROM idempotency_keys WHERE route = ? AND key = ? AND status IS NULL", (route, key)
+            )
@@ -0,0 +1,313 @@
+import os
+import re
+import threading
+from collections import namedtuple
+from itertools import islice
+
+# Name extraction mode: "regex" (introductions like "my name is ...") or "spacy",
+# which falls back to spaCy's named-entity recognizer when no introduction is found
+NAME_EXTRACTOR = os.getenv("NAME_EXTRACTOR", "regex").lower()
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", 64))  # Messages per nlp.pipe batch in bulk paths
+NER_ENABLED = NAME_EXTRACTOR == "spacy"
+# Pipeline components the recognizer needs; everything else is disabled after loading
+NER_COMPONENTS = ("tok2vec", "ner")
+# Components of spaCy's trained pipelines that NER does not use; excluded at load time so their weights are never read
+NER_EXCLUDED_COMPONENTS = ("tagger", "morphologizer", "parser", "senter", "attribute_ruler", "lemmatizer",
+                           "trainable_lemmatizer", "textcat", "textcat_multilabel", "entity_linker")
+
+# Patterns are compiled once at import time and shared by every request.
+#
+# Every alternative is anchored with a look-behind so a scan can only start a
+# match at the beginning of a token. Without it, a long run of e.g. email-like
+# characters with no "@" is re-scanned from every offset (quadratic time).
+EMAIL_PATTERN = r"(?<![a-zA-Z0-9_.+-])[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
+MOBILE_PATTERN = r"(?<![\d+])(?:\+91[\-\s]?)?0?(?:91)?[789]\d{9}(?!\d)"
+# The name itself is captured inside a look-ahead, so a name match consumes only the introduction:
+# in "this is ravi.kumar@gmail.com" the scan goes on to find the email that starts at "ravi"
+NAME_PATTERN = r"(?i:(?<![a-zA-Z])(?P<intro>my name is|I am|this is|name is|name)\s+(?=(?P<first_name>[a-zA-Z]+)))"
+
+# Single-pass scanner: one finditer over the message finds all three kinds
+LEAD_SCANNER = re.compile(rf"(?P<email>{EMAIL_PATTERN})|(?P<mobile>{MOBILE_PATTERN})|(?P<name>{NAME_PATTERN})")
+
+PHONE_RE = re.compile(r"(\+91[\-\s]?)?[0]?(91)?[789]\d{9}")
+EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+NON_DIGIT_RE = re.compile(r"\D")
+
+# Digit prefixes MOBILE_PATTERN allows in front of the 10-digit number: [+91] [0] [91]
+MOBILE_PREFIXES = frozenset(a + b + c for a in ("", "91") for b in ("", "0") for c in ("", "91"))
+
+# "my name is Ravi" names the user; "I am ..." and "this is ..." often do not ("I am looking for a 2BHK")
+EXPLICIT_NAME_INTROS = frozenset(("my name is", "name is", "name"))
+# Words that follow "I am" / "this is" / "name" in chat messages but are not names
+NAME_STOP_WORDS = frozenset("""
+    a an the and or not no yes ok okay sure fine good great glad happy sorry just also still very so here there
+    from in at on for to with of about is it me my your this that interested looking searching planning trying
+    thinking hoping wondering calling writing asking enquiring inquiring requesting sharing sending going coming
+    based staying living residing working available busy free ready new back currently already only
+""".split())
+
+# Cheap pre-filter: the small English models almost never tag a PERSON without a capitalized word.
+# Every sentence starts with one, so words opening the message or following ".", "!" or "?" do not count.
+NER_CANDIDATE_RE = re.compile(r"(?<![A-Za-z])(?<![.!?])(?<![.!?]\s)[A-Z][a-z]+")
+# Capitalized mid-sentence words that are not names either
+NER_SKIP_WORDS = NAME_STOP_WORDS | frozenset("""
+    i hi hello hey dear regards thanks thank please kindly sir madam team
+    monday tuesday wednesday thursday friday saturday sunday january february march april may june july
+    august september october november december
+""".split())
+
+# Lead defaults and the fields a conversation has to collect before its lead is submitted
+DEFAULT_ENQ_ID = "12345"
+LEAD_CAPTURE_FIELDS = ("firstnm", "email", "mobile")
+
+# One match found in a message; `normalized` is the canonical form used for comparisons,
+# `intro` the lowercased phrase in front of a name ("my name is", "i am", ...)
+Candidate = namedtuple("Candidate", ["kind", "value", "normalized", "start", "end", "intro"], defaults=(None,))
+
+
+def normalize_mobile(mobile):
+    """Normalize an Indian mobile number to E.164 (+91XXXXXXXXXX), or return '' if invalid"""
+    if not mobile:
+        return ""
+    digits = NON_DIGIT_RE.sub("", mobile)
+    if len(digits) < 10 or digits[-10] not in "789":
+        return ""
+    if digits[:-10] not in MOBILE_PREFIXES:
+        return ""
+    return "+91" + digits[-10:]
+
+
+def normalize_email(email):
+    """Canonical form of an email address for comparisons"""
+    return email.strip().lower() if email else ""
+
+
+def scan_message(message):
+    """Find every email, mobile and name candidate in one pass over the message.
+
+    Returns a dict mapping "email", "mobile" and "name" to lists of Candidate,
+    in the order they appear in the message.
+    """
+    found = {"email": [], "mobile": [], "name": []}
+    for match in LEAD_SCANNER.finditer(message):
+        kind = match.lastgroup
+        if kind == "email":
+            value = match.group("email")
+            found["email"].append(Candidate("email", value, normalize_email(value), match.start(), match.end()))
+        elif kind == "mobile":
+            value = match.group("mobile")
+            found["mobile"].append(Candidate("mobile", value, normalize_mobile(value), match.start(), match.end()))
+        else:
+            value = match.group("first_name")
+            found["name"].append(Candidate("name", value, value.capitalize(), match.start("first_name"),
+                                           match.end("first_name"), " ".join(match.group("intro").lower().split())))
+    return found
+
+
+def validate_phone(phone):
+    """Validate Indian phone numbers with optional country code"""
+    return bool(PHONE_RE.fullmatch(phone.strip())) if phone else False
+
+
+def validate_email(email):
+    """Basic email validation"""
+    return bool(EMAIL_RE.fullmatch(email.strip())) if email else False
+
+
+def first_matches(message):
+    """The first email, mobile and name in the message ("" when missing), from the same single pass.
+
+    The scan stops once all three are found, and no Candidate is built or
+    normalized, which keeps the per-message cost of extraction at the level
+    of the original three re.search calls.
+    """
+    found = {"email": "", "mobile": "", "name": ""}
+    missing = 3
+    for match in LEAD_SCANNER.finditer(message):
+        kind = match.lastgroup
+        if not found[kind]:
+            found[kind] = match.group("first_name" if kind == "name" else kind)
+            missing -= 1
+            if not missing:
+                break
+    return found
+
+
+def lead_from_matches(found, first_name=""):
+    return {
+        "Enq_Id": DEFAULT_ENQ_ID,
+        "firstnm": found["name"] or first_name,
+        "email": found["email"],
+        "mobile": found["mobile"]
+    }
+
+
+def has_name_cue(message):
+    """True when a capitalized word that is not a sentence opener or a common word could be a name"""
+    message = message.lstrip()
+    for match in NER_CANDIDATE_RE.finditer(message):
+        if match.start() and match.group().lower() not in NER_SKIP_WORDS:
+            return True
+    return False
+
+
+def needs_ner(message, found):
+    """True when the regex found no name (found["name"] is empty) but the message might contain one"""
+    return NER_ENABLED and not found["name"] and has_name_cue(message)
+
+
+def extract_data_from_message(message):
+    """Extract structured data from unstructured text input."""
+    found = first_matches(message)
+    if needs_ner(message, found):
+        nlp = load_ner_model()
+        if nlp is not None:
+            return lead_from_matches(found, person_first_name(nlp(message)))
+    return lead_from_matches(found)
+
+
+def extract_data_from_messages(messages, batch_size=SPACY_BATCH_SIZE):
+    """Extract a list of messages at once, running NER over them in nlp.pipe batches"""
+    scans = [first_matches(message) for message in messages]
+    names = [""] * len(messages)
+    pending = [index for index, message in enumerate(messages) if needs_ner(message, scans[index])]
+    nlp = load_ner_model() if pending else None
+    if nlp is not None:
+        docs = nlp.pipe((messages[index] for index in pending), batch_size=batch_size)
+        for index, doc in zip(pending, docs):
+            names[index] = person_first_name(doc)
+    return [lead_from_matches(found, name) for found, name in zip(scans, names)]
+
+
+def new_lead_state():
+    """Lead details collected so far in one conversation"""
+    return {"firstnm": "", "email": "", "mobile": "", "submitted": False}
+
+
+def plausible_name(candidate):
+    """Drop "I am looking ..."-style matches: stop-words, and lowercase words after a weak introduction"""
+    if candidate.value.lower() in NAME_STOP_WORDS:
+        return False
+    return candidate.intro in EXPLICIT_NAME_INTROS or candidate.value[0].isupper()
+
+
+def update_lead_state(state, message):
+    """Fill the fields still missing from a conversation's lead state using one new message.
+
+    Only `message` is scanned, so a conversation costs one scan per turn however
+    long it gets. Fields found in earlier turns are kept, except that an explicit
+    "my name is ..." replaces a name taken from a weaker "I am ..." or NER match;
+    emails and mobiles are only taken when they validate. Returns the names of
+    the fields filled or replaced.
+    """
+    missing = [field for field in LEAD_CAPTURE_FIELDS if not state[field]]
+    if not missing and state.get("name_explicit"):
+        return []
+    found = scan_message(message)
+    filled = []
+    if not state["email"]:
+        state["email"] = next((c.value for c in found["email"] if validate_email(c.value)), "")
+    if not state["mobile"]:
+        state["mobile"] = next((c.value for c in found["mobile"] if validate_phone(c.value)), "")
+    if not state.get("name_explicit"):
+        names = [c for c in found["name"] if plausible_name(c)]
+        explicit = next((c for c in names if c.intro in EXPLICIT_NAME_INTROS), None)
+        if explicit is not None:
+            if state["firstnm"] and state["firstnm"] != explicit.value:
+                filled.append("firstnm")
+            state["firstnm"] = explicit.value
+            state["name_explicit"] = True
+        elif not state["firstnm"]:
+            if names:
+                state["firstnm"] = names[0].value
+            elif needs_ner(message, dict(found, name=names)):
+                nlp = load_ner_model()
+                if nlp is not None:
+                    state["firstnm"] = person_first_name(nlp(message))
+    return [field for field in missing if state[field]] + filled
+
+
+def lead_from_state(state):
+    """The lead to submit for a conversation once every capture field is present, else None"""
+    if not all(state[field] for field in LEAD_CAPTURE_FIELDS):
+        return None
+    return {"Enq_Id": DEFAULT_ENQ_ID, "firstnm": state["firstnm"], "email": state["email"], "mobile": state["mobile"]}
+
+
+def iter_batches(items, size=SPACY_BATCH_SIZE):
+    """Split any iterable into lists of at most `size` items without reading ahead further"""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+# NER model: loaded at most once per process, on first use or by load_ner_model() at startup
+_ner_model = None
+_ner_error = None
+_ner_lock = threading.Lock()
+
+
+def load_ner_model(logger=None):
+    """The spaCy pipeline with only NER_COMPONENTS enabled, or None if spaCy or the model is unavailable
+
+    NER_EXCLUDED_COMPONENTS are not loaded at all; anything else the model has
+    besides NER_COMPONENTS is loaded but disabled.
+    """
+    global _ner_model, _ner_error
+    if _ner_model is not None or _ner_error is not None:
+        return _ner_model
+    with _ner_lock:
+        if _ner_model is None and _ner_error is None:
+            try:
+                import spacy
+                nlp = spacy.load(SPACY_MODEL, exclude=list(NER_EXCLUDED_COMPONENTS))
+                nlp.select_pipes(enable=[name for name in NER_COMPONENTS if name in nlp.pipe_names])
+                _ner_model = nlp
+            except Exception as e:
+                # ImportError without spaCy, OSError when the model package is missing
+                _ner_error = f"{type(e).__name__}: {e}"
+                if logger:
+                    logger.warning("NER extraction unavailable, using regex only: %s", _ner_error)
+    return _ner_model
+
+
+def person_first_name(doc):
+    """First word of the first PERSON entity in a spaCy Doc, or ''"""
+    for ent in doc.ents:
+        if ent.label_ == "PERSON":
+            for token in ent:
+                if token.is_alpha:
+                    return token.text
+    return ""
+
+
+def ner_status():
+    return {
+        "extractor": NAME_EXTRACTOR,
+        "model": SPACY_MODEL if NER_ENABLED else None,
+        "loaded": _ner_model is not None,
+        "error": _ner_error,
+    }
+
+
+def validate_lead(extracted_data, logger):
+    """Check required fields, email and phone; return an (error, status) pair or None"""
+    required_fields = ['Enq_Id', 'firstnm', 'email', 'mobile']
+    missing_fields = [field for field in required_fields if not extracted_data.get(field)]
+    if missing_fields:
+        logger.warning("Missing fields: %s", missing_fields)
+        return {"error": "Missing required fields", "missing": missing_fields}, 400
+
+    if not validate_email(extracted_data['email']):
+        logger.error("Invalid email: %s", extracted_data["email"])
+        return {"error": "Invalid email format"}, 400
+
+    if not validate_phone(extracted_data['mobile']):
+        logger.error("Invalid phone: %s", extracted_data["mobile"])
+        return {"error": "Invalid phone number"}, 400
+
+    return None
@@ -0,0 +1,144 @@
+import os
+import re
+import threading
+from extraction import scan_message
+from metrics import REGISTRY
+
+# Intent routing configuration (overridable through the environment)
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+# Words besides the contact details themselves a message may have and still be answered locally
+INTENT_CONTACT_MAX_WORDS = int(os.getenv("INTENT_CONTACT_MAX_WORDS", 6))
+# Reply templates; the contact ones are formatted with the lead state ({firstnm}, {email}, {mobile}, {missing});
+# other placeholders render empty
+INTENT_TEMPLATES = {
+    "greeting": os.getenv("INTENT_GREETING_REPLY", "Hello! How can I help you today?"),
+    "thanks": os.getenv("INTENT_THANKS_REPLY", "You're welcome! Is there anything else I can help you with?"),
+    "goodbye": os.getenv("INTENT_GOODBYE_REPLY", "Thank you for chatting with us. Have a great day!"),
+    "contact_missing": os.getenv("INTENT_CONTACT_MISSING_REPLY", "Thank you! Could you also share your {missing}?"),
+    "contact_submitted": os.getenv(
+        "INTENT_CONTACT_SUBMITTED_REPLY",
+        "Thank you, {firstnm}! We have your details and our team will get in touch with you shortly.",
+    ),
+}
+
+# Small-talk rules, matched against the whole normalized message so "hi, what is the price?" still
+# reaches the model. Compiled once into a single alternation; the group name is the intent.
+GREETING_PATTERN = r"(?:hi+|hello+|hey+|hii+|namaste|good (?:morning|afternoon|evening))(?: there| team| bot)?"
+THANKS_PATTERN = r"(?:ok(?:ay)? )?(?:thanks?|thank you|thankyou|thx|ty)(?: (?:so|very) much| a lot)?"
+GOODBYE_PATTERN = r"(?:ok(?:ay)? )?(?:bye+|bye bye|goodbye|good bye|see you|see ya|good night)"
+INTENT_RE = re.compile(rf"(?P<greeting>{GREETING_PATTERN})|(?P<thanks>{THANKS_PATTERN})|(?P<goodbye>{GOODBYE_PATTERN})")
+
+NON_WORD_RE = re.compile(r"[^\w\s]+")
+WHITESPACE_RE = re.compile(r"\s+")
+
+# How missing lead fields are asked for
+FIELD_LABELS = {"firstnm": "name", "email": "email address", "mobile": "mobile number"}
+
+MODEL = "model"
+
+# Templates filled in with the lead state; the small-talk ones are sent as written
+FORMATTED_TEMPLATES = ("contact_missing", "contact_submitted")
+
+
+def normalize_message(message):
+    return WHITESPACE_RE.sub(" ", NON_WORD_RE.sub(" ", message.casefold())).strip()
+
+
+def is_contact_message(message):
+    """True when the message is mostly contact details: an email or mobile with only a few other words"""
+    if "?" in message:
+        return False
+    found = scan_message(message)
+    if not found["email"] and not found["mobile"]:
+        return False
+    # Drop the details (and "my name is ..." introductions) and count what is left
+    spans = sorted((c.start, c.end) for candidates in found.values() for c in candidates)
+    rest, position = [], 0
+    for start, end in spans:
+        rest.append(message[position:start])
+        position = max(position, end)
+    rest.append(message[position:])
+    return len(normalize_message(" ".join(rest)).split()) <= INTENT_CONTACT_MAX_WORDS
+
+
+def join_labels(labels):
+    return labels[0] if len(labels) == 1 else ", ".join(labels[:-1]) + " and " + labels[-1]
+
+
+class TemplateFields(dict):
+    """Template values; a {placeholder} the lead state does not have renders as an empty string"""
+
+    def __missing__(self, key):
+        return ""
+
+
+def check_templates(templates):
+    """Raise ValueError for a contact template that cannot be rendered, e.g. an unclosed brace or a {0} field"""
+    for name in FORMATTED_TEMPLATES:
+        template = templates[name]
+        try:
+            template.format_map(TemplateFields())
+        except (ValueError, IndexError, KeyError) as e:
+            raise ValueError(f"Invalid {name} reply template {template!r}: {e}") from None
+
+
+class IntentRouter:
+    """Answers small talk and contact-detail messages from templates so they skip the model."""
+
+    def __init__(self, templates=INTENT_TEMPLATES, enabled=INTENT_ROUTER_ENABLED):
+        check_templates(templates)
+        self.templates = templates
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.routed = {}  # intent (or MODEL) -> messages
+
+    def reply(self, message, lead=None):
+        """The local reply for a message, or None to send it to the model.
+
+        `lead` is the conversation's lead state after capture_chat_lead() has
+        taken this message's details (None when chat lead capture is off).
+        """
+        intent, response = self.match(message, lead) if self.enabled else (None, None)
+        self._count(intent or MODEL)
+        return response
+
+    def match(self, message, lead):
+        match = INTENT_RE.fullmatch(normalize_message(message))
+        if match:
+            return match.lastgroup, self.templates[match.lastgroup]
+        # Details the capture could not use (or a failed submission) get an answer from the model
+        if lead is not None and not lead.get("error") and is_contact_message(message):
+            missing = [FIELD_LABELS[field] for field in FIELD_LABELS if not lead.get(field)]
+            if missing:
+                fields = TemplateFields(lead, missing=join_labels(missing))
+                return "contact", self.templates["contact_missing"].format_map(fields)
+            if lead.get("submitted"):
+                return "contact", self.templates["contact_submitted"].format_map(TemplateFields(lead, missing=""))
+        return None, None
+
+    def _count(self, intent):
+        with self._lock:
+            self.routed[intent] = self.routed.get(intent, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            routed = dict(self.routed)
+        total = sum(routed.values())
+        local = total - routed.get(MODEL, 0)
+        return {"enabled": self.enabled, "messages": total, "routed": routed,
+                "local_share": round(local / total, 4) if total else 0.0}
+
+    def collect_metrics(self):
+        """Messages per route and the share answered locally, for /metrics"""
+        stats = self.stats()
+        samples = [("chat_messages_routed_total", (("intent", intent),), count)
+                   for intent, count in stats["routed"].items()]
+        samples.append(("chat_local_route_ratio", (), stats["local_share"]))
+        return samples
+
+
+def create_intent_router():
+    """Build the router and publish its counts on /metrics"""
+    router = IntentRouter()
+    REGISTRY.add_collector(router.collect_metrics)
+    return router
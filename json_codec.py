@@ -0,0 +1,103 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library codec is used without it
+    orjson = None
+
+# JSON codec configuration (overridable through the environment)
+# orjson reads integers beyond 64 bits as floats; use "json" if payloads can carry them
+JSON_CODEC = os.getenv("JSON_CODEC", "orjson").lower()  # "orjson" (when installed) or "json"
+USE_ORJSON = JSON_CODEC == "orjson" and orjson is not None
+# Embedding pre-encoded JSON as-is needs orjson.Fragment (orjson 3.10+); older versions re-encode it
+ORJSON_FRAGMENT = getattr(orjson, "Fragment", None) if USE_ORJSON else None
+
+# Dates and dataclasses go through `default` like they do with the standard library
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                  if orjson is not None else 0)
+COMPACT_SEPARATORS = (",", ":")
+
+
+class RawJSON:
+    """A JSON document that is already encoded, e.g. an upstream response body.
+
+    Serialized by copying `data` into the output instead of encoding `value`
+    again; `value` is the decoded document for code that needs to read it.
+    Without `data` (or without orjson.Fragment) `value` is encoded as usual.
+    """
+
+    __slots__ = ("data", "value")
+
+    def __init__(self, data, value):
+        self.data = data
+        self.value = value
+
+    def __repr__(self):
+        return f"RawJSON({self.data!r})"
+
+
+def _with_raw(default, fragment=None):
+    """A `default` hook that also handles RawJSON; `fragment` embeds its bytes as-is"""
+    def hook(obj):
+        if isinstance(obj, RawJSON):
+            if obj.data is not None and fragment is not None:
+                return fragment(obj.data)
+            return obj.value
+        if default is None:
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+        return default(obj)
+    return hook
+
+
+def stdlib_default(default=None):
+    """`default` for json.dumps calls that may meet RawJSON (e.g. Flask's pretty-printing path)"""
+    return _with_raw(default)
+
+
+def dumpb(obj, default=None, sort_keys=False):
+    """Compact UTF-8 JSON bytes"""
+    if USE_ORJSON:
+        try:
+            return orjson.dumps(obj, default=_with_raw(default, ORJSON_FRAGMENT),
+                                option=ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the standard library still encodes
+            pass
+    return json.dumps(obj, default=_with_raw(default), sort_keys=sort_keys, ensure_ascii=False,
+                      separators=COMPACT_SEPARATORS).encode("utf-8")
+
+
+def dumps(obj, default=None, sort_keys=False):
+    """Compact JSON text"""
+    if USE_ORJSON:
+        return dumpb(obj, default, sort_keys).decode("utf-8")
+    return json.dumps(obj, default=_with_raw(default), sort_keys=sort_keys, ensure_ascii=False,
+                      separators=COMPACT_SEPARATORS)
+
+
+def loads(data):
+    """Decode JSON from str or bytes; raises ValueError on invalid input"""
+    if USE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def response_json(response):
+    """Decode an HTTP response body (requests or httpx) once, keeping the raw bytes.
+
+    The RawJSON it returns can be put straight into another JSON document, so a
+    CRM reply passed through to the client is copied rather than re-encoded.
+    """
+    data = response.content
+    value = loads(data)
+    # Line breaks in a pretty-printed body would split NDJSON and SSE output lines; re-encode those
+    return RawJSON(data if b"\n" not in data and b"\r" not in data else None, value)
+
+
+def stats():
+    return {
+        "codec": "orjson" if USE_ORJSON else "json",
+        "orjson_version": orjson.__version__ if orjson else None,
+        "raw_passthrough": ORJSON_FRAGMENT is not None,
+    }
@@ -0,0 +1,56 @@
+import importlib
+import sys
+
+_lazy_modules = {}
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    Lets a module name be used at the top level (including in `except` clauses)
+    while the import cost is only paid by the first code path that needs it.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            # The import system's own per-module lock makes concurrent first use safe
+            module = importlib.import_module(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_module(name):
+    """Return the module if it is already imported, otherwise a LazyModule for it"""
+    if name in sys.modules:
+        return sys.modules[name]
+    return _lazy_modules.setdefault(name, LazyModule(name))
+
+
+def load_lazy_modules():
+    """Import every module handed out lazily so far; returns their names.
+
+    Used where paying the cost up front is cheaper, e.g. in a pre-forking
+    server's master so every worker shares the imported code.
+    """
+    for module in list(_lazy_modules.values()):
+        module._load()
+    return sorted(_lazy_modules)
+
+
+def lazy_module_stats():
+    return {name: module.__dict__["_module"] is not None for name, module in _lazy_modules.items()}
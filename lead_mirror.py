@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import threading
+import time
+import json_codec
+from extraction import normalize_email, normalize_mobile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Lead mirror configuration (overridable through the environment)
+LEAD_MIRROR_ENABLED = os.getenv("LEAD_MIRROR_ENABLED", "true").lower() == "true"
+LEAD_MIRROR_DB_PATH = os.getenv("LEAD_MIRROR_DB_PATH", os.path.join(BASE_DIR, 'data', 'leads.db'))
+LEAD_MIRROR_TTL = float(os.getenv("LEAD_MIRROR_TTL", 900))  # Seconds a mirrored lead is served without asking the CRM
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    enq_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    email TEXT,
+    mobile TEXT,
+    synced_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_leads_email ON leads (email);
+CREATE INDEX IF NOT EXISTS idx_leads_mobile ON leads (mobile);
+"""
+
+
+class LeadMirror:
+    """Local SQLite copy of the leads this app created or updated in the CRM.
+
+    Successful add/update calls write through to it and reads are served from
+    it while the copy is younger than `ttl` (counted from the last time the
+    whole lead was known to match the CRM); older copies are refreshed from
+    the CRM by the caller. Email and mobile are stored normalized and indexed.
+    """
+
+    def __init__(self, path=LEAD_MIRROR_DB_PATH, ttl=LEAD_MIRROR_TTL, enabled=LEAD_MIRROR_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.enabled = enabled
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.expired = 0
+        self.misses = 0
+
+    def _connection(self):
+        # Reopen in a forked worker: a SQLite connection must not be shared across fork()
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def get(self, enq_id):
+        """The mirrored lead as {"lead", "synced_at", "fresh"}, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT data, synced_at FROM leads WHERE enq_id = ?", (str(enq_id),)
+            ).fetchone()
+        return self._entry(row)
+
+    def find(self, email=None, mobile=None):
+        """The most recently synced mirrored lead with this email or mobile, or None"""
+        if not self.enabled:
+            return None
+        clauses, params = [], []
+        if normalize_email(email):
+            clauses.append("email = ?")
+            params.append(normalize_email(email))
+        if normalize_mobile(mobile):
+            clauses.append("mobile = ?")
+            params.append(normalize_mobile(mobile))
+        if not clauses:
+            return None
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT data, synced_at FROM leads WHERE {' OR '.join(clauses)} ORDER BY synced_at DESC LIMIT 1",
+                params,
+            ).fetchone()
+        return self._entry(row)
+
+    def _entry(self, row):
+        fresh = row is not None and time.time() - row[1] < self.ttl
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            elif fresh:
+                self.hits += 1
+            else:
+                self.expired += 1
+        if row is None:
+            return None
+        return {"lead": json_codec.loads(row[0]), "synced_at": row[1], "fresh": fresh}
+
+    def put(self, enq_id, lead):
+        """Store the whole lead as the CRM has it now; returns the new entry"""
+        now = time.time()
+        lead = dict(lead, Enq_Id=str(enq_id))
+        if self.enabled:
+            with self._lock:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO leads (enq_id, data, email, mobile, synced_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (str(enq_id), json_codec.dumps(lead), normalize_email(lead.get("email")) or None,
+                     normalize_mobile(lead.get("mobile")) or None, now, now),
+                )
+        return {"lead": lead, "synced_at": now, "fresh": True}
+
+    def merge(self, enq_id, fields):
+        """Apply fields the CRM accepted to a mirrored lead; leads not mirrored are left to the next read"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT data FROM leads WHERE enq_id = ?", (str(enq_id),)).fetchone()
+                if row is not None:
+                    lead = json_codec.loads(row[0])
+                    lead.update(fields)
+                    lead["Enq_Id"] = str(enq_id)
+                    # synced_at is kept: only these fields are known to match the CRM
+                    conn.execute(
+                        "UPDATE leads SET data = ?, email = ?, mobile = ?, updated_at = ? WHERE enq_id = ?",
+                        (json_codec.dumps(lead), normalize_email(lead.get("email")) or None,
+                         normalize_mobile(lead.get("mobile")) or None, time.time(), str(enq_id)),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row is not None
+
+    def delete(self, enq_id):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._connection().execute("DELETE FROM leads WHERE enq_id = ?", (str(enq_id),))
+
+    def stats(self):
+        stats = {"enabled": self.enabled, "ttl": self.ttl, "hits": self.hits, "expired": self.expired,
+                 "misses": self.misses}
+        if self.enabled:
+            with self._lock:
+                stats["leads"] = self._connection().execute("SELECT COUNT(*) FROM leads").fetchone()[0]
+        return stats
@@ -0,0 +1,100 @@
+import itertools
+import os
+import threading
+from lazy_import import lazy_module
+from metrics import upstream_span
+from resilience import OPENAI_MAX_CONCURRENCY, OPENAI_ASYNC_MAX_CONCURRENCY, get_guard
+
+# The OpenAI SDK is most of the app's import time; load it on the first completion
+httpx = lazy_module("httpx")
+openai = lazy_module("openai")
+
+# Completion configuration (overridable through the environment)
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # Point at a local stub for tests and benchmarks
+OPENAI_COMPLETION_MODEL = os.getenv("OPENAI_COMPLETION_MODEL", "text-davinci-003")
+OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", 150))
+OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", 0.7))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 30))
+# Connections for the async client, split over several httpx pools (see crm_client.CRM_ASYNC_POOL_SHARDS)
+OPENAI_ASYNC_MAX_CONNECTIONS = int(os.getenv("OPENAI_ASYNC_MAX_CONNECTIONS", 200))
+OPENAI_ASYNC_POOL_SHARDS = int(os.getenv("OPENAI_ASYNC_POOL_SHARDS", 8))
+
+_client = None
+_async_clients = []
+_next_async_client = itertools.count()
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Shared OpenAI client (one connection pool per process), created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = openai.OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, timeout=OPENAI_TIMEOUT)
+    return _client
+
+
+def get_async_client():
+    """Shared AsyncOpenAI clients for the ASGI app, created on first use inside the event loop."""
+    if not _async_clients:
+        per_shard = max(1, OPENAI_ASYNC_MAX_CONNECTIONS // max(1, OPENAI_ASYNC_POOL_SHARDS))
+        limits = httpx.Limits(max_connections=per_shard, max_keepalive_connections=per_shard)
+        for _ in range(max(1, OPENAI_ASYNC_POOL_SHARDS)):
+            _async_clients.append(openai.AsyncOpenAI(
+                api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, timeout=OPENAI_TIMEOUT,
+                http_client=openai.DefaultAsyncHttpxClient(limits=limits),
+            ))
+    return _async_clients[next(_next_async_client) % len(_async_clients)]
+
+
+def is_upstream_failure(exc):
+    """Errors that say the completion API is unhealthy (not e.g. a bad request)"""
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code >= 500
+    return isinstance(exc, openai.APIConnectionError)
+
+
+def completion_params(**overrides):
+    """Model parameters sent with every completion request."""
+    params = {
+        "model": OPENAI_COMPLETION_MODEL,
+        "max_tokens": OPENAI_MAX_TOKENS,
+        "temperature": OPENAI_TEMPERATURE,
+    }
+    params.update(overrides)
+    return params
+
+
+def complete(prompt, **overrides):
+    """Return the full completion text for a prompt."""
+    guard = get_guard("openai", OPENAI_MAX_CONCURRENCY)
+    with guard.protect(is_upstream_failure), upstream_span("openai", "completion"):
+        response = get_client().completions.create(prompt=prompt, **completion_params(**overrides))
+    return response.choices[0].text.strip()
+
+
+async def acomplete(prompt, **overrides):
+    """Non-blocking variant of complete()."""
+    guard = get_guard("openai", OPENAI_ASYNC_MAX_CONCURRENCY)
+    with guard.protect(is_upstream_failure, wait=False), upstream_span("openai", "completion"):
+        response = await get_async_client().completions.create(prompt=prompt, **completion_params(**overrides))
+    return response.choices[0].text.strip()
+
+
+def stream_completion(prompt, **overrides):
+    """Yield completion text fragments as the model produces them.
+
+    Closing the generator (e.g. when the client disconnects) closes the
+    upstream HTTP stream so the model stops generating tokens nobody reads.
+    """
+    guard = get_guard("openai", OPENAI_MAX_CONCURRENCY)
+    with guard.protect(is_upstream_failure), upstream_span("openai", "stream_completion"):
+        stream = get_client().completions.create(prompt=prompt, stream=True, **completion_params(**overrides))
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].text:
+                    yield chunk.choices[0].text
+        finally:
+            stream.close()
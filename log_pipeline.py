@@ -0,0 +1,191 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import json_codec
+
+# Logging configuration (overridable through the environment)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # Records buffered for the writer; extra records are dropped
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 5 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 3))
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "true").lower() == "true"  # Also write plain text lines to stderr
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", 1000))  # Longer payloads are truncated
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 1.0))  # Share of payloads logged in full
+# Per-route overrides, e.g. "/chat=0.1,/chat/stream=0.05,crm=0.2" ("crm" covers CRM responses)
+LOG_PAYLOAD_SAMPLE_RATES = os.getenv("LOG_PAYLOAD_SAMPLE_RATES", "")
+
+CONSOLE_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+
+
+def parse_sample_rates(spec):
+    """"/chat=0.1,/add_lead=1" -> {"/chat": 0.1, "/add_lead": 1.0}"""
+    rates = {}
+    for item in spec.split(","):
+        route, _, rate = item.strip().partition("=")
+        if route and rate:
+            rates[route] = float(rate)
+    return rates
+
+
+SAMPLE_RATES = parse_sample_rates(LOG_PAYLOAD_SAMPLE_RATES)
+
+
+class Payload:
+    """A request/response body in a log call, serialized only if the record is actually written."""
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value, max_chars=LOG_PAYLOAD_MAX_CHARS):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self):
+        text = self.value if isinstance(self.value, str) else json_codec.dumps(self.value, default=str)
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}...[truncated {len(text) - self.max_chars} chars]"
+        return text
+
+
+NOT_SAMPLED = "[payload not sampled]"
+
+
+def payload(route, value):
+    """Wrap a payload for logging, honouring the sample rate configured for the route"""
+    rate = SAMPLE_RATES.get(route, LOG_PAYLOAD_SAMPLE_RATE)
+    if rate < 1 and random.random() >= rate:
+        return NOT_SAMPLED
+    return Payload(value)
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, source location and request context"""
+
+    CONTEXT_FIELDS = ("route", "method", "remote_addr")
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        for field in self.CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json_codec.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Copies request context (route, method, ...) onto the record while still on the request thread."""
+
+    def __init__(self, context):
+        super().__init__()
+        self.context = context
+
+    def filter(self, record):
+        for key, value in self.context().items():
+            setattr(record, key, value)
+        return True
+
+
+class BackgroundWriter(QueueListener):
+    """Writes queued records to the real handlers on its own thread."""
+
+    def enqueue_sentinel(self):
+        # Wait for room: on shutdown everything already queued should still be written
+        self.queue.put(self._sentinel)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """Hands records to a background writer without formatting or blocking the caller.
+
+    Records are formatted on the writer thread, so payload arguments must not be
+    mutated after they are logged. If the queue is full the record is dropped
+    and counted rather than stalling the request.
+    """
+
+    def __init__(self, log_queue, listener):
+        super().__init__(log_queue)
+        self.listener = listener
+        self.dropped = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # The writer thread does not survive fork(); start one per process with a
+        # fresh queue so records copied from the parent are not written twice
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.queue = self.listener.queue = queue.Queue(self.queue.maxsize)
+                    self.listener._thread = None
+                    self.listener.start()
+                    self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Keep msg/args as they are; the writer thread does the formatting
+        return record
+
+    def enqueue(self, record):
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Flush queued records and stop the writer thread"""
+        with self._lock:
+            if self._pid == os.getpid():
+                self.listener.stop()
+                self._pid = None
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "dropped": self.dropped}
+
+
+def setup_logging(logger, log_file, context=None, level=LOG_LEVEL, max_bytes=LOG_MAX_BYTES,
+                  backup_count=LOG_BACKUP_COUNT, console=LOG_CONSOLE):
+    """Route logger through a queue to a background thread writing JSON lines to log_file
+
+    Returns the queue handler; call its stats() for the queue depth and dropped count.
+    """
+    directory = os.path.dirname(log_file)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                       encoding='utf-8', delay=True)
+    file_handler.setFormatter(JSONFormatter())
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    listener = BackgroundWriter(log_queue, *handlers, respect_handler_level=True)
+    queue_handler = AsyncQueueHandler(log_queue, listener)
+    if context is not None:
+        queue_handler.addFilter(ContextFilter(context))
+
+    # The queue handler replaces whatever wrote synchronously before (e.g. Flask's stderr handler)
+    for existing in list(logger.handlers):
+        logger.removeHandler(existing)
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    atexit.register(queue_handler.stop)
+    return queue_handler
@@ -0,0 +1,224 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Metrics configuration (overridable through the environment)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Histogram bucket upper bounds in seconds, e.g. "0.01,0.05,0.1,0.5,1,5"
+METRICS_LATENCY_BUCKETS = tuple(float(b) for b in os.getenv(
+    "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30").split(","))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# name -> (type, help text)
+METRICS = {
+    "http_requests_total": (COUNTER, "HTTP requests handled, by route, method and status"),
+    "http_request_duration_seconds": (HISTOGRAM, "Time to handle an HTTP request, including streamed bodies"),
+    "http_requests_in_flight": (GAUGE, "HTTP requests currently being handled"),
+    "http_request_errors_total": (COUNTER, "HTTP requests that ended in a 5xx or an unhandled exception"),
+    "http_rate_limited_total": (COUNTER, "HTTP requests refused with 429 by the per-client rate limit"),
+    "chat_messages_routed_total": (COUNTER, "Chat messages by the intent that answered them (model when none matched)"),
+    "chat_local_route_ratio": (GAUGE, "Share of chat messages answered by the local intent router"),
+    "stage_duration_seconds": (HISTOGRAM, "Time spent in a processing stage of a request"),
+    "upstream_request_duration_seconds": (HISTOGRAM, "Time spent waiting on an upstream service call"),
+    "upstream_requests_in_flight": (GAUGE, "Upstream calls currently in progress"),
+    "upstream_errors_total": (COUNTER, "Upstream calls that raised or returned a 5xx"),
+    "upstream_circuit_state": (GAUGE, "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open)"),
+    "upstream_circuit_opened_total": (COUNTER, "Times the circuit breaker opened"),
+    "upstream_rejected_total": (COUNTER, "Upstream calls refused locally by the breaker or the concurrency limit"),
+}
+
+
+class _Shard:
+    """Metric values written by a single thread; only that thread ever mutates it."""
+
+    __slots__ = ("thread", "values", "histograms")
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.values = {}  # (name, labels) -> number (counters and gauge deltas)
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+
+
+class Registry:
+    """Counters, gauges and histograms aggregated per thread and merged only when scraped.
+
+    Each thread updates its own shard without taking a lock; render() sums the
+    shards. Shards of threads that have exited are folded into one so short-lived
+    worker threads do not accumulate.
+    """
+
+    def __init__(self, buckets=METRICS_LATENCY_BUCKETS, enabled=METRICS_ENABLED):
+        self.buckets = tuple(sorted(buckets))
+        self.enabled = enabled
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(None)
+        self._lock = threading.Lock()  # Guards the shard list, not the values
+        self._collectors = []  # Callables returning [(name, labels, value)] read at scrape time
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name, labels=(), amount=1):
+        """Add to a counter (or to a gauge, with a negative amount to go down)"""
+        if not self.enabled:
+            return
+        values = self._shard().values
+        key = (name, labels)
+        values[key] = values.get(key, 0) + amount
+
+    def observe(self, name, labels, seconds):
+        """Record one histogram observation"""
+        if not self.enabled:
+            return
+        histograms = self._shard().histograms
+        key = (name, labels)
+        counts = histograms.get(key)
+        if counts is None:
+            counts = histograms[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        counts[-1] += seconds
+
+    def add_collector(self, collector):
+        """Register a callable whose (name, labels, value) samples are read on every scrape"""
+        self._collectors.append(collector)
+
+    @contextmanager
+    def timer(self, name, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, labels, time.perf_counter() - start)
+
+    def _collect(self):
+        """Merged (values, histograms) over every thread's shard"""
+        with self._lock:
+            live = []
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    live.append(shard)
+                else:
+                    _merge(self._retired, shard)
+            self._shards = live
+            merged = _Shard(None)
+            for shard in [self._retired] + live:
+                _merge(merged, shard)
+        return merged.values, merged.histograms
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        values, histograms = self._collect()
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                values[(name, labels)] = value
+        series = {}
+        for (name, labels), value in values.items():
+            series.setdefault(name, []).append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), counts in histograms.items():
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+            cumulative += counts[-2]
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(counts[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+        output = []
+        for name in sorted(series):
+            kind, help_text = METRICS.get(name, (COUNTER, name))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(sorted(series[name]))
+        return "\n".join(output) + "\n"
+
+
+def _merge(target, shard):
+    # Copy with list() first: the owning thread may be adding keys concurrently
+    for key, value in list(shard.values.items()):
+        target.values[key] = target.values.get(key, 0) + value
+    for key, counts in list(shard.histograms.items()):
+        existing = target.histograms.get(key)
+        if existing is None:
+            target.histograms[key] = list(counts)
+        else:
+            for index, count in enumerate(list(counts)):
+                existing[index] += count
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + escaped + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Process-wide registry used by the apps and the upstream clients
+REGISTRY = Registry()
+
+
+def render():
+    return REGISTRY.render()
+
+
+def stage(name):
+    """Time a processing stage (JSON parsing, extraction, ...) of the current request"""
+    return REGISTRY.timer("stage_duration_seconds", (("stage", name),))
+
+
+def record_upstream_error(upstream, operation):
+    REGISTRY.inc("upstream_errors_total", (("upstream", upstream), ("operation", operation)))
+
+
+@contextmanager
+def upstream_span(upstream, operation):
+    """Time one call to an upstream service, tracking in-flight calls and failures"""
+    labels = (("upstream", upstream), ("operation", operation))
+    in_flight = (("upstream", upstream),)
+    REGISTRY.inc("upstream_requests_in_flight", in_flight)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record_upstream_error(upstream, operation)
+        raise
+    finally:
+        REGISTRY.observe("upstream_request_duration_seconds", labels, time.perf_counter() - start)
+        REGISTRY.inc("upstream_requests_in_flight", in_flight, -1)
+
+
+def request_started(route, method):
+    REGISTRY.inc("http_requests_in_flight", (("route", route),))
+    return time.perf_counter()
+
+
+def request_finished(route, method, status, started):
+    """Record a finished request; status is None when it ended in an unhandled exception"""
+    REGISTRY.inc("http_requests_in_flight", (("route", route),), -1)
+    REGISTRY.observe("http_request_duration_seconds", (("route", route), ("method", method)),
+                     time.perf_counter() - started)
+    REGISTRY.inc("http_requests_total", (("route", route), ("method", method), ("status", str(status or 500))))
+    if status is None or status >= 500:
+        REGISTRY.inc("http_request_errors_total", (("route", route), ("method", method)))
@@ -0,0 +1,259 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import json_codec
+from lazy_import import lazy_module
+from resilience import UpstreamUnavailable
+
+requests = lazy_module("requests")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Outbox configuration (overridable through the environment)
+OUTBOX_DB_PATH = os.getenv("OUTBOX_DB_PATH", os.path.join(BASE_DIR, 'data', 'outbox.db'))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 20))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", 4))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0))
+OUTBOX_RETRY_BASE_DELAY = float(os.getenv("OUTBOX_RETRY_BASE_DELAY", 2.0))
+OUTBOX_RETRY_MAX_DELAY = float(os.getenv("OUTBOX_RETRY_MAX_DELAY", 300))
+# A claimed row whose worker died (crash, restart) becomes claimable again after this long
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", 300))
+
+# Delivery states
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+# CRM statuses worth retrying; any other 4xx means the lead itself was rejected
+RETRYABLE_STATUSES = (408, 425, 429)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lead_outbox (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    crm_status INTEGER,
+    crm_response TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lead_outbox_due ON lead_outbox (status, next_attempt_at);
+"""
+
+
+class LeadOutbox:
+    """Durable SQLite (WAL) queue of leads waiting to be delivered to the CRM."""
+
+    def __init__(self, path=OUTBOX_DB_PATH, lease_seconds=OUTBOX_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Opened on first use so importing the app does not touch the disk
+        # Reopen in a forked worker: a SQLite connection must not be shared across fork()
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def enqueue(self, payload):
+        """Persist a lead and return its tracking id."""
+        tracking_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO lead_outbox (id, payload, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tracking_id, json_codec.dumps(payload), PENDING, now, now, now),
+            )
+        return tracking_id
+
+    def get(self, tracking_id):
+        """Return the delivery state of a lead, or None if the id is unknown."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT id, status, attempts, crm_status, crm_response, last_error, created_at, updated_at "
+                "FROM lead_outbox WHERE id = ?",
+                (tracking_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        result = dict(row)
+        if result["crm_response"]:
+            try:
+                result["crm_response"] = json_codec.loads(result["crm_response"])
+            except ValueError:
+                pass
+        return result
+
+    def claim_batch(self, limit):
+        """Atomically mark up to `limit` due leads as in flight and return them."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # BEGIN IMMEDIATE serialises claims between processes sharing the file
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT id, payload, attempts FROM lead_outbox "
+                    "WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND claimed_at <= ?) "
+                    "ORDER BY created_at LIMIT ?",
+                    (PENDING, now, IN_FLIGHT, now - self.lease_seconds, limit),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE lead_outbox SET status = ?, attempts = attempts + 1, claimed_at = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    [(IN_FLIGHT, now, now, row["id"]) for row in rows],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return [
+            {"id": row["id"], "payload": json_codec.loads(row["payload"]), "attempts": row["attempts"] + 1}
+            for row in rows
+        ]
+
+    def mark_delivered(self, tracking_id, crm_status, crm_response):
+        self._finish(tracking_id, DELIVERED, crm_status, crm_response, None)
+
+    def mark_failed(self, tracking_id, error, crm_status=None, crm_response=None):
+        self._finish(tracking_id, FAILED, crm_status, crm_response, error)
+
+    def mark_retry(self, tracking_id, error, delay, crm_status=None, count_attempt=True):
+        """Schedule another attempt; count_attempt=False when the CRM was never actually called"""
+        now = time.time()
+        with self._lock:
+            self._connection().execute(
+                "UPDATE lead_outbox SET status = ?, next_attempt_at = ?, claimed_at = NULL, crm_status = ?, "
+                "last_error = ?, updated_at = ?, attempts = attempts - ? WHERE id = ?",
+                (PENDING, now + delay, crm_status, error, now, 0 if count_attempt else 1, tracking_id),
+            )
+
+    def _finish(self, tracking_id, status, crm_status, crm_response, error):
+        with self._lock:
+            self._connection().execute(
+                "UPDATE lead_outbox SET status = ?, claimed_at = NULL, crm_status = ?, crm_response = ?, "
+                "last_error = ?, updated_at = ? WHERE id = ?",
+                (status, crm_status, crm_response, error, time.time(), tracking_id),
+            )
+
+    def counts(self):
+        """Number of leads in each delivery state."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT status, COUNT(*) FROM lead_outbox GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+
+class OutboxDispatcher:
+    """Background thread that drains the outbox in batches with bounded concurrency."""
+
+    def __init__(self, outbox, deliver, logger,
+                 batch_size=OUTBOX_BATCH_SIZE,
+                 concurrency=OUTBOX_CONCURRENCY,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS,
+                 poll_interval=OUTBOX_POLL_INTERVAL,
+                 retry_base_delay=OUTBOX_RETRY_BASE_DELAY,
+                 retry_max_delay=OUTBOX_RETRY_MAX_DELAY):
+        self.outbox = outbox
+        self.deliver = deliver  # Callable taking the lead payload, returning a requests.Response
+        self.logger = logger
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the dispatcher thread (again, if this process was forked after it started)."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="lead-outbox-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self):
+        """Wake the dispatcher early, e.g. right after a lead was enqueued."""
+        self._wakeup.set()
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="lead-outbox") as executor:
+            while not self._stopping.is_set():
+                try:
+                    batch = self.outbox.claim_batch(self.batch_size)
+                except Exception:
+                    self.logger.exception("Failed to claim leads from the outbox")
+                    batch = []
+                if not batch:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+                # Wait for the whole batch so in-flight work never exceeds the batch size
+                list(executor.map(self._deliver_one, batch))
+
+    def _deliver_one(self, item):
+        tracking_id = item["id"]
+        try:
+            response = self.deliver(item["payload"])
+            response.raise_for_status()
+            self.outbox.mark_delivered(tracking_id, response.status_code, response.text)
+            self.logger.info("Outbox lead %s delivered with status %s", tracking_id, response.status_code)
+        except requests.exceptions.HTTPError as http_err:
+            status = http_err.response.status_code
+            if status < 500 and status not in RETRYABLE_STATUSES:
+                self.outbox.mark_failed(tracking_id, "CRM API returned an error", status, http_err.response.text)
+                self.logger.error("Outbox lead %s rejected by CRM: %s", tracking_id, http_err.response.text)
+            else:
+                self._retry_or_fail(item, f"CRM API HTTP Error: {status}", status)
+        except UpstreamUnavailable as e:
+            # Refused locally by the circuit breaker: wait it out without using up an attempt
+            self.outbox.mark_retry(tracking_id, str(e), e.retry_after, count_attempt=False)
+            self.logger.warning("Outbox lead %s deferred for %.1fs: %s", tracking_id, e.retry_after, e)
+        except Exception as e:
+            self._retry_or_fail(item, str(e))
+
+    def _retry_or_fail(self, item, error, crm_status=None):
+        tracking_id = item["id"]
+        if item["attempts"] >= self.max_attempts:
+            self.outbox.mark_failed(tracking_id, error, crm_status)
+            self.logger.error("Outbox lead %s failed after %s attempts: %s", tracking_id, item["attempts"], error)
+            return
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (item["attempts"] - 1))
+        self.outbox.mark_retry(tracking_id, error, delay, crm_status)
+        self.logger.warning("Outbox lead %s attempt %s failed, retrying in %ss: %s", tracking_id, item["attempts"], delay, error)
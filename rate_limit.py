@@ -0,0 +1,181 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from metrics import REGISTRY
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Rate limiting configuration (overridable through the environment)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" (per process) or "sqlite" (shared by workers)
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", os.path.join(BASE_DIR, 'data', 'rate_limits.db'))
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", 100000))  # Client buckets kept in memory
+# Per-route limits as "route=requests per second:burst", keyed by the Flask URL rule;
+# routes without an entry are not limited
+RATE_LIMITS = os.getenv(
+    "RATE_LIMITS",
+    "/chat=1:20,/chat/stream=1:20,/add_lead=0.5:10,/add_leads=0.1:3,/update_lead=2:30,/lead/<enq_id>=5:50,/lead=5:50",
+)
+
+
+def parse_limits(spec):
+    """"/chat=1:20,/add_lead=0.5:10" -> {"/chat": (1.0, 20.0), "/add_lead": (0.5, 10.0)}"""
+    limits = {}
+    for item in spec.split(","):
+        route, _, limit = item.strip().partition("=")
+        rate, _, burst = limit.partition(":")
+        if route and rate:
+            rate = float(rate)
+            limits[route] = (rate, float(burst) if burst else max(1.0, rate))
+    return limits
+
+
+def take(tokens, updated_at, now, rate, burst):
+    """Refill a bucket to `now` and take one token; returns (allowed, tokens left, seconds until one is available)"""
+    tokens = min(burst, tokens + (now - updated_at) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / rate
+
+
+class MemoryBuckets:
+    """Token buckets kept in this process, least recently used first.
+
+    A bucket that has been idle long enough to refill completely behaves
+    exactly like a new one, so those are dropped, as are the least recently
+    used buckets beyond `max_buckets`.
+    """
+
+    def __init__(self, max_buckets=RATE_LIMIT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()  # (route, client) -> [tokens, updated_at, seconds to refill]
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def take(self, key, now, rate, burst):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now, burst / rate]
+            else:
+                self._buckets.move_to_end(key)
+            allowed, bucket[0], wait = take(bucket[0], bucket[1], now, rate, burst)
+            bucket[1] = now
+            self._evict(now)
+        return allowed, wait
+
+    def _evict(self, now):
+        # Only the front is checked: it is the longest idle, and this runs on every request
+        while self._buckets:
+            key, (_, updated_at, refill) = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self.max_buckets and now - updated_at < refill:
+                break
+            del self._buckets[key]
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {"buckets": len(self._buckets), "evictions": self.evictions}
+
+
+class SQLiteBuckets:
+    """Token buckets in a SQLite (WAL) file, so every worker on the host shares one limit per client."""
+
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, path=RATE_LIMIT_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.evictions = 0
+
+    def _connection(self):
+        # Reopen in a forked worker: a SQLite connection must not be shared across fork()
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, refill_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limit_refill_at ON rate_limit_buckets (refill_at)")
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def take(self, key, now, rate, burst):
+        key = "\n".join(key)
+        with self._lock:
+            conn = self._connection()
+            # BEGIN IMMEDIATE serialises the read-modify-write between processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated_at = row if row is not None else (burst, now)
+                allowed, tokens, wait = take(tokens, updated_at, now, rate, burst)
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at, refill_at) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, now + (burst - tokens) / rate),
+                )
+                if now - self._last_sweep > self.SWEEP_INTERVAL:
+                    self._last_sweep = now
+                    # Full buckets are the same as missing ones
+                    removed = conn.execute("DELETE FROM rate_limit_buckets WHERE refill_at <= ?", (now,)).rowcount
+                    self.evictions += max(removed, 0)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return allowed, wait
+
+    def stats(self):
+        with self._lock:
+            buckets = self._connection().execute("SELECT COUNT(*) FROM rate_limit_buckets").fetchone()[0]
+        return {"buckets": buckets, "evictions": self.evictions}
+
+
+class RateLimiter:
+    """Per-client, per-route token buckets: `burst` requests at once, refilled at `rate` per second."""
+
+    def __init__(self, backend, limits, enabled=RATE_LIMIT_ENABLED):
+        self.backend = backend
+        self.limits = limits
+        self.enabled = enabled
+        self.limited = 0
+
+    def check(self, route, client):
+        """Seconds the client has to wait before calling `route` again, or 0 if the request may proceed"""
+        limit = self.limits.get(route)
+        if not self.enabled or limit is None:
+            return 0
+        rate, burst = limit
+        allowed, wait = self.backend.take((route, client or "unknown"), time.time(), rate, burst)
+        if allowed:
+            return 0
+        self.limited += 1
+        REGISTRY.inc("http_rate_limited_total", (("route", route),))
+        # Whole seconds for the Retry-After header, never 0
+        return max(1, math.ceil(wait))
+
+    def stats(self):
+        stats = {"enabled": self.enabled, "backend": type(self.backend).__name__, "limited": self.limited,
+                 "limits": {route: {"rate": rate, "burst": burst} for route, (rate, burst) in self.limits.items()}}
+        stats.update(self.backend.stats())
+        return stats
+
+
+def create_rate_limiter():
+    """Build the limiter selected by RATE_LIMIT_BACKEND and RATE_LIMITS"""
+    backend = SQLiteBuckets() if RATE_LIMIT_BACKEND == "sqlite" else MemoryBuckets()
+    return RateLimiter(backend, parse_limits(RATE_LIMITS))
@@ -0,0 +1,274 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from metrics import REGISTRY
+
+# Circuit breaker / bulkhead configuration (overridable through the environment)
+BREAKER_ENABLED = os.getenv("BREAKER_ENABLED", "true").lower() == "true"
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", 0.5))  # Share of failed calls that opens the circuit
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", 10))  # Calls needed in the window before it can open
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", 20))  # Most recent calls the failure rate is computed over
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", 15))  # Fail fast for this long before probing
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", 2))  # Probes (sent one at a time) that must succeed to close
+# Calls allowed in flight per upstream, so one slow dependency cannot hold every worker thread
+CRM_MAX_CONCURRENCY = int(os.getenv("CRM_MAX_CONCURRENCY", 16))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 16))
+# The ASGI app waits on upstreams without holding threads, so its limits are much higher
+CRM_ASYNC_MAX_CONCURRENCY = int(os.getenv("CRM_ASYNC_MAX_CONCURRENCY", 500))
+OPENAI_ASYNC_MAX_CONCURRENCY = int(os.getenv("OPENAI_ASYNC_MAX_CONCURRENCY", 500))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", 0.5))  # Seconds to wait for a free slot
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """An upstream call was refused locally instead of being sent."""
+
+    def __init__(self, upstream, reason, retry_after):
+        super().__init__(f"{upstream} {reason}")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class BulkheadFullError(UpstreamUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after too many recent calls failed, fails fast while open, then lets probes through one at a time."""
+
+    def __init__(self, name,
+                 failure_rate=BREAKER_FAILURE_RATE,
+                 min_calls=BREAKER_MIN_CALLS,
+                 window=BREAKER_WINDOW,
+                 open_seconds=BREAKER_OPEN_SECONDS,
+                 half_open_probes=BREAKER_HALF_OPEN_PROBES,
+                 enabled=BREAKER_ENABLED):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.enabled = enabled
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # True for each failed call
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not be sent; returns True for a half-open probe"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, "circuit is open", remaining)
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+            if self.state == HALF_OPEN:
+                # A single probe at a time: a still-failing upstream sees one call, not a burst
+                if self._probes_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, "circuit is half-open", 1.0)
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def cancel_probe(self):
+        """A probe that was admitted but never sent"""
+        with self._lock:
+            self._probes_in_flight -= 1
+
+    def record(self, failed, probe=False):
+        if not self.enabled:
+            return
+        with self._lock:
+            if probe:
+                self._probes_in_flight -= 1
+                if self.state != HALF_OPEN:
+                    return
+                if failed:
+                    self._trip()
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._close()
+                return
+            if self.state != CLOSED:
+                # A call that started before the circuit opened
+                return
+            if len(self._outcomes) == self._outcomes.maxlen:
+                self._failures -= self._outcomes[0]
+            self._outcomes.append(failed)
+            self._failures += failed
+            if len(self._outcomes) >= self.min_calls and self._failures >= self.failure_rate * len(self._outcomes):
+                self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def _close(self):
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+
+    def stats(self):
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": self.state,
+                "failure_rate": round(self._failures / calls, 3) if calls else 0.0,
+                "window_calls": calls,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class Bulkhead:
+    """Caps the number of calls in flight to one upstream."""
+
+    def __init__(self, name, max_concurrency, queue_timeout=UPSTREAM_QUEUE_TIMEOUT):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def acquire(self, wait=True):
+        """Take a slot, waiting up to queue_timeout (never waits when wait is False, e.g. on an event loop)"""
+        acquired = self._semaphore.acquire(timeout=self.queue_timeout) if wait else self._semaphore.acquire(False)
+        with self._lock:
+            if not acquired:
+                self.rejected += 1
+                raise BulkheadFullError(self.name, f"has {self.max_concurrency} calls in flight", 1.0)
+            self.in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "max_concurrency": self.max_concurrency, "rejected": self.rejected}
+
+
+class Call:
+    """Handle for one guarded call; mark_failed() records a failure that did not raise (e.g. a 5xx)"""
+
+    __slots__ = ("failed",)
+
+    def __init__(self):
+        self.failed = False
+
+    def mark_failed(self):
+        self.failed = True
+
+
+class UpstreamGuard:
+    """Circuit breaker plus bulkhead in front of one upstream service."""
+
+    def __init__(self, name, max_concurrency, breaker=None, queue_timeout=UPSTREAM_QUEUE_TIMEOUT):
+        self.name = name
+        self.breaker = breaker or CircuitBreaker(name)
+        self.bulkhead = Bulkhead(name, max_concurrency, queue_timeout)
+
+    @contextmanager
+    def protect(self, is_failure=None, wait=True):
+        """Run the body as one upstream call
+
+        Raises UpstreamUnavailable without calling the upstream when the circuit
+        is open or every slot is taken. Exceptions from the body count as
+        failures unless is_failure(exc) says otherwise.
+        """
+        probe = self.breaker.before_call()
+        try:
+            self.bulkhead.acquire(wait)
+        except BulkheadFullError:
+            if probe:
+                self.breaker.cancel_probe()
+            raise
+        call = Call()
+        try:
+            yield call
+        except Exception as e:
+            if is_failure is None or is_failure(e):
+                call.failed = True
+            raise
+        finally:
+            self.bulkhead.release()
+            self.breaker.record(call.failed, probe)
+
+    def stats(self):
+        stats = self.breaker.stats()
+        bulkhead = self.bulkhead.stats()
+        stats.update(in_flight=bulkhead["in_flight"], max_concurrency=bulkhead["max_concurrency"],
+                     bulkhead_rejected=bulkhead["rejected"])
+        return stats
+
+
+def unavailable_body(error):
+    """Response body for a call refused by the breaker or the concurrency limit"""
+    return {
+        "error": f"Upstream {error.upstream} is temporarily unavailable",
+        "details": str(error),
+        "retry_after": max(1, math.ceil(error.retry_after)),
+    }
+
+
+GUARDS = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(name, max_concurrency):
+    """The process-wide guard for an upstream, created on first use"""
+    guard = GUARDS.get(name)
+    if guard is None:
+        with _guards_lock:
+            guard = GUARDS.get(name)
+            if guard is None:
+                guard = GUARDS[name] = UpstreamGuard(name, max_concurrency)
+    return guard
+
+
+def guard_stats():
+    return {name: guard.stats() for name, guard in sorted(GUARDS.items())}
+
+
+CIRCUIT_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def collect_metrics():
+    """Breaker and bulkhead state for /metrics"""
+    samples = []
+    for name, stats in guard_stats().items():
+        labels = (("upstream", name),)
+        samples.append(("upstream_circuit_state", labels, CIRCUIT_STATE_VALUES[stats["state"]]))
+        samples.append(("upstream_circuit_opened_total", labels, stats["times_opened"]))
+        samples.append(("upstream_rejected_total", labels + (("reason", "circuit_open"),), stats["rejected"]))
+        samples.append(("upstream_rejected_total", labels + (("reason", "bulkhead_full"),), stats["bulkhead_rejected"]))
+    return samples
+
+
+REGISTRY.add_collector(collect_metrics)
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cache configuration (overridable through the environment)
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "true").lower() == "true"
+CHAT_CACHE_BACKEND = os.getenv("CHAT_CACHE_BACKEND", "memory")  # "memory" or "sqlite" (shared by workers)
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", 3600))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", 1000))
+CHAT_CACHE_MAX_BYTES = int(os.getenv("CHAT_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+CHAT_CACHE_DB_PATH = os.getenv("CHAT_CACHE_DB_PATH", os.path.join(BASE_DIR, 'data', 'chat_cache.db'))
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Fold case, punctuation and whitespace so equivalent questions share a cache entry"""
+    return WHITESPACE_RE.sub(" ", PUNCTUATION_RE.sub(" ", prompt.casefold())).strip()
+
+
+def cache_key(prompt, params):
+    """Stable key for a normalized prompt plus the model parameters it was sent with"""
+    material = json.dumps([normalize_prompt(prompt), params], sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU cache with a TTL, bounded by entry count and approximate size."""
+
+    def __init__(self, max_entries=CHAT_CACHE_MAX_ENTRIES, max_bytes=CHAT_CACHE_MAX_BYTES, ttl=CHAT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        size = sys.getsizeof(value) + sys.getsizeof(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "evictions": self.evictions}
+
+
+class SQLiteCache:
+    """Cache shared by every worker process on the host, stored in one SQLite (WAL) file."""
+
+    def __init__(self, path=CHAT_CACHE_DB_PATH, max_entries=CHAT_CACHE_MAX_ENTRIES, ttl=CHAT_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _connection(self):
+        # Reopen in a forked worker: a SQLite connection must not be shared across fork()
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_cache_last_used ON chat_cache (last_used)")
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT value, expires_at FROM chat_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("DELETE FROM chat_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE chat_cache SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            # Evict expired rows, then the least recently used ones beyond the bound
+            expired = conn.execute("DELETE FROM chat_cache WHERE expires_at <= ?", (now,)).rowcount
+            overflow = conn.execute(
+                "DELETE FROM chat_cache WHERE key IN ("
+                "SELECT key FROM chat_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self.evictions += max(expired, 0) + max(overflow, 0)
+
+    def stats(self):
+        with self._lock:
+            entries = self._connection().execute("SELECT COUNT(*) FROM chat_cache").fetchone()[0]
+        return {"entries": entries, "evictions": self.evictions}
+
+
+class ResponseCache:
+    """Front for the model call: looks answers up by normalized prompt and counts hits and misses."""
+
+    def __init__(self, backend, enabled=CHAT_CACHE_ENABLED):
+        self.backend = backend
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, prompt, params):
+        if not self.enabled:
+            return None
+        value = self.backend.get(cache_key(prompt, params))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, prompt, params, value):
+        if self.enabled and value:
+            self.backend.set(cache_key(prompt, params), value)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        stats = {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+        if self.enabled:
+            stats.update(self.backend.stats())
+        return stats
+
+
+def create_response_cache():
+    """Build the cache selected by CHAT_CACHE_BACKEND"""
+    if CHAT_CACHE_BACKEND == "sqlite":
+        return ResponseCache(SQLiteCache())
+    return ResponseCache(MemoryCache())
@@ -0,0 +1,137 @@
+import os
+import signal
+import sys
+import threading
+import time
+import _thread
+
+# Production entry point: `python serve.py`.
+#
+# On Linux/macOS the app runs under gunicorn: the app is imported once in the
+# master (patterns compiled, NLP model loaded) and forked into WEB_WORKERS
+# processes with WEB_THREADS request threads each. Every worker opens its own
+# CRM, OpenAI and SQLite connections and starts its background threads before
+# it accepts traffic, and is replaced after WEB_MAX_REQUESTS requests.
+# On Windows (IIS) it falls back to a single waitress process.
+
+CPU_COUNT = os.cpu_count() or 1
+
+# Serving configuration (overridable through the environment)
+WEB_SERVER = os.getenv("WEB_SERVER", "gunicorn" if os.name == "posix" else "waitress")  # "gunicorn" or "waitress"
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("PORT", os.getenv("FLASK_PORT", 5000)))  # PORT is set by Heroku and IIS
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 2 * CPU_COUNT + 1))  # Worker processes (gunicorn)
+WEB_THREADS = int(os.getenv("WEB_THREADS", 4))  # Request threads per worker; requests mostly wait on upstreams
+WEB_MAX_REQUESTS = int(os.getenv("WEB_MAX_REQUESTS", 2000))  # Restart a worker after this many requests (0 = never)
+WEB_MAX_REQUESTS_JITTER = int(os.getenv("WEB_MAX_REQUESTS_JITTER", 200))  # Spread restarts so workers do not recycle together
+WEB_TIMEOUT = int(os.getenv("WEB_TIMEOUT", 120))  # Replace a worker silent for this long (CRM updates may take 30 s)
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))  # Time in-flight requests get to finish on shutdown
+WEB_KEEPALIVE = int(os.getenv("WEB_KEEPALIVE", 5))  # Seconds an idle client connection is kept open
+
+if WEB_SERVER == "gunicorn" and WEB_WORKERS > 1:
+    # In-memory chat history and rate-limit buckets would be split across workers (each
+    # client would get WEB_WORKERS times its limit); share them through SQLite instead
+    os.environ.setdefault("CHAT_HISTORY_BACKEND", "sqlite")
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "sqlite")
+
+
+def load_app():
+    """Import the app module, doing the per-process setup that can be shared by forked workers"""
+    import app as app_module
+    from lazy_import import load_lazy_modules
+
+    # The app imports its HTTP and OpenAI libraries on first use; a server pays that once up front
+    load_lazy_modules()
+    return app_module
+
+
+def post_fork(server, worker):
+    app_module = load_app()
+    app_module.warm_up()
+    server.log.info("Worker %s warmed up", worker.pid)
+
+
+def when_ready(server):
+    # Background work belongs to the workers; stop anything importing the app started in the master
+    load_app().shut_down()
+
+
+def worker_exit(server, worker):
+    load_app().shut_down()
+
+
+def gunicorn_options():
+    return {
+        "bind": f"{WEB_HOST}:{WEB_PORT}",
+        "workers": WEB_WORKERS,
+        "worker_class": "gthread",
+        "threads": WEB_THREADS,
+        "preload_app": True,
+        "max_requests": WEB_MAX_REQUESTS,
+        "max_requests_jitter": WEB_MAX_REQUESTS_JITTER,
+        "timeout": WEB_TIMEOUT,
+        "graceful_timeout": WEB_GRACEFUL_TIMEOUT,
+        "keepalive": WEB_KEEPALIVE,
+        "post_fork": post_fork,
+        "when_ready": when_ready,
+        "worker_exit": worker_exit,
+    }
+
+
+def serve_gunicorn():
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in gunicorn_options().items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app().app
+
+    Application().run()
+
+
+def serve_waitress():
+    from waitress import create_server
+
+    app_module = load_app()
+    app_module.warm_up()
+    server = create_server(app_module.app, host=WEB_HOST, port=WEB_PORT, threads=WEB_WORKERS * WEB_THREADS)
+    dispatcher = server.task_dispatcher
+
+    def drain():
+        # Let requests already being handled finish, then stop the main loop
+        deadline = time.monotonic() + WEB_GRACEFUL_TIMEOUT
+        while (dispatcher.active_count or dispatcher.queue) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        _thread.interrupt_main()
+
+    def stop(signum, frame):
+        # Stop accepting new connections; closing the socket here would pull it out from under select()
+        server.accepting = False
+        threading.Thread(target=drain, name="waitress-drain", daemon=True).start()
+
+    for name in ("SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), stop)
+
+    app_module.app.logger.info("Serving on http://%s:%s with %d threads", WEB_HOST, WEB_PORT,
+                               WEB_WORKERS * WEB_THREADS)
+    try:
+        server.run()
+    finally:
+        app_module.shut_down()
+
+
+def main():
+    if WEB_SERVER == "gunicorn":
+        serve_gunicorn()
+    elif WEB_SERVER == "waitress":
+        serve_waitress()
+    else:
+        sys.exit(f"Unknown WEB_SERVER {WEB_SERVER!r}; use 'gunicorn' or 'waitress'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import pytest
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import server_env  # noqa: E402
+from benchmarks.stubs import start_crm_stub  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def crm():
+    """CRM stub on a local port; it echoes the lead it is sent back with the payload's Enq_Id"""
+    server = start_crm_stub()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def app_module(crm, tmp_path_factory):
+    """The Flask app module, imported against the CRM stub with every SQLite file in a temporary directory"""
+    data_dir = str(tmp_path_factory.mktemp("data"))
+    # Modules read their settings when imported, so the environment is set before the first import
+    os.environ.update(
+        server_env(crm.base_url, "http://127.0.0.1:9", data_dir),
+        LEAD_MIRROR_DB_PATH=os.path.join(data_dir, "leads.db"),
+        RATE_LIMIT_DB_PATH=os.path.join(data_dir, "rate_limits.db"),
+        CHAT_HISTORY_DB_PATH=os.path.join(data_dir, "conversations.db"),
+    )
+    import app
+    yield app
+    app.shut_down(1)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,49 @@
+import threading
+import time
+from bulk import process_bulk
+
+
+def run(leads, fail=()):
+    sent = []
+    lock = threading.Lock()
+
+    def submit(lead):
+        time.sleep(0.05)  # Still in flight when the repeat is prepared
+        with lock:
+            sent.append(lead["email"])
+        if lead["email"] in fail:
+            return {"error": "CRM API returned an error"}, 502
+        return {"message": "Lead submitted successfully"}, 200
+
+    results = dict(process_bulk(
+        leads,
+        prepare=lambda lead: (lead, None),
+        submit=submit,
+        keys=lambda lead: ["e:" + lead["email"], "m:" + lead["mobile"]],
+        duplicate=lambda lead, first: ({"message": "Lead already exists", "duplicate": True}, 200)
+        if first[1] < 400 else first,
+    ))
+    return sent, [results[index] for index in range(len(leads))]
+
+
+def test_repeated_lead_in_one_batch_is_sent_once():
+    ravi = {"email": "ravi@x.com", "mobile": "9876543210"}
+    asha = {"email": "asha@x.com", "mobile": "9123456789"}
+    same_mobile = {"email": "ravi.k@x.com", "mobile": "9876543210"}
+    sent, results = run([ravi, asha, dict(ravi), same_mobile])
+    assert sorted(sent) == ["asha@x.com", "ravi@x.com"]
+    assert [status for _, status in results] == [200, 200, 200, 200]
+    assert results[2][0]["duplicate"] and results[3][0]["duplicate"]
+
+
+def test_repeat_of_a_failed_lead_shares_its_failure():
+    ravi = {"email": "ravi@x.com", "mobile": "9876543210"}
+    sent, results = run([ravi, dict(ravi)], fail={"ravi@x.com"})
+    assert sent == ["ravi@x.com"]
+    assert [status for _, status in results] == [502, 502]
+
+
+def test_without_keys_every_item_is_sent():
+    items = [{"email": "ravi@x.com"}] * 3
+    results = list(process_bulk(items, lambda lead: (lead, None), lambda lead: ({}, 200)))
+    assert sorted(index for index, _ in results) == [0, 1, 2]
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from coalesce import AsyncUpdateCoalescer, UpdateCoalescer
+
+
+class Recorder:
+    """CRM update call that records what it was sent"""
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self._lock = threading.Lock()
+
+    def __call__(self, enq_id, fields):
+        with self._lock:
+            self.calls.append((enq_id, dict(fields)))
+        if self.error is not None:
+            raise self.error
+        return {"Enq_Id": enq_id, "updated": sorted(fields)}
+
+
+def submit_together(coalescer, updates):
+    """Submit (enq_id, fields) updates from separate threads, all within one window"""
+    with ThreadPoolExecutor(len(updates)) as executor:
+        return list(executor.map(lambda update: coalescer.submit(*update), updates))
+
+
+def test_updates_within_the_window_share_one_call():
+    send = Recorder()
+    coalescer = UpdateCoalescer(send, window=0.2, enabled=True)
+    results = submit_together(coalescer, [("E1", {"city": "Pune"}), ("E1", {"budget": "50L"}),
+                                          ("E2", {"city": "Delhi"})])
+    assert sorted(send.calls) == [("E1", {"city": "Pune", "budget": "50L"}), ("E2", {"city": "Delhi"})]
+    assert results[0] == results[1] == ({"Enq_Id": "E1", "updated": ["budget", "city"]}, 2)
+    assert results[2] == ({"Enq_Id": "E2", "updated": ["city"]}, 1)
+    assert coalescer.stats()["updates"] == 3 and coalescer.stats()["crm_calls"] == 2
+
+
+def test_later_values_win():
+    send = Recorder()
+    coalescer = UpdateCoalescer(send, window=0.3, enabled=True)
+    leader = threading.Thread(target=coalescer.submit, args=("E1", {"city": "Pune"}))
+    leader.start()
+    time.sleep(0.05)
+    coalescer.submit("E1", {"city": "Mumbai"})
+    leader.join()
+    assert send.calls == [("E1", {"city": "Mumbai"})]
+
+
+def test_batches_for_one_lead_are_sent_in_order():
+    send = Recorder()
+
+    def slow_send(enq_id, fields):
+        result = send(enq_id, fields)
+        time.sleep(0.2)
+        return result
+    coalescer = UpdateCoalescer(slow_send, window=0.05, enabled=True)
+    first = threading.Thread(target=coalescer.submit, args=("E1", {"city": "Pune"}))
+    first.start()
+    time.sleep(0.1)  # The first call is in flight
+    second = threading.Thread(target=coalescer.submit, args=("E1", {"city": "Mumbai"}))
+    second.start()
+    time.sleep(0.1)  # Past the second window, but still waiting for the first call
+    coalescer.submit("E1", {"budget": "50L"})
+    first.join()
+    second.join()
+    assert send.calls == [("E1", {"city": "Pune"}), ("E1", {"city": "Mumbai", "budget": "50L"})]
+    assert coalescer.stats()["open_batches"] == 0
+
+
+def test_every_caller_in_the_batch_sees_the_error():
+    coalescer = UpdateCoalescer(Recorder(error=RuntimeError("CRM down")), window=0.1, enabled=True)
+    with ThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(coalescer.submit, "E1", {"city": city}) for city in ("Pune", "Mumbai")]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="CRM down"):
+                future.result()
+
+
+def test_disabled_coalescer_sends_every_update():
+    send = Recorder()
+    coalescer = UpdateCoalescer(send, window=10, enabled=False)
+    assert coalescer.submit("E1", {"city": "Pune"}) == ({"Enq_Id": "E1", "updated": ["city"]}, 1)
+    assert send.calls == [("E1", {"city": "Pune"})]
+
+
+def test_async_updates_within_the_window_share_one_call():
+    send = Recorder()
+
+    async def async_send(enq_id, fields):
+        return send(enq_id, fields)
+
+    async def main():
+        coalescer = AsyncUpdateCoalescer(async_send, window=0.05, enabled=True)
+        return await asyncio.gather(coalescer.submit("E1", {"city": "Pune"}),
+                                    coalescer.submit("E1", {"budget": "50L"}))
+    results = asyncio.run(main())
+    assert send.calls == [("E1", {"city": "Pune", "budget": "50L"})]
+    assert results == [({"Enq_Id": "E1", "updated": ["budget", "city"]}, 2)] * 2
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+import pytest
+import conversation_store
+from conversation_store import BOT, USER, ConversationStore, MemoryBackend, SQLiteBackend, condense_turn
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic and time.time as seen by conversation_store.py, moved forward by hand"""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(conversation_store, "time", SimpleNamespace(monotonic=lambda: now[0], time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(idle_ttl=60)
+    return SQLiteBackend(str(tmp_path / "conversations.db"), idle_ttl=60)
+
+
+def test_exchanges_are_kept_per_session(backend):
+    store = ConversationStore(backend)
+    conversation = store.load("s1")
+    store.append("s1", conversation, "Hi", "Hello! How can I help?")
+    assert store.load("s1")["turns"] == [[USER, "Hi"], [BOT, "Hello! How can I help?"]]
+    assert store.load("s2") == {"summary": "", "turns": []}
+    assert store.build_prompt(store.load("s1"), "Prices?") == "User: Hi\nBot: Hello! How can I help?\nUser: Prices?\nBot:"
+
+
+def test_idle_sessions_expire(backend, clock):
+    store = ConversationStore(backend)
+    store.append("s1", store.load("s1"), "Hi", "Hello!")
+    clock[0] += 59
+    assert store.load("s1")["turns"]
+    clock[0] += 2
+    assert store.load("s1")["turns"] == []
+
+
+def test_state_saved_without_an_exchange_is_kept(backend):
+    store = ConversationStore(backend)
+    conversation = store.load("s1")
+    conversation["lead"] = {"email": "ravi@x.com"}
+    store.save("s1", conversation)
+    assert store.load("s1") == {"summary": "", "turns": [], "lead": {"email": "ravi@x.com"}}
+
+
+def test_old_turns_are_folded_into_the_summary():
+    store = ConversationStore(MemoryBackend(), token_budget=40, summary_budget=20)
+    conversation = store.load("s1")
+    store.append("s1", conversation, "I want a 2BHK in Pune. Budget is 50L.", "Great, noted your budget.")
+    store.append("s1", conversation, "Any options near Baner?", "Yes, three projects near Baner fit your budget.")
+    assert conversation["turns"] == [[USER, "Any options near Baner?"],
+                                     [BOT, "Yes, three projects near Baner fit your budget."]]
+    assert conversation["summary"] == "User: I want a 2BHK in Pune. Bot: Great, noted your budget."
+    assert store.build_prompt(conversation, "Prices?").startswith(
+        "Summary of the earlier conversation: User: I want a 2BHK in Pune.")
+    # The latest exchange is kept even when it alone exceeds the budget
+    store.append("s1", conversation, "x" * 400, "y" * 400)
+    assert len(conversation["turns"]) == 2
+    assert len(conversation["summary"]) <= 3 + 20 * 4
+
+
+def test_condensed_turn_is_the_first_sentence_capped():
+    assert condense_turn(USER, "Hi there. Second sentence.") == "User: Hi there."
+    assert condense_turn(BOT, "a" * 100) == "Bot: " + "a" * 80 + "..."
+
+
+def test_memory_backend_evicts_the_least_recently_active_session():
+    store = ConversationStore(MemoryBackend(max_sessions=2))
+    for session_id in ("s1", "s2", "s3"):
+        store.append(session_id, store.load(session_id), "Hi", "Hello!")
+    assert store.load("s1")["turns"] == []
+    assert store.load("s3")["turns"]
+    assert store.stats()["sessions"] == 2 and store.stats()["evictions"] == 1
+
+
+def test_sqlite_sessions_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    ConversationStore(SQLiteBackend(path)).append("s1", {"summary": "", "turns": []}, "Hi", "Hello!")
+    assert ConversationStore(SQLiteBackend(path)).load("s1")["turns"] == [[USER, "Hi"], [BOT, "Hello!"]]
@@ -0,0 +1,94 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from benchmarks.stubs import start_crm_stub
+from crm_client import AsyncCRMClient, CRMClient
+from resilience import CircuitBreaker, CircuitOpenError, UpstreamGuard, OPEN
+
+
+@pytest.fixture
+def failing_crm():
+    """CRM stub answering every call with a 503"""
+    server = start_crm_stub(error_rate=1.0)
+    yield server
+    server.stop()
+
+
+def client_for(server, **kwargs):
+    """CRMClient for a stub, with a guard of its own so the app's shared CRM breaker is left alone"""
+    options = dict(max_retries=2, backoff_factor=0, backoff_jitter=0)
+    options.update(kwargs)
+    client = CRMClient(server.base_url + "/AddLead", server.base_url + "/UpdateLead", server.base_url + "/GetLead",
+                       **options)
+    client.guard = UpstreamGuard("crm-test", 8, breaker=CircuitBreaker(
+        "crm-test", failure_rate=0.5, min_calls=4, window=4, open_seconds=60, enabled=True))
+    return client
+
+
+def pool(client):
+    (stats,) = client.pool_stats()["pools"].values()
+    return stats
+
+
+def test_calls_reuse_keep_alive_connections(crm):
+    client = client_for(crm)
+    for number in range(5):
+        assert client.add_lead({"Enq_Id": f"P{number}", "email": "pool@x.com"}).status_code == 200
+    assert client.update_lead("P1", {"city": "Pune"}).json()["Enq_Id"] == "P1"
+    assert pool(client)["connections_opened"] == 1
+    assert client.pool_stats()["requests_sent"] == 6
+    client.close()
+
+
+def test_concurrent_calls_share_the_pool(crm):
+    client = client_for(crm, pool_maxsize=4)
+    with ThreadPoolExecutor(4) as executor:
+        statuses = list(executor.map(lambda n: client.add_lead({"Enq_Id": f"C{n}"}).status_code, range(20)))
+    assert statuses == [200] * 20
+    assert pool(client)["connections_opened"] <= 4
+    client.close()
+
+
+def test_warm_up_opens_connections_before_the_first_call(crm):
+    client = client_for(crm)
+    assert client.warm_up(2) == 2
+    assert pool(client)["idle"] == 2
+    client.add_lead({"Enq_Id": "W1"})
+    assert pool(client)["connections_opened"] == 2  # The first call used a warm connection
+    client.close()
+
+
+def test_only_idempotent_calls_are_retried_on_5xx(failing_crm):
+    client = client_for(failing_crm)
+    assert client.add_lead({"Enq_Id": "F1"}).status_code == 503
+    assert [method for method, _, _ in failing_crm.requests] == ["POST"]
+    assert client.update_lead("F1", {"city": "Pune"}).status_code == 503
+    assert [method for method, _, _ in failing_crm.requests] == ["POST", "PUT", "PUT", "PUT"]
+    client.close()
+
+
+def test_5xx_responses_open_the_circuit(failing_crm):
+    client = client_for(failing_crm, max_retries=0)
+    for number in range(4):
+        client.add_lead({"Enq_Id": f"F{number}"})
+    assert client.guard.breaker.state == OPEN
+    sent = len(failing_crm.requests)
+    with pytest.raises(CircuitOpenError):
+        client.add_lead({"Enq_Id": "F5"})
+    assert len(failing_crm.requests) == sent
+    client.close()
+
+
+def test_async_client_retries_only_idempotent_calls(failing_crm):
+    client = AsyncCRMClient(failing_crm.base_url + "/AddLead", failing_crm.base_url + "/UpdateLead",
+                            pool_shards=2, max_retries=1, backoff_factor=0, backoff_jitter=0)
+    client.guard = UpstreamGuard("crm-test", 8, breaker=CircuitBreaker("crm-test", enabled=False))
+
+    async def main():
+        try:
+            return ((await client.add_lead({"Enq_Id": "A1"})).status_code,
+                    (await client.update_lead("A1", {"city": "Pune"})).status_code)
+        finally:
+            await client.aclose()
+    assert asyncio.run(main()) == (503, 503)
+    assert [method for method, _, _ in failing_crm.requests] == ["POST", "PUT", "PUT"]
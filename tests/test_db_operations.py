@@ -0,0 +1,21 @@
+import logging
+import pytest
+
+pytest.importorskip("pyodbc")
+
+import db_operations  # noqa: E402
+from db_pool import PoolTimeout  # noqa: E402
+
+
+class FailingWriter:
+    def write(self, row):
+        raise PoolTimeout("no connection available")
+
+
+def test_failed_save_is_logged(monkeypatch, caplog):
+    monkeypatch.setattr(db_operations, "lead_writer", FailingWriter())
+    with caplog.at_level(logging.ERROR, logger="db_operations"):
+        assert db_operations.save_lead("Ravi", "ravi@x.com", "9876543210") is False
+    (record,) = caplog.records
+    assert record.getMessage() == "Error saving lead: no connection available"
+    assert record.exc_info is not None
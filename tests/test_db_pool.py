@@ -0,0 +1,68 @@
+import sqlite3
+import threading
+import pytest
+from db_pool import BatchWriter, ConnectionPool, WriteTimeout
+
+
+@pytest.fixture
+def connect(tmp_path):
+    path = str(tmp_path / "leads.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE leads (name TEXT UNIQUE, email TEXT)")
+    return lambda: sqlite3.connect(path, check_same_thread=False)
+
+
+def rows(connect):
+    conn = connect()
+    try:
+        return sorted(conn.execute("SELECT name, email FROM leads").fetchall())
+    finally:
+        conn.close()
+
+
+def test_pool_reuses_connections_and_discards_broken_ones(connect):
+    pool = ConnectionPool(connect, max_size=2)
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO leads VALUES ('Ravi', 'ravi@x.com')")
+        conn.commit()
+    with pool.connection() as again:
+        assert again is conn
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as conn:
+            conn.execute("SELECT missing FROM leads")
+    assert pool.stats()["idle"] == 0
+    assert pool.stats()["opened"] == 1
+    assert rows(connect) == [("Ravi", "ravi@x.com")]
+
+
+def test_batch_writer_commits_concurrent_rows(connect):
+    writer = BatchWriter(ConnectionPool(connect), "INSERT INTO leads VALUES (?, ?)", flush_interval=0.05)
+    threads = [threading.Thread(target=writer.write, args=((f"name{i}", f"n{i}@x.com"),)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(rows(connect)) == 20
+
+
+def test_batch_writer_fails_only_the_bad_row(connect):
+    writer = BatchWriter(ConnectionPool(connect), "INSERT INTO leads VALUES (?, ?)", flush_interval=0.2)
+    good = writer.submit(("Ravi", "ravi@x.com"))
+    duplicate = writer.submit(("Ravi", "other@x.com"))
+    assert good.result(5) is True
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result(5)
+    assert rows(connect) == [("Ravi", "ravi@x.com")]
+
+
+def test_timed_out_write_is_never_committed(connect):
+    pool = ConnectionPool(connect, max_size=1)
+    writer = BatchWriter(pool, "INSERT INTO leads VALUES (?, ?)", flush_interval=0)
+    with pool.connection():
+        # The writer takes the first row and waits for the only connection; the second stays queued
+        first = writer.submit(("Ravi", "ravi@x.com"))
+        with pytest.raises(WriteTimeout):
+            writer.write(("Asha", "asha@x.com"), timeout=0.2)
+    assert first.result(5) is True
+    writer.write(("Meera", "meera@x.com"), timeout=5)
+    assert rows(connect) == [("Meera", "meera@x.com"), ("Ravi", "ravi@x.com")]
@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+import pytest
+import dedup
+from dedup import (IdempotencyStore, LeadIndex, SQLiteStore, assigned_enq_id, lead_matches, NEW, REPLAY,
+                   IN_PROGRESS, MISMATCH)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time as seen by dedup.py, moved forward by hand"""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(dedup, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteStore(str(tmp_path / "dedup.db"))
+
+
+@pytest.fixture
+def keys(store):
+    return IdempotencyStore(store, ttl=3600, lease=60)
+
+
+def test_completed_key_replays_the_stored_response(keys):
+    assert keys.begin("/add_lead", "k1", "body") == (NEW, None)
+    assert keys.begin("/add_lead", "k1", "body") == (IN_PROGRESS, None)
+    keys.complete("/add_lead", "k1", 202, b'{"tracking_id": "t1"}', {"Location": "/lead_status/t1"})
+    assert keys.begin("/add_lead", "k1", "body") == (REPLAY, (202, b'{"tracking_id": "t1"}',
+                                                               {"Location": "/lead_status/t1"}))
+    assert keys.begin("/add_lead", "k1", "other body") == (MISMATCH, None)
+    # Keys are per route
+    assert keys.begin("/update_lead", "k1", "body") == (NEW, None)
+
+
+def test_abandoned_key_can_be_retried(keys):
+    keys.begin("/add_lead", "k1", "body")
+    keys.abandon("/add_lead", "k1")
+    assert keys.begin("/add_lead", "k1", "body") == (NEW, None)
+    keys.complete("/add_lead", "k1", 200, b"{}")
+    keys.abandon("/add_lead", "k1")  # Only unfinished claims are released
+    assert keys.begin("/add_lead", "k1", "body") == (REPLAY, (200, b"{}", {}))
+
+
+def test_unfinished_claim_is_taken_over_after_the_lease(keys, clock):
+    keys.begin("/add_lead", "k1", "body")
+    clock[0] += 59
+    assert keys.begin("/add_lead", "k1", "body") == (IN_PROGRESS, None)
+    clock[0] += 2
+    assert keys.begin("/add_lead", "k1", "body") == (NEW, None)
+
+
+def test_stored_response_expires_after_the_ttl(keys, clock):
+    keys.begin("/add_lead", "k1", "body")
+    keys.complete("/add_lead", "k1", 200, b"{}")
+    clock[0] += 3599
+    assert keys.begin("/add_lead", "k1", "body")[0] == REPLAY
+    clock[0] += 2
+    assert keys.begin("/add_lead", "k1", "other body") == (NEW, None)
+
+
+def test_index_keeps_two_leads_apart(store):
+    index = LeadIndex(store, enabled=True)
+    index.record("Ravi@x.com", "9876543210", "E1")
+    index.record("asha@x.com", "+91 9123456789", "E2")
+    assert index.lookup("ravi@x.com", None) == "E1"
+    assert index.lookup(None, "09876543210") == "E1"
+    assert index.lookup("asha@x.com", None) == "E2"
+    assert index.lookup("meera@x.com", "9812345678") is None
+    # A new process (or an evicted cache entry) reads the same answers from SQLite
+    fresh = LeadIndex(store, max_cached=0, enabled=True)
+    assert fresh.lookup("ravi@x.com", None) == "E1"
+    assert fresh.lookup("asha@x.com", None) == "E2"
+
+
+def test_index_entries_expire(store, clock):
+    index = LeadIndex(store, ttl=100, enabled=True)
+    index.record("ravi@x.com", None, "E1")
+    clock[0] += 101
+    assert index.lookup("ravi@x.com", None) is None
+
+
+def test_placeholder_enq_id_is_never_treated_as_assigned():
+    assert assigned_enq_id({"status": "success", "Enq_Id": "12345"}) is None
+    assert assigned_enq_id({"Enq_Id": ""}) is None
+    assert assigned_enq_id(["not", "a", "dict"]) is None
+    assert assigned_enq_id({"Enq_Id": 98765}) == "98765"
+
+
+def test_lead_matches_by_email_or_mobile():
+    lead = {"email": "Ravi@x.com", "mobile": "9876543210"}
+    assert lead_matches(lead, email="ravi@x.com")
+    assert lead_matches(lead, mobile="+91 98765 43210")
+    assert not lead_matches(lead, email="asha@x.com")
+    assert not lead_matches(lead)
+
+
+def test_leads_echoing_the_placeholder_stay_apart(client, crm):
+    for message in ("name Ravi ravi.dedup@x.com 9876500001", "name Asha asha.dedup@x.com 9876500002"):
+        assert client.post("/add_lead", json={"message": message}).status_code == 200
+    sent = len(crm.requests)
+    # Not indexed under the echoed placeholder: a repeat is sent again instead of "already exists" for Asha's id
+    response = client.post("/add_lead", json={"message": "name Ravi ravi.dedup@x.com 9876500001"})
+    assert response.status_code == 200 and not response.json.get("duplicate")
+    assert len(crm.requests) == sent + 1
+    assert client.get("/lead?email=ravi.dedup@x.com").status_code == 404
@@ -0,0 +1,77 @@
+import pytest
+import extraction
+from benchmarks.bench_extraction import CORPUS, legacy_extract
+from extraction import (extract_data_from_message, has_name_cue, lead_from_state, new_lead_state, scan_message,
+                        update_lead_state)
+
+
+@pytest.mark.parametrize("message, email", [
+    ("Hi this is ravi.kumar@gmail.com, 9876543210", "ravi.kumar@gmail.com"),
+    ("I am ravi@gmail.com 9876543210", "ravi@gmail.com"),
+    ("name ravi_k+1@example.in, 9876543210", "ravi_k+1@example.in"),
+])
+def test_name_phrase_before_email_keeps_the_email(message, email):
+    lead = extract_data_from_message(message)
+    assert lead["email"] == email
+    assert lead["mobile"] == "9876543210"
+    assert lead["firstnm"]
+
+
+@pytest.mark.parametrize("message", CORPUS)
+def test_extraction_matches_the_original_extractor(message):
+    assert extract_data_from_message(message) == legacy_extract(message)
+
+
+def test_scan_message_finds_every_kind():
+    found = scan_message("My name is Ravi, ravi@x.com, +91 9876543210")
+    assert [c.value for c in found["name"]] == ["Ravi"]
+    assert [c.normalized for c in found["email"]] == ["ravi@x.com"]
+    assert [c.normalized for c in found["mobile"]] == ["+919876543210"]
+
+
+def capture(*messages):
+    state = new_lead_state()
+    for message in messages:
+        update_lead_state(state, message)
+    return state
+
+
+def test_chat_capture_skips_words_that_are_not_names():
+    state = capture("I am looking for a 2BHK in Baner", "this is interested in a site visit")
+    assert state["firstnm"] == ""
+
+
+def test_explicit_name_replaces_a_weaker_match():
+    state = capture("I am Vikas's colleague", "my name is Ravi")
+    assert state["firstnm"] == "Ravi"
+    state = capture("my name is Ravi", "I am Anil")
+    assert state["firstnm"] == "Ravi"
+
+
+def test_explicit_name_is_taken_before_the_lead_is_submitted():
+    state = capture("I am looking for a flat", "ravi@gmail.com 9876543210", "my name is ravi")
+    assert lead_from_state(state) == {"Enq_Id": "12345", "firstnm": "ravi", "email": "ravi@gmail.com",
+                                      "mobile": "9876543210"}
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Please call Priya Nair on 9898989898", True),
+    ("Rohit Sharma here, rohit.s@outlook.com", True),
+    ("What are your office timings?", False),
+    ("Thanks for the details. I will visit the site on Saturday morning.", False),
+    ("Can you call me back later? My number is 7012345678. Best time is after 6 pm.", False),
+])
+def test_ner_pre_filter_ignores_sentence_openers_and_common_words(message, expected):
+    assert has_name_cue(message) is expected
+
+
+def test_ner_model_is_loaded_without_the_excluded_components(tmp_path, monkeypatch):
+    spacy = pytest.importorskip("spacy")
+    nlp = spacy.blank("en")
+    nlp.add_pipe("attribute_ruler")
+    nlp.add_pipe("entity_ruler", name="ner")
+    nlp.to_disk(tmp_path)
+    monkeypatch.setattr(extraction, "SPACY_MODEL", str(tmp_path))
+    monkeypatch.setattr(extraction, "_ner_model", None)
+    monkeypatch.setattr(extraction, "_ner_error", None)
+    assert extraction.load_ner_model().component_names == ["ner"]
@@ -0,0 +1,53 @@
+import pytest
+from intent_router import INTENT_TEMPLATES, MODEL, IntentRouter
+
+
+def router(**templates):
+    return IntentRouter(dict(INTENT_TEMPLATES, **templates), enabled=True)
+
+
+@pytest.mark.parametrize("message, intent", [("Hi!", "greeting"), ("ok thanks a lot", "thanks"),
+                                             ("Good night", "goodbye"), ("hi, what is the price?", None)])
+def test_small_talk(message, intent):
+    assert router().match(message, None) == (intent, INTENT_TEMPLATES[intent] if intent else None)
+
+
+def test_contact_replies_use_the_lead_state():
+    contact = router()
+    lead = {"firstnm": "", "email": "ravi@x.com", "mobile": "", "submitted": False}
+    assert contact.match("ravi@x.com", lead) == ("contact", "Thank you! Could you also share your name and mobile number?")
+    lead = {"firstnm": "Ravi", "email": "ravi@x.com", "mobile": "9876543210", "submitted": True}
+    assert contact.match("9876543210", lead)[1].startswith("Thank you, Ravi!")
+    assert contact.match("ravi@x.com", dict(lead, error="CRM down")) == (None, None)
+
+
+def test_unknown_placeholder_renders_empty():
+    contact = router(contact_missing="Thanks {firstnm}! Your {missing} please, we cover {city}.")
+    lead = {"firstnm": "Ravi", "email": "ravi@x.com", "mobile": ""}
+    assert contact.match("ravi@x.com", lead)[1] == "Thanks Ravi! Your mobile number please, we cover ."
+
+
+@pytest.mark.parametrize("template", ["Your {missing please", "Your {0}", "Your {missing[1]}"])
+def test_broken_contact_template_is_rejected_when_loaded(template):
+    with pytest.raises(ValueError, match="contact_missing"):
+        router(contact_missing=template)
+
+
+def test_small_talk_templates_are_sent_as_written():
+    assert router(greeting="Hi {there} :-}").match("hi", None) == ("greeting", "Hi {there} :-}")
+
+
+def test_routed_counts():
+    counted = router()
+    counted.reply("hello", None)
+    counted.reply("what is the price?", None)
+    stats = counted.stats()
+    assert stats["routed"] == {"greeting": 1, MODEL: 1} and stats["local_share"] == 0.5
+
+
+def test_chat_with_an_unknown_placeholder_is_answered(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "intent_router",
+                        router(contact_missing="Thank you! Your {missing} too, and your {city}?"))
+    response = client.post("/chat", json={"message": "template.check@x.com"})
+    assert response.status_code == 200
+    assert response.json["response"] == "Thank you! Your name and mobile number too, and your ?"
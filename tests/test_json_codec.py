@@ -0,0 +1,70 @@
+import datetime
+import json
+from types import SimpleNamespace
+import pytest
+import json_codec
+from json_codec import RawJSON, dumpb, dumps, loads, response_json
+
+
+@pytest.fixture(params=["orjson", "json"])
+def codec(request, monkeypatch):
+    """json_codec configured for each codec, whichever is installed"""
+    if request.param == "orjson" and json_codec.orjson is None:
+        pytest.skip("orjson is not installed")
+    if request.param == "json":
+        monkeypatch.setattr(json_codec, "USE_ORJSON", False)
+        monkeypatch.setattr(json_codec, "ORJSON_FRAGMENT", None)
+    return request.param
+
+
+def test_round_trip(codec):
+    document = {"name": "Ravi", "city": "Pune – Baner", "tags": [1, 2.5, None, True]}
+    assert dumps(document) == '{"name":"Ravi","city":"Pune – Baner","tags":[1,2.5,null,true]}'
+    assert dumpb(document) == dumps(document).encode("utf-8")
+    assert loads(dumpb(document)) == loads(dumps(document)) == document
+    with pytest.raises(ValueError):
+        loads(b"{not json")
+
+
+def test_sort_keys_and_default(codec):
+    moment = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    assert dumps({"b": moment, "a": 1}, default=str, sort_keys=True) == '{"a":1,"b":"2024-01-02 03:04:05"}'
+    with pytest.raises(TypeError):
+        dumps({"a": object()})
+
+
+def test_integers_beyond_64_bits_fall_back_to_the_standard_library(codec):
+    assert dumps({"id": 2 ** 70}) == '{"id":%d}' % 2 ** 70
+
+
+def test_raw_json_is_copied_when_fragments_are_available(codec):
+    crm = response_json(SimpleNamespace(content=b'{"status": "success", "Enq_Id": "E1"}'))
+    assert crm.value == {"status": "success", "Enq_Id": "E1"}
+    body = dumps({"crm_response": crm})
+    if json_codec.ORJSON_FRAGMENT is not None:
+        assert body == '{"crm_response":{"status": "success", "Enq_Id": "E1"}}'  # The CRM's bytes, as sent
+    else:
+        assert body == '{"crm_response":{"status":"success","Enq_Id":"E1"}}'
+    assert loads(body) == {"crm_response": crm.value}
+
+
+def test_pretty_printed_upstream_body_is_re_encoded(codec):
+    crm = response_json(SimpleNamespace(content=b'{\n  "status": "success"\n}'))
+    assert crm.data is None
+    assert dumps([crm]) == '[{"status":"success"}]'
+
+
+def test_raw_json_through_the_standard_library_default():
+    crm = RawJSON(b'{"a": 1}', {"a": 1})
+    assert json.dumps({"crm": crm}, default=json_codec.stdlib_default()) == '{"crm": {"a": 1}}'
+    assert json.dumps([crm, datetime.date(2024, 1, 2)], default=json_codec.stdlib_default(str)) == \
+        '[{"a": 1}, "2024-01-02"]'
+
+
+def test_app_passes_the_crm_response_through(client, crm):
+    response = client.post("/add_lead", json={"message": "name Codec codec@x.com 9876543218"})
+    assert response.status_code == 200
+    assert response.json["crm_response"]["data"]["email"] == "codec@x.com"
+    # Pretty-printed output goes through the standard library with the same RawJSON handling
+    pretty = client.application.json.dumps({"crm": RawJSON(b'{"a": 1}', {"a": 1})}, indent=2)
+    assert json.loads(pretty) == {"crm": {"a": 1}}
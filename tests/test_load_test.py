@@ -0,0 +1,53 @@
+import json
+import pytest
+import requests
+from benchmarks.load_test import compare, percentile
+from benchmarks.stubs import start_crm_stub, start_openai_stub
+
+
+@pytest.fixture
+def openai_stub():
+    server = start_openai_stub(chunks=["Hello", " there"])
+    yield server
+    server.stop()
+
+
+def test_percentile():
+    values = [0.1 * n for n in range(1, 11)]
+    assert percentile(values, 50) == pytest.approx(0.5)
+    assert percentile(values, 99) == pytest.approx(1.0)
+    assert percentile([], 99) == 0.0
+
+
+def test_compare_reports_throughput_and_p99_regressions():
+    baseline = {"modes": {"sync": {"add_lead": {"10": {"throughput_rps": 100.0, "p99_ms": 50.0}}}}}
+    results = {"modes": {"sync": {"add_lead": {"10": {"throughput_rps": 85.0, "p99_ms": 54.0},
+                                               "50": {"throughput_rps": 1.0, "p99_ms": 999.0}}}}}
+    assert compare(results, baseline, 0.1) == [
+        {"scenario": "sync/add_lead/c10", "metric": "throughput_rps", "baseline": 100.0, "current": 85.0}]
+    assert compare(results, baseline, 0.2) == []  # Level 50 has no baseline to compare with
+
+
+def test_crm_stub_echoes_and_stores_leads(crm):
+    lead = {"Enq_Id": "S1", "email": "stub@x.com"}
+    assert requests.post(crm.base_url + "/AddLead", json=lead, timeout=5).json() == {
+        "status": "success", "Enq_Id": "S1", "data": lead}
+    assert requests.get(crm.base_url + "/GetLead/S1", timeout=5).json()["data"] == lead
+    assert requests.get(crm.base_url + "/GetLead/missing", timeout=5).status_code == 404
+
+
+def test_failing_crm_stub_answers_503():
+    server = start_crm_stub(error_rate=1.0)
+    try:
+        assert requests.post(server.base_url + "/AddLead", json={}, timeout=5).status_code == 503
+    finally:
+        server.stop()
+
+
+def test_openai_stub_streams_its_chunks(openai_stub):
+    url = openai_stub.base_url + "/v1/completions"
+    assert requests.post(url, json={"prompt": "hi"}, timeout=5).json()["choices"][0]["text"] == "Hello there"
+    with requests.post(url, json={"prompt": "hi", "stream": True}, stream=True, timeout=5) as response:
+        events = [line[len(b"data: "):] for line in response.iter_lines() if line.startswith(b"data: ")]
+    assert events[-1] == b"[DONE]"
+    assert [json.loads(event)["choices"][0]["text"] for event in events[:-1]] == ["Hello", " there"]
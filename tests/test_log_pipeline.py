@@ -0,0 +1,58 @@
+import json
+import logging
+import pytest
+import log_pipeline
+from log_pipeline import NOT_SAMPLED, Payload, parse_sample_rates, payload, setup_logging
+
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger("tests.log_pipeline")
+    yield logger
+    for handler in list(logger.handlers):
+        if isinstance(handler, log_pipeline.AsyncQueueHandler):
+            handler.stop()
+        logger.removeHandler(handler)
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("/chat=0.1, crm=0.2,,/add_lead=") == {"/chat": 0.1, "crm": 0.2}
+
+
+def test_payload_is_serialized_lazily_and_truncated():
+    assert str(Payload({"email": "ravi@x.com"})) == '{"email":"ravi@x.com"}'
+    assert str(Payload("x" * 15, max_chars=10)) == "xxxxxxxxxx...[truncated 5 chars]"
+
+
+def test_payload_sampling_per_route(monkeypatch):
+    monkeypatch.setattr(log_pipeline, "SAMPLE_RATES", {"/chat": 0.0})
+    monkeypatch.setattr(log_pipeline, "LOG_PAYLOAD_SAMPLE_RATE", 1.0)
+    assert payload("/chat", {"message": "hi"}) == NOT_SAMPLED
+    assert isinstance(payload("/add_lead", {"message": "hi"}), Payload)
+
+
+def test_records_are_written_as_json_lines_by_the_background_writer(logger, tmp_path):
+    log_file = tmp_path / "logs" / "app.log"
+    handler = setup_logging(logger, str(log_file), context=lambda: {"route": "/add_lead", "method": "POST"},
+                            console=False)
+    logger.info("Received payload: %s", Payload({"message": "hi"}))
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("CRM call failed")
+    handler.stop()  # Flushes the queue
+
+    first, second = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    assert first["message"] == 'Received payload: {"message":"hi"}'
+    assert (first["level"], first["route"], first["method"]) == ("INFO", "/add_lead", "POST")
+    assert second["level"] == "ERROR" and "ValueError: boom" in second["exc_info"]
+    assert handler.stats() == {"queued": 0, "dropped": 0}
+
+
+def test_full_queue_drops_records_instead_of_blocking(logger, tmp_path, monkeypatch):
+    monkeypatch.setattr(log_pipeline, "LOG_QUEUE_SIZE", 1)
+    handler = setup_logging(logger, str(tmp_path / "app.log"), console=False)
+    handler._ensure_started = lambda: None  # No writer thread drains the queue
+    for _ in range(3):
+        logger.info("lead received")
+    assert handler.stats() == {"queued": 1, "dropped": 2}
@@ -0,0 +1,60 @@
+import threading
+from metrics import CONTENT_TYPE, Registry
+
+
+def test_counters_and_histograms_are_merged_across_threads():
+    registry = Registry(buckets=(0.1, 1.0), enabled=True)
+    labels = (("route", "/add_lead"),)
+
+    def work():
+        registry.inc("http_requests_total", labels)
+        registry.observe("http_request_duration_seconds", labels, 0.0625)
+        registry.observe("http_request_duration_seconds", labels, 2.0)
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    registry.inc("http_requests_total", labels)  # This thread's shard is still live
+
+    lines = registry.render().splitlines()
+    assert 'http_requests_total{route="/add_lead"} 4' in lines
+    assert lines[lines.index("# TYPE http_request_duration_seconds histogram") + 1:][:5] == [
+        'http_request_duration_seconds_bucket{route="/add_lead",le="+Inf"} 6',
+        'http_request_duration_seconds_bucket{route="/add_lead",le="0.1"} 3',
+        'http_request_duration_seconds_bucket{route="/add_lead",le="1.0"} 3',
+        'http_request_duration_seconds_count{route="/add_lead"} 6',
+        'http_request_duration_seconds_sum{route="/add_lead"} 6.1875',
+    ]
+    # Exited threads are folded into one shard without losing their values
+    assert len(registry._shards) == 1
+    assert 'http_requests_total{route="/add_lead"} 4' in registry.render().splitlines()
+
+
+def test_gauges_collectors_and_label_escaping():
+    registry = Registry(enabled=True)
+    registry.inc("http_requests_in_flight", (("route", "/chat"),))
+    registry.inc("http_requests_in_flight", (("route", "/chat"),), -1)
+    registry.add_collector(lambda: [("upstream_circuit_state", (("upstream", 'c"r\\m'),), 2)])
+    output = registry.render()
+    assert 'http_requests_in_flight{route="/chat"} 0' in output
+    assert 'upstream_circuit_state{upstream="c\\"r\\\\m"} 2' in output
+    assert "# TYPE upstream_circuit_state gauge" in output
+
+
+def test_disabled_registry_records_nothing():
+    registry = Registry(enabled=False)
+    registry.inc("http_requests_total", (("route", "/chat"),))
+    with registry.timer("stage_duration_seconds", (("stage", "extraction"),)):
+        pass
+    assert registry.render() == "\n"
+
+
+def test_metrics_endpoint_counts_requests_by_route_template(client):
+    client.get("/lead_status/unknown-id")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == CONTENT_TYPE
+    body = response.get_data(as_text=True)
+    assert 'http_requests_total{route="/lead_status/<tracking_id>",method="GET",status="404"}' in body
+    assert 'http_request_duration_seconds_count{route="/lead_status/<tracking_id>",method="GET"}' in body
@@ -0,0 +1,125 @@
+import logging
+from types import SimpleNamespace
+import pytest
+import requests
+import outbox
+from outbox import LeadOutbox, OutboxDispatcher, DELIVERED, FAILED, IN_FLIGHT, PENDING
+from resilience import CircuitOpenError
+
+logger = logging.getLogger("tests.outbox")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time as seen by outbox.py, moved forward by hand"""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(outbox, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def leads(tmp_path, clock):
+    return LeadOutbox(str(tmp_path / "outbox.db"), lease_seconds=60)
+
+
+def crm_response(status, body=b'{"status": "success", "Enq_Id": "E1"}'):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    return response
+
+
+def dispatcher(leads, *responses, max_attempts=3):
+    """Dispatcher whose CRM answers with `responses` in turn (an exception is raised)"""
+    replies = iter(responses)
+
+    def deliver(payload):
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+    return OutboxDispatcher(leads, deliver, logger, max_attempts=max_attempts, retry_base_delay=2,
+                            retry_max_delay=10)
+
+
+def deliver_due(worker):
+    for item in worker.outbox.claim_batch(10):
+        worker._deliver_one(item)
+
+
+def test_claim_marks_due_leads_in_flight(leads):
+    first = leads.enqueue({"email": "ravi@x.com"})
+    second = leads.enqueue({"email": "asha@x.com"})
+    batch = leads.claim_batch(1)
+    assert [(item["id"], item["payload"], item["attempts"]) for item in batch] == [
+        (first, {"email": "ravi@x.com"}, 1)]
+    assert leads.get(first)["status"] == IN_FLIGHT
+    assert [item["id"] for item in leads.claim_batch(10)] == [second]
+    assert leads.claim_batch(10) == []
+    assert leads.counts() == {IN_FLIGHT: 2}
+
+
+def test_lead_of_a_dead_worker_is_claimed_again_after_the_lease(leads, clock):
+    tracking_id = leads.enqueue({"email": "ravi@x.com"})
+    leads.claim_batch(10)
+    clock[0] += 59
+    assert leads.claim_batch(10) == []
+    clock[0] += 2
+    assert [(item["id"], item["attempts"]) for item in leads.claim_batch(10)] == [(tracking_id, 2)]
+
+
+def test_delivered_lead_keeps_the_crm_response(leads):
+    tracking_id = leads.enqueue({"email": "ravi@x.com"})
+    deliver_due(dispatcher(leads, crm_response(200)))
+    state = leads.get(tracking_id)
+    assert (state["status"], state["crm_status"], state["attempts"]) == (DELIVERED, 200, 1)
+    assert state["crm_response"] == {"status": "success", "Enq_Id": "E1"}
+
+
+def test_server_errors_are_retried_with_backoff_then_dead_lettered(leads, clock):
+    tracking_id = leads.enqueue({"email": "ravi@x.com"})
+    worker = dispatcher(leads, crm_response(503), requests.exceptions.ConnectionError("reset"), crm_response(500))
+
+    deliver_due(worker)
+    state = leads.get(tracking_id)
+    assert (state["status"], state["crm_status"], state["attempts"]) == (PENDING, 503, 1)
+    clock[0] += 1
+    assert leads.claim_batch(10) == []  # Not due for 2 s
+
+    clock[0] += 1
+    deliver_due(worker)
+    assert (leads.get(tracking_id)["status"], leads.get(tracking_id)["last_error"]) == (PENDING, "reset")
+    clock[0] += 3
+    assert leads.claim_batch(10) == []  # The delay doubled to 4 s
+    clock[0] += 1
+
+    deliver_due(worker)
+    state = leads.get(tracking_id)
+    assert (state["status"], state["crm_status"], state["attempts"]) == (FAILED, 500, 3)
+    clock[0] += 3600
+    assert leads.claim_batch(10) == []
+
+
+@pytest.mark.parametrize("status, expected", [(400, FAILED), (422, FAILED), (429, PENDING), (408, PENDING)])
+def test_only_some_client_errors_are_retried(leads, status, expected):
+    tracking_id = leads.enqueue({"email": "ravi@x.com"})
+    deliver_due(dispatcher(leads, crm_response(status, b'{"error": "bad lead"}')))
+    state = leads.get(tracking_id)
+    assert (state["status"], state["crm_status"]) == (expected, status)
+    if expected == FAILED:
+        assert state["crm_response"] == {"error": "bad lead"}
+
+
+def test_refused_call_is_deferred_without_using_an_attempt(leads, clock):
+    tracking_id = leads.enqueue({"email": "ravi@x.com"})
+    worker = dispatcher(leads, CircuitOpenError("crm", "circuit is open", 5.0), crm_response(200), max_attempts=1)
+    deliver_due(worker)
+    state = leads.get(tracking_id)
+    assert (state["status"], state["attempts"]) == (PENDING, 0)
+    clock[0] += 5
+    deliver_due(worker)  # Still the first real attempt, so max_attempts=1 does not dead-letter it
+    assert leads.get(tracking_id)["status"] == DELIVERED
+
+
+def test_unknown_tracking_id(leads):
+    assert leads.get("missing") is None
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+import pytest
+import rate_limit
+from rate_limit import MemoryBuckets, RateLimiter, SQLiteBuckets, parse_limits, take
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_parse_limits():
+    assert parse_limits("/chat=1:20, /add_lead=0.5:10,/lead=5") == {
+        "/chat": (1.0, 20.0), "/add_lead": (0.5, 10.0), "/lead": (5.0, 5.0)}
+
+
+def test_bucket_refills_at_the_rate_up_to_the_burst():
+    assert take(0.0, 100.0, 101.0, rate=0.5, burst=10) == (False, 0.5, 1.0)
+    assert take(0.5, 101.0, 102.0, rate=0.5, burst=10) == (True, 0.0, 0.0)
+    # A long idle period never refills past the burst
+    assert take(0.0, 0.0, 1000.0, rate=0.5, burst=10) == (True, 9.0, 0.0)
+
+
+@pytest.mark.parametrize("buckets", ["memory", "sqlite"])
+def test_burst_then_limit_then_refill(buckets, tmp_path):
+    backend = MemoryBuckets() if buckets == "memory" else SQLiteBuckets(str(tmp_path / "rate_limits.db"))
+    key = ("/add_lead", "10.0.0.1")
+    assert [backend.take(key, 100.0, 1, 3)[0] for _ in range(3)] == [True, True, True]
+    assert backend.take(key, 100.0, 1, 3) == (False, 1.0)
+    assert backend.take(("/add_lead", "10.0.0.2"), 100.0, 1, 3)[0] is True  # Buckets are per client
+    assert backend.take(key, 101.0, 1, 3)[0] is True
+
+
+def test_sqlite_buckets_are_shared_between_stores(tmp_path):
+    path = str(tmp_path / "rate_limits.db")
+    worker_1, worker_2 = SQLiteBuckets(path), SQLiteBuckets(path)
+    key = ("/chat", "10.0.0.1")
+    assert worker_1.take(key, 100.0, 0.5, 2)[0] is True
+    assert worker_2.take(key, 100.0, 0.5, 2)[0] is True
+    assert worker_1.take(key, 100.0, 0.5, 2) == (False, 2.0)
+    assert worker_2.take(key, 100.0, 0.5, 2) == (False, 2.0)
+
+
+def test_limiter_returns_whole_seconds_to_wait(monkeypatch):
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(time=lambda: 100.0))
+    limiter = RateLimiter(MemoryBuckets(), {"/add_lead": (0.4, 1)}, enabled=True)
+    assert limiter.check("/add_lead", "10.0.0.1") == 0
+    assert limiter.check("/add_lead", "10.0.0.1") == 3  # 2.5 s until the next token
+    assert limiter.check("/chat", "10.0.0.1") == 0  # Not limited
+    assert limiter.limited == 1
+
+
+def test_limited_request_is_a_429_with_retry_after(app_module, client, monkeypatch):
+    limiter = RateLimiter(MemoryBuckets(), {"/add_lead": (0.1, 1)}, enabled=True)
+    monkeypatch.setattr(app_module, "rate_limiter", limiter)
+    assert client.post("/add_lead", json={}).status_code == 400
+    response = client.post("/add_lead", json={})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+    assert response.json == {"error": "Too many requests", "retry_after": 10}
+    # CORS preflights are not counted
+    assert client.options("/add_lead").status_code == 200
+
+
+def rate_limit_backend(env):
+    """Backend the rate limiter picks after serve.py was imported with `env`"""
+    code = "import serve, rate_limit; print(type(rate_limit.create_rate_limiter().backend).__name__)"
+    env = {key: value for key, value in os.environ.items() if key != "RATE_LIMIT_BACKEND"} | env
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True, timeout=60)
+    return result.stdout.strip()
+
+
+def test_serve_shares_rate_limits_between_workers():
+    assert rate_limit_backend({"WEB_SERVER": "gunicorn", "WEB_WORKERS": "3"}) == "SQLiteBuckets"
+    assert rate_limit_backend({"WEB_SERVER": "gunicorn", "WEB_WORKERS": "1"}) == "MemoryBuckets"
+    assert rate_limit_backend({"WEB_SERVER": "waitress", "WEB_WORKERS": "3"}) == "MemoryBuckets"
+    # An explicit choice is kept
+    assert rate_limit_backend({"WEB_SERVER": "gunicorn", "WEB_WORKERS": "3",
+                               "RATE_LIMIT_BACKEND": "memory"}) == "MemoryBuckets"
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+import pytest
+import resilience
+from resilience import (CircuitBreaker, Bulkhead, BulkheadFullError, CircuitOpenError, UpstreamGuard,
+                        UpstreamUnavailable, CLOSED, HALF_OPEN, OPEN)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic as seen by resilience.py, moved forward by hand"""
+    now = [1000.0]
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def breaker(**kwargs):
+    options = dict(failure_rate=0.5, min_calls=4, window=4, open_seconds=10, half_open_probes=2, enabled=True)
+    options.update(kwargs)
+    return CircuitBreaker("crm", **options)
+
+
+def call(circuit, failed):
+    probe = circuit.before_call()
+    circuit.record(failed, probe)
+
+
+def test_breaker_opens_half_opens_and_closes(clock):
+    circuit = breaker()
+    for failed in (False, True, False):
+        call(circuit, failed)
+    assert circuit.state == CLOSED  # Fewer than min_calls
+    call(circuit, True)
+    assert circuit.state == OPEN  # 2 of 4 failed
+
+    clock[0] += 5
+    with pytest.raises(CircuitOpenError) as error:
+        circuit.before_call()
+    assert error.value.retry_after == pytest.approx(5)
+
+    clock[0] += 5
+    call(circuit, False)
+    assert circuit.state == HALF_OPEN  # One of the two probes succeeded
+    call(circuit, False)
+    assert circuit.state == CLOSED
+    assert circuit.stats()["window_calls"] == 0
+
+
+def test_failed_probe_opens_the_circuit_again(clock):
+    circuit = breaker(min_calls=1, window=1)
+    call(circuit, True)
+    clock[0] += 10
+    call(circuit, True)
+    assert circuit.state == OPEN
+    assert circuit.times_opened == 2
+
+
+def test_half_open_admits_one_probe_at_a_time(clock):
+    circuit = breaker(min_calls=1, window=1)
+    call(circuit, True)
+    clock[0] += 10
+    assert circuit.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        circuit.before_call()
+    circuit.record(False, probe=True)
+    assert circuit.before_call() is True  # The next probe once the first one finished
+
+
+def test_bulkhead_queue_timeout_raises_upstream_unavailable():
+    bulkhead = Bulkhead("crm", 1, queue_timeout=0.05)
+    bulkhead.acquire()
+    with pytest.raises(BulkheadFullError) as error:
+        bulkhead.acquire()
+    assert isinstance(error.value, UpstreamUnavailable)
+    assert bulkhead.stats() == {"in_flight": 1, "max_concurrency": 1, "rejected": 1}
+    bulkhead.release()
+    bulkhead.acquire(wait=False)
+
+
+def test_guard_returns_a_probe_slot_the_bulkhead_refused(clock):
+    guard = UpstreamGuard("crm", 1, breaker=breaker(min_calls=1, window=1), queue_timeout=0.05)
+    with pytest.raises(RuntimeError):
+        with guard.protect():
+            raise RuntimeError("CRM down")
+    clock[0] += 10
+    guard.bulkhead.acquire()  # Another call holds the only slot
+    with pytest.raises(BulkheadFullError):
+        with guard.protect():
+            pass
+    guard.bulkhead.release()
+    with guard.protect():
+        pass  # The refused probe did not keep the half-open slot
+    assert guard.breaker.state == HALF_OPEN
+
+
+def test_refused_crm_call_is_a_503_with_retry_after(app_module, client, monkeypatch):
+    guard = app_module.crm_client.guard
+    monkeypatch.setattr(guard, "bulkhead", Bulkhead("crm", 1, queue_timeout=0.05))
+    guard.bulkhead.acquire()
+    response = client.post("/add_lead", json={"message": "name Bulkhead bulkhead@x.com 9876543219"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json["retry_after"] == 1
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+import pytest
+import response_cache
+from response_cache import MemoryCache, ResponseCache, SQLiteCache, cache_key, normalize_prompt
+
+PARAMS = {"model": "gpt-4o-mini", "temperature": 0}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic and time.time as seen by response_cache.py, moved forward by hand"""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(monotonic=lambda: now[0], time=lambda: now[0]))
+    return now
+
+
+def test_equivalent_prompts_share_a_key():
+    assert normalize_prompt("  What are the  PRICES?! ") == "what are the prices"
+    assert cache_key("What are the prices?", PARAMS) == cache_key("what are the prices", PARAMS)
+    assert cache_key("What are the prices?", PARAMS) != cache_key("What are the prices?", {**PARAMS, "temperature": 1})
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_least_recently_used_entry_is_evicted(backend, tmp_path, clock):
+    cache = MemoryCache(max_entries=2) if backend == "memory" else SQLiteCache(str(tmp_path / "cache.db"), 2)
+    cache.set("a", "answer a")
+    clock[0] += 1
+    cache.set("b", "answer b")
+    clock[0] += 1
+    assert cache.get("a") == "answer a"  # "b" is now the least recently used
+    clock[0] += 1
+    cache.set("c", "answer c")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("answer a", None, "answer c")
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_entries_expire_after_the_ttl(backend, tmp_path, clock):
+    cache = MemoryCache(ttl=60) if backend == "memory" else SQLiteCache(str(tmp_path / "cache.db"), ttl=60)
+    cache.set("a", "answer a")
+    clock[0] += 59
+    assert cache.get("a") == "answer a"
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_memory_cache_is_bounded_by_size():
+    cache = MemoryCache(max_bytes=500)
+    cache.set("big", "x" * 1000)  # Larger than the whole cache: not stored
+    assert cache.get("big") is None
+    cache.set("a", "x" * 200)
+    cache.set("b", "x" * 200)
+    assert cache.get("a") is None and cache.get("b") is not None
+    assert cache.stats()["bytes"] <= 500
+
+
+def test_sqlite_cache_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SQLiteCache(path).set("a", "answer a")
+    assert SQLiteCache(path).get("a") == "answer a"
+
+
+def test_response_cache_counts_hits_and_misses():
+    cache = ResponseCache(MemoryCache(), enabled=True)
+    assert cache.get("What are the prices?", PARAMS) is None
+    cache.set("What are the prices?", PARAMS, "From 50L")
+    cache.set("Empty answer", PARAMS, "")  # Not cached
+    assert cache.get("what are the PRICES", PARAMS) == "From 50L"
+    assert cache.get("Empty answer", PARAMS) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"], stats["entries"]) == (1, 2, 0.3333, 1)
+
+
+def test_disabled_cache_never_answers():
+    cache = ResponseCache(MemoryCache(), enabled=False)
+    cache.set("What are the prices?", PARAMS, "From 50L")
+    assert cache.get("What are the prices?", PARAMS) is None
+    assert cache.stats() == {"enabled": False, "backend": "MemoryCache", "hits": 0, "misses": 0, "hit_ratio": 0.0}
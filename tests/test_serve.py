@@ -0,0 +1,49 @@
+import os
+import signal
+import subprocess
+import sys
+import pytest
+import requests
+from benchmarks.load_test import server_env, wait_until_ready
+from benchmarks.stubs import free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("gunicorn")
+
+
+@pytest.fixture
+def server(crm, tmp_path):
+    port = free_port()
+    env = server_env(crm.base_url, "http://127.0.0.1:9", str(tmp_path))
+    env.update(WEB_SERVER="gunicorn", WEB_HOST="127.0.0.1", PORT=str(port), WEB_WORKERS="2", WEB_THREADS="2",
+               WEB_GRACEFUL_TIMEOUT="5", CHAT_HISTORY_DB_PATH=str(tmp_path / "conversations.db"),
+               RATE_LIMIT_DB_PATH=str(tmp_path / "rate_limits.db"), LEAD_MIRROR_DB_PATH=str(tmp_path / "leads.db"))
+    for name in ("CHAT_HISTORY_BACKEND", "RATE_LIMIT_BACKEND"):
+        env.pop(name, None)
+    process = subprocess.Popen([sys.executable, "serve.py"], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(f"http://127.0.0.1:{port}", process)
+        yield process, f"http://127.0.0.1:{port}"
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def test_preforked_workers_serve_warm_and_stop_gracefully(server):
+    process, base_url = server
+    for number in range(4):
+        response = requests.post(base_url + "/add_lead", timeout=10,
+                                 json={"message": f"name Serve serve{number}@x.com 98765000{number:02d}"})
+        assert response.status_code == 200
+    stats = requests.get(base_url + "/stats", timeout=10).json()
+    # Each worker opened CRM_WARM_CONNECTIONS keep-alive connections before taking traffic
+    (pool,) = stats["crm_pool"]["pools"].values()
+    assert pool["connections_opened"] >= 2
+    assert stats["conversations"]["backend"] == "SQLiteBackend"
+    assert stats["rate_limit"]["backend"] == "SQLiteBuckets"
+
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(timeout=20) == 0
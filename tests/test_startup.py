@@ -0,0 +1,24 @@
+import json
+import statistics
+import pytest
+from benchmarks.bench_startup import LAZY_MODULES, STARTUP_BUDGET_MS, run_import
+from benchmarks.load_test import server_env
+
+# Libraries the app loads on first use; importing it must not pull them in
+HEAVY_MODULES = LAZY_MODULES.split(",") + ["pyodbc", "spacy"]
+
+
+@pytest.fixture(scope="module")
+def imports(tmp_path_factory):
+    """Three imports of app in fresh interpreters, as parsed from bench_startup's timed import"""
+    env = server_env("http://127.0.0.1:9", "http://127.0.0.1:9", str(tmp_path_factory.mktemp("startup")))
+    return [json.loads(run_import("app", env)[0].splitlines()[-1]) for _ in range(3)]
+
+
+def test_app_imports_within_the_budget(imports):
+    median = statistics.median(result["ms"] for result in imports)
+    assert median <= STARTUP_BUDGET_MS, f"import app took {median:.0f} ms, budget {STARTUP_BUDGET_MS:.0f} ms"
+
+
+def test_app_import_leaves_heavy_modules_unloaded(imports):
+    assert [name for name in HEAVY_MODULES if name in imports[-1]["modules"]] == []